@@ -0,0 +1,241 @@
+"""A local stand-in for the Kubernetes API server, serving a SyntheticCluster.
+
+Supports the read paths k8spulse uses: list (cluster-wide and namespaced),
+get by name, `limit`/`continue` pagination, `labelSelector` equality
+matching, `watch=true` streams of ADDED events, metadata-only lists
+(`Accept: ...;as=PartialObjectMetadataList`) and the metrics.k8s.io API.
+Every request is counted per resource so benchmarks can report API usage.
+"""
+
+import base64
+import json
+import re
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RESOURCE_VERSION = "1000"
+
+LIST_KINDS = {
+    "pods": "PodList",
+    "nodes": "NodeList",
+    "events": "EventList",
+    "namespaces": "NamespaceList",
+    "deployments": "DeploymentList",
+    "replicasets": "ReplicaSetList",
+    "pod-metrics": "PodMetricsList",
+    "node-metrics": "NodeMetricsList",
+}
+
+ROUTES = [
+    r"^/api/v1/(?P<resource>pods|nodes|events|namespaces)$",
+    r"^/api/v1/namespaces/(?P<ns>[^/]+)/(?P<resource>pods|events)$",
+    r"^/api/v1/namespaces/(?P<ns>[^/]+)/(?P<resource>pods|events)/(?P<name>[^/]+)$",
+    r"^/api/v1/(?P<resource>nodes|namespaces)/(?P<name>[^/]+)$",
+    r"^/apis/apps/v1/(?P<resource>deployments|replicasets)$",
+    r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/(?P<resource>deployments|replicasets)$",
+    r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/(?P<resource>deployments|replicasets)/(?P<name>[^/]+)$",
+    r"^/apis/metrics.k8s.io/v1beta1/(?P<metrics>pods|nodes)$",
+    r"^/apis/metrics.k8s.io/v1beta1/namespaces/(?P<ns>[^/]+)/(?P<metrics>pods)$",
+]
+ROUTES = [re.compile(route) for route in ROUTES]
+
+
+class ClusterStore:
+    """Objects per resource, indexed by namespace and by (namespace, name)."""
+
+    def __init__(self, cluster):
+        namespaces = [
+            {"metadata": {"name": name, "uid": f"namespace-{name}"}}
+            for name in cluster.namespaces
+        ]
+        self.objects = {
+            "pods": cluster.pods,
+            "nodes": cluster.nodes,
+            "events": cluster.events,
+            "namespaces": namespaces,
+            "deployments": cluster.deployments,
+            "replicasets": cluster.replicasets,
+            "pod-metrics": cluster.pod_metrics(),
+            "node-metrics": cluster.node_metrics(),
+        }
+        self.by_namespace = {}
+        self.by_name = {}
+        for resource, items in self.objects.items():
+            for item in items:
+                metadata = item["metadata"]
+                namespace = metadata.get("namespace")
+                self.by_namespace.setdefault((resource, namespace), []).append(item)
+                self.by_name[(resource, namespace, metadata["name"])] = item
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    def count(self, resource):
+        with self.lock:
+            self.requests[resource] += 1
+
+
+def _matches(item, selector):
+    # Equality-based selectors (a=b, a==b, a!=b) and existence (a, !a); like
+    # the API server, a!=b also matches objects without the label
+    labels = item["metadata"].get("labels") or {}
+    for term in filter(None, (term.strip() for term in selector.split(","))):
+        if "!=" in term:
+            key, value = term.split("!=", 1)
+            if labels.get(key.strip()) == value.strip():
+                return False
+        elif "=" in term:
+            key, value = term.replace("==", "=", 1).split("=", 1)
+            if labels.get(key.strip()) != value.strip():
+                return False
+        elif term.startswith("!"):
+            if term[1:].strip() in labels:
+                return False
+        elif term not in labels:
+            return False
+    return True
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self, message):
+        self._send_json(
+            404,
+            {
+                "kind": "Status",
+                "apiVersion": "v1",
+                "status": "Failure",
+                "message": message,
+                "reason": "NotFound",
+                "code": 404,
+            },
+        )
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/version":
+            self._send_json(
+                200, {"major": "1", "minor": "30", "gitVersion": "v1.30.0-fake"}
+            )
+            return
+
+        match = next(filter(None, (route.match(url.path) for route in ROUTES)), None)
+        if match is None:
+            self._not_found(
+                f"the server could not find the requested resource {url.path}"
+            )
+            return
+
+        groups = match.groupdict()
+        if groups.get("metrics"):
+            resource = f"{groups['metrics'][:-1]}-metrics"
+        else:
+            resource = groups["resource"]
+        self.store.count(resource)
+        namespace, name = groups.get("ns"), groups.get("name")
+
+        if name is not None:
+            item = self.store.by_name.get((resource, namespace, name))
+            if item is None:
+                self._not_found(f'{resource} "{name}" not found')
+            else:
+                self._send_json(200, item)
+            return
+
+        if namespace is not None:
+            items = self.store.by_namespace.get((resource, namespace), [])
+        else:
+            items = self.store.objects[resource]
+        if "labelSelector" in query:
+            items = [item for item in items if _matches(item, query["labelSelector"])]
+
+        if query.get("watch") in ("true", "1"):
+            self._watch(items)
+            return
+
+        start = (
+            int(base64.b64decode(query["continue"]).decode())
+            if query.get("continue")
+            else 0
+        )
+        limit = int(query.get("limit") or 0)
+        end = start + limit if limit else len(items)
+        metadata = {"resourceVersion": RESOURCE_VERSION}
+        if end < len(items):
+            metadata["continue"] = base64.b64encode(str(end).encode()).decode()
+            metadata["remainingItemCount"] = len(items) - end
+
+        items = items[start:end]
+        if "as=PartialObjectMetadataList" in self.headers.get("Accept", ""):
+            items = [
+                {
+                    "kind": "PartialObjectMetadata",
+                    "apiVersion": "meta.k8s.io/v1",
+                    "metadata": item["metadata"],
+                }
+                for item in items
+            ]
+            kind, api_version = "PartialObjectMetadataList", "meta.k8s.io/v1"
+        else:
+            kind, api_version = LIST_KINDS[resource], "v1"
+        self._send_json(
+            200,
+            {
+                "kind": kind,
+                "apiVersion": api_version,
+                "metadata": metadata,
+                "items": items,
+            },
+        )
+
+    def _watch(self, items):
+        # Replay the current state as ADDED events, then end the stream
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for item in items:
+            line = json.dumps({"type": "ADDED", "object": item}).encode("utf-8") + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(cluster, host="127.0.0.1", port=0):
+    """Start the API server in a daemon thread and return (server, store)."""
+    store = ClusterStore(cluster)
+    handler = type("Handler", (FakeApiHandler,), {"store": store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, store
+
+
+def write_kubeconfig(path, server_url):
+    """Write a kubeconfig pointing at the fake API server."""
+    kubeconfig = {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "clusters": [{"name": "fake", "cluster": {"server": server_url}}],
+        "users": [{"name": "fake", "user": {"token": "benchmark"}}],
+        "contexts": [{"name": "fake", "context": {"cluster": "fake", "user": "fake"}}],
+        "current-context": "fake",
+    }
+    with open(path, "w") as f:
+        json.dump(kubeconfig, f)
+    return path
@@ -0,0 +1,461 @@
+"""Benchmark k8spulse against a synthetic cluster served by a local fake API server.
+
+    python benchmarks/run.py --preset small
+    python benchmarks/run.py --preset medium --save-baseline
+    python benchmarks/run.py --pods 20000 --nodes 800 --crashloop-ratio 0.1
+
+Every detector runs alone in a fresh worker process (so its peak RSS is its
+own, and it fetches its own resources) and then all of them run as one batch
+over a shared fetch like the CLI does, followed by the DB write and report
+rendering, to measure an end-to-end cycle. Results are compared against
+benchmarks/baseline.json.
+"""
+
+import importlib
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from synthetic_cluster import PRESETS, SyntheticCluster  # noqa: E402
+from fake_apiserver import serve, write_kubeconfig  # noqa: E402
+
+console = Console(stderr=True)
+
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Result key, module and function of every benchmarked detector. Zombie
+# detection (kubectl exec) and Cast.AI events (external API) are not covered.
+DETECTORS = [
+    ("total_deployments", "k8spulse.detector.deployments", "get_deployments_count"),
+    (
+        "deployments_with_replicas",
+        "k8spulse.detector.deployments",
+        "get_deployments_with_replicas",
+    ),
+    (
+        "deployments_with_zero_replicas",
+        "k8spulse.detector.deployments",
+        "get_deployments_with_zero_replicas",
+    ),
+    (
+        "deployments_with_exact_replicas",
+        "k8spulse.detector.deployments",
+        "get_deployments_with_exact_replicas",
+    ),
+    ("container_restarts", "k8spulse.detector.deployments", "get_container_restarts"),
+    (
+        "deployments_with_crashloopbackoff",
+        "k8spulse.detector.deployments",
+        "get_deployments_with_crashloopbackoff",
+    ),
+    (
+        "deployment_snapshots",
+        "k8spulse.detector.deployments",
+        "get_deployment_snapshots",
+    ),
+    ("node_pool_summary", "k8spulse.detector.deployments", "get_node_pool_summary"),
+    ("nodes_with_issues", "k8spulse.detector.status", "get_nodes_with_issues"),
+    ("unusual_events", "k8spulse.detector.status", "get_unusual_events"),
+    ("semaphore_statuses", "k8spulse.detector.status", "get_semaphore_status"),
+    ("resource_metrics", "k8spulse.detector.resources", "get_cluster_resource_metrics"),
+]
+
+
+def _serve_cluster(cluster_options, connection):
+    # Runs in its own process so serialization does not compete with the
+    # detectors for the GIL
+    server, _ = serve(SyntheticCluster(**cluster_options))
+    connection.send(server.server_address[1])
+    threading.Event().wait()
+
+
+def _run_detector(module_name, function_name):
+    from k8spulse.metrics import run_instrumented
+
+    func = getattr(importlib.import_module(module_name), function_name)
+    return run_instrumented(func)
+
+
+def _quiet_worker():
+    # Detectors log every step; keep the benchmark output readable
+    sys.stdout = open(os.devnull, "w")
+    # The API classes import their models when first created; long-lived CLI
+    # workers pay that once, so keep it out of the measured runs
+    from kubernetes import client, config
+
+    config.load_kube_config()
+    client.CoreV1Api(), client.AppsV1Api(), client.CustomObjectsApi()
+
+
+def _summarize_api(stats):
+    api = stats["api"].values()
+    return {
+        "api_calls": sum(a["calls"] for a in api),
+        "api_bytes": sum(a["bytes"] for a in api),
+        "api_objects": sum(a["objects"] for a in api),
+    }
+
+
+def benchmark_detectors(repeat, skip):
+    results = {}
+    for key, module_name, function_name in DETECTORS:
+        if key in skip:
+            continue
+        durations = []
+        for _ in range(repeat):
+            # A fresh process per run, so max RSS belongs to this detector only
+            with ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_quiet_worker,
+            ) as executor:
+                _, stats = executor.submit(
+                    _run_detector, module_name, function_name
+                ).result()
+            durations.append(stats["duration"])
+        results[key] = {
+            "seconds": round(statistics.median(durations), 4),
+            "seconds_min": round(min(durations), 4),
+            "max_rss_mb": round(stats["max_rss_bytes"] / 2**20, 1),
+            **_summarize_api(stats),
+        }
+        console.log(f"{key}: {results[key]['seconds']}s")
+    return results
+
+
+def benchmark_cycle(skip):
+    """Run every detector over a shared fetch, then save, chart and render like the CLI."""
+    from k8spulse.atomic_file import write_atomic
+    from k8spulse.db import load_report_history, save_report_history, stream_html_report
+    from k8spulse.detector.plugins import load_detectors, run_detectors
+    from k8spulse.section_cache import SectionCache
+    from k8spulse.svg_charts import (
+        generate_dial_gauge_svg,
+        generate_line_chart_svg,
+        generate_resource_dial_gauge_svg,
+    )
+
+    stages = {}
+    start = time.perf_counter()
+    detectors = [load_detectors()[key] for key, _, _ in DETECTORS if key not in skip]
+    with ProcessPoolExecutor(max_workers=1, initializer=_quiet_worker) as executor:
+        outcomes, errors, fetch_stats = executor.submit(
+            run_detectors, detectors
+        ).result()
+    for key, error in errors.items():
+        console.log(f"[red]{key} failed: {error}[/red]")
+    results = {key: result for key, (result, _) in outcomes.items()}
+    api_calls = _summarize_api(fetch_stats)["api_calls"] if fetch_stats else 0
+    stages["detectors"] = time.perf_counter() - start
+
+    resources = results.get("resource_metrics") or {
+        "total_cpu_capacity_mcores": 1,
+        "total_memory_capacity_mib": 1,
+        "total_cpu_requested_mcores": 0,
+        "total_memory_requested_mib": 0,
+        "total_cpu_used_mcores": 0,
+        "total_memory_used_mib": 0,
+    }
+    total = results.get("total_deployments", 0) or 1
+    data = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "total_deployments": total,
+        "deployments_with_replicas": results.get("deployments_with_replicas", 0),
+        "deployments_with_zero_replicas": results.get(
+            "deployments_with_zero_replicas", 0
+        ),
+        "deployments_with_recent_start": results.get(
+            "deployments_with_recent_start", 0
+        ),
+        "deployments_with_exact_replicas": results.get(
+            "deployments_with_exact_replicas", 0
+        ),
+        "deployments_with_crashloopbackoff": results.get(
+            "deployments_with_crashloopbackoff", 0
+        ),
+        "nodes_with_issues": results.get("nodes_with_issues", []),
+        "zombie_processes": [],
+        "cpu_used_percentage": 100
+        * resources["total_cpu_used_mcores"]
+        / resources["total_cpu_capacity_mcores"],
+        "cpu_requested_percentage": 100
+        * resources["total_cpu_requested_mcores"]
+        / resources["total_cpu_capacity_mcores"],
+        "memory_used_percentage": 100
+        * resources["total_memory_used_mib"]
+        / resources["total_memory_capacity_mib"],
+        "memory_requested_percentage": 100
+        * resources["total_memory_requested_mib"]
+        / resources["total_memory_capacity_mib"],
+        "cast_events": [],
+        "node_pool_summary": results.get(
+            "node_pool_summary",
+            {"deployments_per_node_pool": {}, "pods_per_node_pool": {}},
+        ),
+        "deployment_snapshots": results.get("deployment_snapshots"),
+    }
+
+    stage_start = time.perf_counter()
+    save_report_history(data)
+    stages["db_write"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    history_df = load_report_history(as_dataframe=True, with_details=False)
+    history_data = load_report_history()
+    stages["history_load"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    gauges = {
+        name: generate_dial_gauge_svg(data[key], name, max_value=total)
+        for name, key in [
+            ("gauge_chart_deployments_with_replicas", "deployments_with_replicas"),
+            ("gauge_chart_deployments_zero_replicas", "deployments_with_zero_replicas"),
+            ("gauge_chart_exact_replicas", "deployments_with_exact_replicas"),
+            ("gauge_chart_crashloopbackoff", "deployments_with_crashloopbackoff"),
+            ("gauge_chart_recently_restarted", "deployments_with_recent_start"),
+        ]
+    }
+    gauges["gauge_cluster_resource_metrics_cpu"] = generate_resource_dial_gauge_svg(
+        "cpu", resources
+    )
+    gauges["gauge_cluster_resource_metrics_memory"] = generate_resource_dial_gauge_svg(
+        "memory", resources
+    )
+    gauges["line_chart_image"] = generate_line_chart_svg(history_df)
+    stages["charts"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    # A cold cache, as in the first cycle of the CLI
+    section_cache = SectionCache()
+    rendered_sections = {
+        "unusual_events_list": section_cache.render(
+            "unusual_events_list", results.get("unusual_events", [])
+        ),
+        "cast_events_list": section_cache.render("cast_events_list", []),
+        "zombie_processes_list": section_cache.render("zombie_processes_list", []),
+        "node_issues_list": section_cache.render(
+            "node_issues_list", data["nodes_with_issues"]
+        ),
+        "history_table": section_cache.render("history_table", history_data),
+    }
+    context = {
+        **data,
+        **results.get("semaphore_statuses", {}),
+        **gauges,
+        "env_name": "benchmark",
+        "unusual_events": results.get("unusual_events", []),
+        "history_data": history_data,
+        "rendered_sections": rendered_sections,
+        "chart_format": "svg",
+        "use_ai": False,
+        "zombies": False,
+        "zombies_processes": [],
+    }
+    os.makedirs("docs", exist_ok=True)
+    write_atomic(
+        "docs/benchmark_statistics.html",
+        stream_html_report("report_template.html", context),
+    )
+    stages["render"] = time.perf_counter() - stage_start
+
+    return {
+        "seconds": round(time.perf_counter() - start, 4),
+        "stages": {name: round(seconds, 4) for name, seconds in stages.items()},
+        "api_calls": api_calls,
+        "main_max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "workers_max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print results next to the baseline and return the regressed metrics."""
+    table = Table(title=f"k8spulse benchmark: {results['name']}")
+    for column in ("metric", "baseline", "current", "change"):
+        table.add_column(column, justify="left" if column == "metric" else "right")
+
+    rows = [
+        (
+            "cycle.seconds",
+            results["cycle"]["seconds"],
+            baseline.get("cycle", {}).get("seconds"),
+        )
+    ]
+    rows += [
+        (
+            f"{key}.{metric}",
+            values[metric],
+            baseline.get("detectors", {}).get(key, {}).get(metric),
+        )
+        for key, values in results["detectors"].items()
+        for metric in ("seconds", "api_calls", "max_rss_mb")
+    ]
+
+    regressions = []
+    for metric, current, previous in rows:
+        change = ""
+        if previous:
+            ratio = current / previous - 1
+            change = f"{ratio:+.0%}"
+            if ratio > threshold:
+                regressions.append(metric)
+                change = f"[red]{change}[/red]"
+        table.add_row(
+            metric, str(previous if previous is not None else "-"), str(current), change
+        )
+    Console().print(table)
+    return regressions
+
+
+@click.command()
+@click.option(
+    "--preset",
+    type=click.Choice(sorted(PRESETS)),
+    default="small",
+    help="Cluster size preset.",
+)
+@click.option(
+    "--pods", type=int, default=None, help="Number of pods (overrides the preset)."
+)
+@click.option(
+    "--nodes", type=int, default=None, help="Number of nodes (overrides the preset)."
+)
+@click.option(
+    "--crashloop-ratio",
+    default=0.02,
+    help="Fraction of deployments in CrashLoopBackOff.",
+)
+@click.option("--notready-ratio", default=0.01, help="Fraction of NotReady nodes.")
+@click.option("--seed", default=0, help="Seed of the generated cluster.")
+@click.option("--repeat", default=3, help="Runs per detector; the median is reported.")
+@click.option(
+    "--skip",
+    multiple=True,
+    help="Detector to skip, e.g. node_pool_summary. Can be repeated.",
+)
+@click.option(
+    "--output", default=None, help="Also write the results as JSON to this file."
+)
+@click.option(
+    "--baseline",
+    "baseline_file",
+    default=BASELINE_FILE,
+    help="Baseline file to compare with.",
+)
+@click.option(
+    "--save-baseline",
+    is_flag=True,
+    help="Store these results as the baseline for this cluster size.",
+)
+@click.option(
+    "--threshold", default=0.25, help="Relative slowdown reported as a regression."
+)
+@click.option(
+    "--fail-on-regression",
+    is_flag=True,
+    help="Exit with status 1 when a metric regressed.",
+)
+def main(
+    preset,
+    pods,
+    nodes,
+    crashloop_ratio,
+    notready_ratio,
+    seed,
+    repeat,
+    skip,
+    output,
+    baseline_file,
+    save_baseline,
+    threshold,
+    fail_on_regression,
+):
+    cluster_options = dict(PRESETS[preset])
+    if pods is not None:
+        cluster_options["pods"] = pods
+    if nodes is not None:
+        cluster_options["nodes"] = nodes
+    cluster_options.update(
+        crashloop_ratio=crashloop_ratio, notready_ratio=notready_ratio, seed=seed
+    )
+    name = (
+        preset
+        if (pods, nodes, crashloop_ratio, notready_ratio, seed)
+        == (None, None, 0.02, 0.01, 0)
+        else "custom-{pods}p-{nodes}n".format(**cluster_options)
+    )
+
+    console.log(
+        f"Generating {cluster_options['pods']} pods on {cluster_options['nodes']} nodes..."
+    )
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=_serve_cluster, args=(cluster_options, child), daemon=True
+    )
+    server.start()
+    port = parent.recv()
+
+    output = os.path.abspath(output) if output else None
+    baseline_file = os.path.abspath(baseline_file)
+    workdir = tempfile.mkdtemp(prefix="k8spulse-benchmark-")
+    os.environ["KUBECONFIG"] = write_kubeconfig(
+        os.path.join(workdir, "kubeconfig"), f"http://127.0.0.1:{port}"
+    )
+    # k8spulse keeps its SQLite database in the working directory
+    os.chdir(workdir)
+
+    try:
+        results = {
+            "name": name,
+            "cluster": cluster_options,
+            "python": sys.version.split()[0],
+            "detectors": benchmark_detectors(repeat, set(skip)),
+            "cycle": benchmark_cycle(set(skip)),
+        }
+    finally:
+        server.terminate()
+
+    print(json.dumps(results, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            baselines = json.load(f)
+    regressions = compare(results, baselines.get(name, {}), threshold)
+
+    if save_baseline:
+        baselines[name] = results
+        with open(baseline_file, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        console.log(f"Saved baseline {name!r} to {baseline_file}")
+    if regressions and fail_on_regression:
+        console.log(
+            f"[red]Regressions above {threshold:.0%}: {', '.join(regressions)}[/red]"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Deterministic synthetic Kubernetes clusters for the benchmark API server."""
+
+import random
+import string
+from datetime import datetime, timedelta, timezone
+
+# Cluster sizes used by the benchmark presets
+PRESETS = {
+    "small": {"pods": 1_000, "nodes": 100},
+    "medium": {"pods": 10_000, "nodes": 1_000},
+    "large": {"pods": 50_000, "nodes": 2_500},
+    "xlarge": {"pods": 100_000, "nodes": 5_000},
+}
+
+NODE_POOLS = ["default-pool", "spot-pool", "highmem-pool", "gpu-pool"]
+
+
+def _timestamp(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class SyntheticCluster:
+    """Objects of a generated cluster, as the JSON the API server would return.
+
+    Pods are spread over `pods_per_deployment`-sized deployments across
+    namespaces (the first one is "default", where the metrics detector looks)
+    and over nodes in a few node pools, each deployment owning its pods
+    through one ReplicaSet. A `crashloop_ratio` fraction of the
+    deployments has its pods in CrashLoopBackOff and a `notready_ratio`
+    fraction of the nodes is NotReady. The same seed always yields the same
+    cluster.
+    """
+
+    def __init__(
+        self,
+        pods=1_000,
+        nodes=100,
+        pods_per_deployment=4,
+        deployments_per_namespace=50,
+        crashloop_ratio=0.02,
+        notready_ratio=0.01,
+        restart_ratio=0.05,
+        seed=0,
+    ):
+        self.random = random.Random(seed)
+        self.now = datetime(2024, 11, 8, 12, 0, 0, tzinfo=timezone.utc)
+        self.crashloop_ratio = crashloop_ratio
+        self.notready_ratio = notready_ratio
+        self.restart_ratio = restart_ratio
+
+        self.nodes = [self._node(i) for i in range(nodes)]
+        self.deployments = []
+        self.replicasets = []
+        self.pods = []
+        self.events = []
+
+        deployment_count = max(1, pods // pods_per_deployment)
+        for i in range(deployment_count):
+            namespace = (
+                "default"
+                if i < deployments_per_namespace
+                else f"team-{i // deployments_per_namespace}"
+            )
+            replicas = pods // deployment_count + (
+                1 if i < pods % deployment_count else 0
+            )
+            self._add_deployment(namespace, f"service-{i}", replicas)
+
+        # System deployments read by get_semaphore_status
+        for name in ("metrics-server", "kube-dns", "coredns"):
+            self._add_deployment("kube-system", name, 2)
+        for name in (
+            "castai-agent",
+            "castai-workload-autoscaler",
+            "castai-cluster-controller",
+        ):
+            self._add_deployment("castai-agent", name, 1)
+
+        self.namespaces = sorted({d["metadata"]["namespace"] for d in self.deployments})
+
+    def _suffix(self, length, alphabet=string.ascii_lowercase + string.digits):
+        return "".join(self.random.choices(alphabet, k=length))
+
+    def _node(self, i):
+        pool = NODE_POOLS[i % len(NODE_POOLS)]
+        ready = self.random.random() >= self.notready_ratio
+        return {
+            "metadata": {
+                "name": f"gke-prod-{pool}-{self._suffix(8, '0123456789abcdef')}-{i}",
+                "uid": f"node-{i}",
+                "labels": {"cloud.google.com/gke-nodepool": pool},
+            },
+            "status": {
+                "capacity": {"cpu": "8", "memory": "32Gi", "pods": "110"},
+                "allocatable": {"cpu": "7910m", "memory": "29Gi", "pods": "110"},
+                "conditions": [
+                    {
+                        "type": "Ready",
+                        "status": "True" if ready else "False",
+                        "reason": "KubeletReady" if ready else "KubeletNotReady",
+                        "lastTransitionTime": _timestamp(self.now),
+                    }
+                ],
+            },
+        }
+
+    def _add_deployment(self, namespace, name, replicas):
+        crashloop = self.random.random() < self.crashloop_ratio
+        pod_template_hash = self._suffix(10, "bcdfghjklmnpqrstvwxz2456789")
+        ready = 0
+
+        for _ in range(replicas):
+            pod = self._pod(namespace, name, pod_template_hash, crashloop)
+            self.pods.append(pod)
+            if not crashloop:
+                ready += 1
+
+        uid = f"deployment-{len(self.deployments)}"
+        self.replicasets.append(
+            {
+                "metadata": {
+                    "name": f"{name}-{pod_template_hash}",
+                    "namespace": namespace,
+                    "uid": f"rs-{name}-{pod_template_hash}",
+                    "resourceVersion": "1",
+                    "labels": {"app": name, "pod-template-hash": pod_template_hash},
+                    "ownerReferences": [
+                        {
+                            "apiVersion": "apps/v1",
+                            "kind": "Deployment",
+                            "name": name,
+                            "uid": uid,
+                            "controller": True,
+                        }
+                    ],
+                },
+                "spec": {
+                    "replicas": replicas,
+                    "selector": {
+                        "matchLabels": {
+                            "app": name,
+                            "pod-template-hash": pod_template_hash,
+                        }
+                    },
+                },
+                "status": {"replicas": replicas, "readyReplicas": ready},
+            }
+        )
+        self.deployments.append(
+            {
+                "metadata": {
+                    "name": name,
+                    "namespace": namespace,
+                    "uid": uid,
+                    "labels": {"app": name},
+                },
+                "spec": {
+                    "replicas": replicas,
+                    "selector": {"matchLabels": {"app": name}},
+                    "template": {"metadata": {"labels": {"app": name}}},
+                },
+                "status": {
+                    "replicas": replicas,
+                    "readyReplicas": ready,
+                    "availableReplicas": ready,
+                },
+            }
+        )
+
+    def _pod(self, namespace, deployment, pod_template_hash, crashloop):
+        name = f"{deployment}-{pod_template_hash}-{self._suffix(5)}"
+        node = (
+            self.nodes[self.random.randrange(len(self.nodes))] if self.nodes else None
+        )
+        restarted = crashloop or self.random.random() < self.restart_ratio
+
+        if crashloop:
+            state = {
+                "waiting": {
+                    "reason": "CrashLoopBackOff",
+                    "message": "back-off 5m0s restarting failed container",
+                }
+            }
+        elif restarted:
+            finished_at = self.now - timedelta(minutes=self.random.randrange(30))
+            state = {
+                "terminated": {
+                    "exitCode": 137,
+                    "reason": "OOMKilled",
+                    "finishedAt": _timestamp(finished_at),
+                }
+            }
+        else:
+            state = {"running": {"startedAt": _timestamp(self.now - timedelta(days=1))}}
+
+        if restarted:
+            self.events.append(
+                {
+                    "metadata": {
+                        "name": f"{name}.{self._suffix(16, '0123456789abcdef')}",
+                        "namespace": namespace,
+                    },
+                    "involvedObject": {
+                        "kind": "Pod",
+                        "name": name,
+                        "namespace": namespace,
+                    },
+                    "type": "Warning",
+                    "reason": "BackOff",
+                    "message": f"Back-off restarting failed container {deployment}",
+                    "count": self.random.randrange(1, 50),
+                    "firstTimestamp": _timestamp(self.now - timedelta(hours=1)),
+                    "lastTimestamp": _timestamp(self.now),
+                }
+            )
+
+        return {
+            "metadata": {
+                "name": name,
+                "namespace": namespace,
+                "uid": f"pod-{len(self.pods)}",
+                "labels": {"app": deployment, "pod-template-hash": pod_template_hash},
+                "ownerReferences": [
+                    {
+                        "apiVersion": "apps/v1",
+                        "kind": "ReplicaSet",
+                        "name": f"{deployment}-{pod_template_hash}",
+                        "uid": f"rs-{deployment}-{pod_template_hash}",
+                        "controller": True,
+                    }
+                ],
+            },
+            "spec": {
+                "nodeName": node["metadata"]["name"] if node else None,
+                "containers": [
+                    {
+                        "name": deployment,
+                        "image": f"registry.example.com/{deployment}:1.0.0",
+                        "resources": {
+                            "requests": {"cpu": "100m", "memory": "128Mi"},
+                            "limits": {"cpu": "500m", "memory": "512Mi"},
+                        },
+                    }
+                ],
+            },
+            "status": {
+                "phase": "Running",
+                "startTime": _timestamp(self.now - timedelta(days=1)),
+                "containerStatuses": [
+                    {
+                        "name": deployment,
+                        "ready": not crashloop,
+                        "restartCount": (
+                            self.random.randrange(1, 20) if restarted else 0
+                        ),
+                        "image": f"registry.example.com/{deployment}:1.0.0",
+                        "imageID": "",
+                        "state": state,
+                    }
+                ],
+            },
+        }
+
+    def pod_metrics(self):
+        return [
+            {
+                "metadata": {
+                    "name": pod["metadata"]["name"],
+                    "namespace": pod["metadata"]["namespace"],
+                },
+                "timestamp": _timestamp(self.now),
+                "window": "30s",
+                "containers": [
+                    {
+                        "name": pod["spec"]["containers"][0]["name"],
+                        "usage": {
+                            "cpu": f"{self.random.randrange(1, 400) * 1_000_000}n",
+                            "memory": f"{self.random.randrange(32, 400) * 1024}Ki",
+                        },
+                    }
+                ],
+            }
+            for pod in self.pods
+        ]
+
+    def node_metrics(self):
+        return [
+            {
+                "metadata": {"name": node["metadata"]["name"]},
+                "timestamp": _timestamp(self.now),
+                "window": "30s",
+                "usage": {
+                    "cpu": f"{self.random.randrange(100, 7000)}m",
+                    "memory": f"{self.random.randrange(1, 28)}Gi",
+                },
+            }
+            for node in self.nodes
+        ]
@@ -0,0 +1,455 @@
+import json
+import operator
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import requests
+import yaml
+from rich.console import Console
+from k8spulse.detector.plugins import REQUEST_TIMEOUT
+from k8spulse.durations import parse_duration
+from k8spulse.metrics import metrics
+from k8spulse.svg_charts import resource_percentages
+
+console = Console()
+
+# Samples kept per metric; at one cycle every 15 seconds this is about 17 hours
+RING_CAPACITY = 4096
+
+# Default rules fire at the red threshold of the report gauges and resolve
+# once the value is back in the green band
+DEFAULT_RULES = [
+    {
+        "name": "CrashLoopBackOffHigh",
+        "metric": "crashloop_percentage",
+        "op": ">",
+        "threshold": 50,
+        "clear": 30,
+        "severity": "critical",
+        "summary": "More than half of the deployments have pods in CrashLoopBackOff",
+    },
+    {
+        "name": "ZeroReplicasHigh",
+        "metric": "zero_replicas_percentage",
+        "op": ">",
+        "threshold": 70,
+        "clear": 50,
+        "severity": "warning",
+        "summary": "Most deployments have no ready replica",
+    },
+    {
+        "name": "ReadyReplicasLow",
+        "metric": "replicas_percentage",
+        "op": "<",
+        "threshold": 60,
+        "clear": 80,
+        "severity": "warning",
+        "summary": "Few deployments have a ready replica",
+    },
+    {
+        "name": "ExactReplicasLow",
+        "metric": "exact_replicas_percentage",
+        "op": "<",
+        "threshold": 50,
+        "clear": 65,
+        "severity": "warning",
+        "summary": "Few deployments have all their replicas ready",
+    },
+    {
+        "name": "SustainedHighCPU",
+        "metric": "cpu_used_percentage",
+        "op": ">",
+        "threshold": 80,
+        "clear": 50,
+        "for": "10m",
+        "severity": "warning",
+        "summary": "Cluster CPU usage has been above 80% for 10 minutes",
+    },
+    {
+        "name": "SustainedHighMemory",
+        "metric": "memory_used_percentage",
+        "op": ">",
+        "threshold": 80,
+        "clear": 50,
+        "for": "10m",
+        "severity": "warning",
+        "summary": "Cluster memory usage has been above 80% for 10 minutes",
+    },
+]
+
+# Deployment counts that are also available as a percentage of all deployments
+DEPLOYMENT_PERCENTAGES = {
+    "replicas_percentage": "deployments_with_replicas",
+    "zero_replicas_percentage": "deployments_with_zero_replicas",
+    "exact_replicas_percentage": "deployments_with_exact_replicas",
+    "crashloop_percentage": "deployments_with_crashloopbackoff",
+    "recent_start_percentage": "deployments_with_recent_start",
+}
+
+# Detector an alert input comes from, when it is not the input's own key
+INPUT_DETECTORS = {"deployments_with_recent_start": "container_restarts"}
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+class RingBuffer:
+    """Fixed-size series of (timestamp, value) samples in NumPy arrays."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros(capacity)
+        self.size = 0
+        self._next = 0
+
+    def append(self, timestamp, value):
+        self.times[self._next] = timestamp
+        self.values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def last_time(self):
+        """Timestamp of the latest sample, or None when empty."""
+        return self.times[(self._next - 1) % self.capacity] if self.size else None
+
+    def window(self, since):
+        """Samples taken at or after since, oldest first, as (times, values)."""
+        start = (self._next - self.size) % self.capacity
+        order = (start + np.arange(self.size)) % self.capacity
+        times = self.times[order]
+        first = np.searchsorted(times, since, side="left")
+        return times[first:], self.values[order][first:]
+
+
+def _rate_per_minute(times, values):
+    if len(values) < 2 or times[-1] == times[0]:
+        return 0.0
+    return float((values[-1] - values[0]) / (times[-1] - times[0]) * 60)
+
+
+AGGREGATES = {
+    "last": lambda times, values: float(values[-1]),
+    "mean": lambda times, values: float(values.mean()),
+    "min": lambda times, values: float(values.min()),
+    "max": lambda times, values: float(values.max()),
+    # Change of the value over the window, e.g. new crash-looping deployments
+    "increase": lambda times, values: float(values[-1] - values[0]),
+    "rate": _rate_per_minute,
+}
+
+
+class AlertRule:
+    """A threshold on a metric aggregated over a rolling window.
+
+    The rule fires once the aggregate has crossed threshold for for_seconds
+    and resolves only when it is back past clear (hysteresis; by default the
+    threshold itself), so a value hovering around the threshold does not
+    flap. aggregate is one of AGGREGATES, computed over the samples of the
+    last window seconds (0 uses the latest sample only).
+    """
+
+    def __init__(
+        self,
+        name,
+        metric,
+        threshold,
+        op=">",
+        clear=None,
+        window=0,
+        aggregate="last",
+        for_seconds=0,
+        severity="warning",
+        summary="",
+    ):
+        if op not in OPERATORS:
+            raise ValueError(
+                f"{name}: invalid operator {op!r}, expected one of: {', '.join(OPERATORS)}"
+            )
+        if aggregate not in AGGREGATES:
+            raise ValueError(
+                f"{name}: invalid aggregate {aggregate!r}, expected one of: {', '.join(AGGREGATES)}"
+            )
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.op = op
+        self.clear = threshold if clear is None else clear
+        self.window = window
+        self.aggregate = aggregate
+        self.for_seconds = for_seconds
+        self.severity = severity
+        self.summary = summary
+
+    @classmethod
+    def from_dict(cls, spec):
+        spec = dict(spec)
+        name = spec.get("name", "?")
+        try:
+            return cls(
+                spec.pop("name"),
+                spec.pop("metric"),
+                spec.pop("threshold"),
+                op=spec.pop("op", ">"),
+                clear=spec.pop("clear", None),
+                window=parse_duration(spec.pop("window", 0)),
+                aggregate=spec.pop("aggregate", "last"),
+                for_seconds=parse_duration(spec.pop("for", 0)),
+                severity=spec.pop("severity", "warning"),
+                summary=spec.pop("summary", ""),
+            )
+        except KeyError as e:
+            raise ValueError(f"alert rule {name} is missing {e}")
+
+    def crossed(self, value):
+        return OPERATORS[self.op](value, self.threshold)
+
+    def cleared(self, value):
+        return not OPERATORS[self.op](value, self.clear)
+
+
+def load_rules(path):
+    """Read alert rules from a YAML or JSON file holding a list of rule mappings."""
+    with open(path, "r", encoding="utf-8") as f:
+        specs = yaml.safe_load(f) or []
+    if isinstance(specs, dict):
+        specs = specs.get("rules", [])
+    return [AlertRule.from_dict(spec) for spec in specs]
+
+
+def alert_values(results, updated=None):
+    """The metrics alert rules can read, from the results of the detectors that reported.
+
+    Deployment counts are available under their detector key and as
+    percentages of all deployments (see DEPLOYMENT_PERCENTAGES), CPU and
+    memory as cpu_used_percentage and the like, and the number of nodes with
+    issues, unusual events and container restarts under nodes_with_issues,
+    unusual_events and restarts.
+
+    Returns (values, sampled_at). With updated, the time of the latest
+    result of every detector, sampled_at holds when each value was observed:
+    the time of the newest result it is computed from.
+    """
+    updated = updated or {}
+    values = {}
+    sampled_at = {}
+
+    def put(metric, value, *inputs):
+        values[metric] = value
+        times = [
+            updated[INPUT_DETECTORS.get(key, key)]
+            for key in inputs
+            if INPUT_DETECTORS.get(key, key) in updated
+        ]
+        if times:
+            sampled_at[metric] = max(times)
+
+    total = results.get("total_deployments")
+    if total is not None:
+        put("total_deployments", total, "total_deployments")
+    for name, key in DEPLOYMENT_PERCENTAGES.items():
+        if key in results:
+            put(key, results[key], key)
+            if total:
+                put(name, results[key] / total * 100, key, "total_deployments")
+    if "resource_metrics" in results:
+        for resource_type in ("cpu", "memory"):
+            _, used, requested = resource_percentages(
+                resource_type, results["resource_metrics"]
+            )
+            put(f"{resource_type}_used_percentage", used, "resource_metrics")
+            put(f"{resource_type}_requested_percentage", requested, "resource_metrics")
+    for key in ("nodes_with_issues", "unusual_events"):
+        if key in results:
+            put(key, len(results[key]), key)
+    if "deployment_snapshots" in results:
+        put(
+            "restarts",
+            sum(snapshot["restarts"] for snapshot in results["deployment_snapshots"]),
+            "deployment_snapshots",
+        )
+    return values, sampled_at
+
+
+class StdoutSink:
+    name = "stdout"
+
+    def send(self, alert):
+        print(json.dumps(alert, default=str), file=sys.stdout, flush=True)
+
+
+class FileSink:
+    """Append every notification as a JSON line to a file."""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, alert):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, default=str) + "\n")
+
+
+class WebhookSink:
+    """POST every notification as JSON to a URL, from a background thread.
+
+    Notifications are sent in order by a single worker, so a slow or
+    unreachable endpoint never delays the monitoring loop; failures are
+    logged and counted.
+    """
+
+    name = "webhook"
+
+    def __init__(self, url, timeout=REQUEST_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def send(self, alert):
+        self._executor.submit(self._post, alert)
+
+    def _post(self, alert):
+        try:
+            response = requests.post(
+                self.url,
+                data=json.dumps(alert, default=str),
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            metrics.inc("k8spulse_alert_notification_failures_total", sink=self.name)
+            console.log(
+                f"[red]Error sending alert {alert['rule']} to {self.url}: {e}[/red]"
+            )
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class AlertEngine:
+    """Evaluate alert rules over the values of every report cycle.
+
+    Each metric a rule reads is kept in a ring buffer, so rolling windows
+    are sliced and aggregated in NumPy without growing with uptime. A rule
+    goes from ok to pending when its condition first holds, to firing once
+    it has held for for_seconds, and back to ok when it clears; firing and
+    resolving are sent to every sink.
+    """
+
+    def __init__(self, rules, sinks, env_name=None, capacity=RING_CAPACITY):
+        self.rules = rules
+        self.sinks = sinks
+        self.env_name = env_name
+        self.series = {rule.metric: RingBuffer(capacity) for rule in rules}
+        self._states = {rule.name: ("ok", None) for rule in rules}
+
+    def evaluate(self, values, now=None, sampled_at=None):
+        """Record the new values of a cycle and return the notifications sent.
+
+        values maps metric names to numbers and sampled_at, optionally, to
+        the time each one was observed (default: now). A value is only
+        recorded when it is newer than the latest sample of its metric, so
+        a detector that did not run again adds nothing and windows are
+        weighted by time rather than by cycles. Rules are evaluated on new
+        samples only, at the time of the sample; metrics missing from values
+        (e.g. detectors without data or whose latest run failed) are neither
+        recorded nor evaluated, so their rules keep their state.
+        """
+        now = time.time() if now is None else now
+        sampled_at = sampled_at or {}
+        recorded = set()
+        for metric, series in self.series.items():
+            if values.get(metric) is None:
+                continue
+            at = sampled_at.get(metric, now)
+            last = series.last_time()
+            if last is not None and at <= last:
+                continue
+            series.append(at, values[metric])
+            recorded.add(metric)
+
+        notifications = []
+        for rule in self.rules:
+            if rule.metric not in recorded:
+                continue
+            series = self.series[rule.metric]
+            at = series.last_time()
+            times, samples = series.window(at - rule.window)
+            value = AGGREGATES[rule.aggregate](times, samples)
+            state, since = self._states[rule.name]
+
+            if state == "firing":
+                if rule.cleared(value):
+                    self._states[rule.name] = ("ok", None)
+                    notifications.append(
+                        self._notification(rule, "resolved", value, since, at)
+                    )
+                continue
+            if not rule.crossed(value):
+                self._states[rule.name] = ("ok", None)
+                continue
+            if state == "ok":
+                since = at
+            if at - since >= rule.for_seconds:
+                self._states[rule.name] = ("firing", since)
+                notifications.append(
+                    self._notification(rule, "firing", value, since, at)
+                )
+            else:
+                self._states[rule.name] = ("pending", since)
+
+        for rule in self.rules:
+            metrics.set(
+                "k8spulse_alert_firing",
+                int(self._states[rule.name][0] == "firing"),
+                rule=rule.name,
+            )
+        for notification in notifications:
+            self._send(notification)
+        return notifications
+
+    def firing(self):
+        """Names of the rules currently firing."""
+        return sorted(
+            name for name, (state, _) in self._states.items() if state == "firing"
+        )
+
+    def _notification(self, rule, status, value, since, now):
+        return {
+            "rule": rule.name,
+            "status": status,
+            "severity": rule.severity,
+            "env": self.env_name,
+            "metric": rule.metric,
+            "value": round(value, 6),
+            "threshold": rule.threshold if status == "firing" else rule.clear,
+            "summary": rule.summary,
+            "started_at": datetime.fromtimestamp(since).isoformat(timespec="seconds"),
+            "timestamp": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+        }
+
+    def _send(self, notification):
+        color = "red" if notification["status"] == "firing" else "green"
+        console.log(
+            f"[{color}]Alert {notification['rule']} {notification['status']}: "
+            f"{notification['metric']} is {notification['value']}[/{color}]"
+        )
+        for sink in self.sinks:
+            try:
+                sink.send(notification)
+                metrics.inc("k8spulse_alert_notifications_total", sink=sink.name)
+            except Exception as e:
+                metrics.inc(
+                    "k8spulse_alert_notification_failures_total", sink=sink.name
+                )
+                console.log(
+                    f"[red]Error sending alert to the {sink.name} sink: {e}[/red]"
+                )
+
+    def close(self):
+        for sink in self.sinks:
+            if hasattr(sink, "close"):
+                sink.close()
@@ -0,0 +1,106 @@
+import base64
+import glob
+import hashlib
+import os
+import re
+import threading
+import weakref
+from k8spulse.atomic_file import write_atomic
+
+# Every store of a directory, so an asset put by one environment of
+# --contexts is never pruned by another before its report references it
+_stores = {}
+_lock = threading.Lock()
+
+ASSET_NAME = r"[0-9a-f]{16}\.[a-z0-9]+"
+
+
+class AssetStore:
+    """Content-addressed report assets written next to the HTML reports.
+
+    Every asset is stored once as <subdir>/<sha256 prefix>.<extension>, so an
+    unchanged image, node description or event table keeps its URL between
+    cycles and is never rewritten or recommitted, and browsers can cache it.
+    With keep_contents, the content of every asset put since the last
+    take_contents() call is also kept in memory, to be served without disk.
+
+    prune() deletes the assets that no current report references, so the
+    directory only holds what the reports of the last cycle show.
+    """
+
+    def __init__(self, docs_dir, subdir="assets", keep_contents=False):
+        self.subdir = subdir
+        self.docs_dir = docs_dir
+        self.assets_dir = os.path.join(docs_dir, subdir)
+        self.keep_contents = keep_contents
+        self._put = set()  # names put since the last prune
+        self._written = []
+        self._contents = {}
+        os.makedirs(self.assets_dir, exist_ok=True)
+        with _lock:
+            _stores.setdefault(self.assets_dir, weakref.WeakSet()).add(self)
+
+    def put(self, content, extension):
+        """Store the content if it is new and return its URL relative to the report."""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        name = f"{hashlib.sha256(content).hexdigest()[:16]}.{extension}"
+        path = os.path.join(self.assets_dir, name)
+
+        with _lock:
+            self._put.add(name)
+            if not os.path.exists(path):
+                write_atomic(path, content)
+                self._written.append(path)
+        url = f"{self.subdir}/{name}"
+        if self.keep_contents:
+            self._contents[url] = content
+        return url
+
+    def put_chart(self, chart):
+        """Store a rendered chart (inline SVG or base64 PNG) and return its URL."""
+        if not chart:
+            return chart
+        if chart.startswith("<svg"):
+            return self.put(chart, "svg")
+        return self.put(base64.b64decode(chart), "png")
+
+    def take_written(self):
+        """Return the asset files created since the last call."""
+        written, self._written = self._written, []
+        return written
+
+    def take_contents(self):
+        """Return {url: content} of the assets put since the last call."""
+        contents, self._contents = self._contents, {}
+        return contents
+
+    def _referenced(self):
+        # Names of the assets linked from the reports on disk
+        pattern = re.compile(rf"{re.escape(self.subdir)}/({ASSET_NAME})")
+        names = set()
+        for report in glob.glob(os.path.join(self.docs_dir, "*.html")):
+            with open(report, encoding="utf-8", errors="replace") as f:
+                names.update(pattern.findall(f.read()))
+        return names
+
+    def prune(self):
+        """Delete the assets no current report references and return their paths.
+
+        Called once the report of the cycle is written. Assets of the reports
+        on disk are kept, and so are those put by any store of the directory
+        since its last prune, whose report may not be written yet.
+        """
+        with _lock:
+            keep = self._referenced()
+            for store in _stores.get(self.assets_dir, ()):
+                if store is not self:
+                    keep.update(store._put)
+            self._put = set()
+            removed = []
+            for path in glob.glob(os.path.join(self.assets_dir, "*")):
+                name = os.path.basename(path)
+                if re.fullmatch(ASSET_NAME, name) and name not in keep:
+                    os.remove(path)
+                    removed.append(path)
+            return removed
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import tempfile
+
+
+def _fsync_directory(directory):
+    # Persist the rename itself; not every platform can open a directory
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, chunks, unless_digest=None):
+    """Write text or bytes chunks to path without ever exposing a partial file.
+
+    The content goes to a temporary file in the same directory, is fsynced and
+    then renamed over path. Returns the sha256 hex digest of the content; when
+    it equals unless_digest (the digest of what path already holds), the
+    temporary file is dropped and path is left untouched.
+    """
+    if isinstance(chunks, (str, bytes)):
+        chunks = [chunks]
+    directory = os.path.dirname(os.path.abspath(path))
+    digest = hashlib.sha256()
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                digest.update(chunk)
+                f.write(chunk)
+            unchanged = digest.hexdigest() == unless_digest
+            if not unchanged:
+                f.flush()
+                os.fsync(f.fileno())
+        if unchanged:
+            os.unlink(tmp_path)
+            return unless_digest
+
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    _fsync_directory(directory)
+    return digest.hexdigest()
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from rich.console import Console
+from k8spulse.svg_charts import gauge_percentage, resource_percentages
+
+console = Console()
+
+# Bump whenever the look of the gauges changes so stale cached images are not reused
+STYLE_VERSION = 1
+
+
+class GaugeCache:
+    """LRU cache of rendered gauges keyed by quantized inputs, optionally backed by disk."""
+
+    def __init__(self, max_entries=256, cache_dir=None, quantum=1):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.quantum = quantum
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def quantize(self, percentage):
+        return round(percentage / self.quantum) * self.quantum
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.gauge")
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        image = None
+        if self.cache_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    image = f.read()
+
+        # Rendering happens outside the lock so gauges can render concurrently
+        rendered = image is None
+        if rendered:
+            image = render()
+            if self.cache_dir:
+                with open(self._disk_path(key), "w", encoding="utf-8") as f:
+                    f.write(image)
+
+        with self._lock:
+            if rendered:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._entries[key] = image
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return image
+
+    def dial_gauge(
+        self,
+        render,
+        value,
+        title,
+        min_value=0,
+        max_value=100,
+        direction="direct",
+        yellow_threshold=50,
+        red_threshold=80,
+    ):
+        # Render from the quantized percentage so a cached image always matches its key
+        percentage = self.quantize(gauge_percentage(value, min_value, max_value))
+        key = (
+            f"{render.__module__}.{render.__name__}",
+            percentage,
+            title,
+            direction,
+            yellow_threshold,
+            red_threshold,
+            STYLE_VERSION,
+        )
+        return self.get_or_render(
+            key,
+            lambda: render(
+                percentage,
+                title,
+                direction=direction,
+                yellow_threshold=yellow_threshold,
+                red_threshold=red_threshold,
+            ),
+        )
+
+    def resource_gauge(self, render, resource_type, metrics):
+        percentages = resource_percentages(resource_type, metrics)
+        if percentages is None:
+            return render(resource_type, metrics)
+        _, used_percentage, requested_percentage = percentages
+        used = self.quantize(used_percentage)
+        requested = self.quantize(requested_percentage)
+        key = (
+            f"{render.__module__}.{render.__name__}",
+            resource_type,
+            used,
+            requested,
+            STYLE_VERSION,
+        )
+        unit = "mcores" if resource_type == "cpu" else "mib"
+        quantized_metrics = {
+            f"total_{resource_type}_capacity_{unit}": 100,
+            f"total_{resource_type}_used_{unit}": used,
+            f"total_{resource_type}_requested_{unit}": requested,
+        }
+        return self.get_or_render(key, lambda: render(resource_type, quantized_metrics))
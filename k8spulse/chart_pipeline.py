@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from rich.console import Console
+
+console = Console()
+
+
+class ChartPipeline:
+    """Render independent charts concurrently in a pool of worker threads.
+
+    Threads only pay off for renderers that release the GIL, such as
+    matplotlib's Agg backend; with max_workers=1 the charts are rendered
+    inline, one after the other.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="charts")
+            if max_workers > 1
+            else None
+        )
+
+    def render(self, jobs):
+        """Run a dict of name -> callable and return a dict of name -> chart."""
+        if self._executor is None:
+            futures = None
+        else:
+            futures = {name: self._executor.submit(job) for name, job in jobs.items()}
+
+        charts = {}
+        for name, job in jobs.items():
+            try:
+                charts[name] = job() if futures is None else futures[name].result()
+            except Exception as e:
+                console.log(f"[red]Error occurred while rendering {name}: {e}[/red]")
+                charts[name] = ""
+        return charts
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
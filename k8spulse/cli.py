@@ -1,58 +1,149 @@
+import atexit
+import cProfile
+import json
 import os
+import re
+import threading
 import time
 import click
 from datetime import datetime
 from rich.console import Console
-from concurrent.futures import ProcessPoolExecutor, as_completed
-import subprocess
-
-from k8spulse.detector.deployments import (
-    get_deployments_count,
-    get_deployments_with_crashloopbackoff,
-    get_deployments_with_exact_replicas,
-    get_deployments_with_recent_restarts,
-    get_deployments_with_replicas,
-    get_deployments_with_zero_replicas,
-    get_node_pool_summary,
-)
-from k8spulse.detector.status import (
-    get_nodes_with_issues,
-    get_semaphore_status,
-    get_unusual_events,
-    get_latest_cast_events,
-)
-from k8spulse.detector.zombies import detect_zombie_processes_in_pods
-from k8spulse.charts import (
-    generate_dial_gauge_chart,
-    generate_line_chart,
-    generate_resource_dial_gauge,
-)
-from k8spulse.db import (
-    generate_index_html,
-    save_report_history,
-    load_report_history,
-    render_html_report,
-    prepare_history_data_for_template,
-)
-from k8spulse.openai_tools import get_openai_recommendation
-
-from k8spulse.detector.resources import get_cluster_resource_metrics
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from k8spulse.detector.plugins import REQUEST_TIMEOUT, load_detectors
+from k8spulse.durations import parse_duration
+from k8spulse.detector.sharding import Sharding
+from k8spulse.git_publisher import GitPublisher
+from k8spulse.metrics import current_rss_bytes, metrics, start_metrics_server
+from k8spulse.scheduler import DeadlineScheduler, DetectorSchedule
+from k8spulse.server import ReportDocuments, content_type_for, start_report_server
+from k8spulse.assets import AssetStore
+from k8spulse.atomic_file import write_atomic
+from k8spulse.chart_pipeline import ChartPipeline
+from k8spulse.report_diff import DIFFED_DETECTORS, count_changes, diff_results
+from k8spulse.restarts import RestartTracker
 
 console = Console()
 
+# Detectors whose results are recorded in the report history
+HISTORY_DETECTORS = (
+    "total_deployments",
+    "deployments_with_replicas",
+    "deployments_with_zero_replicas",
+    "deployments_with_exact_replicas",
+    "container_restarts",
+    "deployments_with_crashloopbackoff",
+    "resource_metrics",
+)
+
+
+def _parse_detector_periods(ctx, param, value):
+    keys = set(load_detectors())
+    periods = {}
+    for item in value:
+        key, _, seconds = item.partition("=")
+        if key not in keys:
+            raise click.BadParameter(
+                f"unknown detector {key!r}, expected one of: {', '.join(sorted(keys))}"
+            )
+        try:
+            periods[key] = float(seconds)
+        except ValueError:
+            raise click.BadParameter(
+                f"invalid period in {item!r}, expected NAME=SECONDS"
+            )
+        if periods[key] <= 0:
+            raise click.BadParameter(f"period of {key} must be positive")
+    return periods
+
+
+def _sharding(shard_workers, shard_page_size):
+    # Namespaced resources are listed cluster-wide unless --shard-workers is set
+    if not shard_workers:
+        return None
+    return Sharding(workers=shard_workers, page_size=shard_page_size)
+
+
+def _parse_contexts(ctx, param, value):
+    # Comma-separated and repeated values; "all" is every kubeconfig context
+    names = [name.strip() for item in value for name in item.split(",") if name.strip()]
+    if not names:
+        return []
+    from kubernetes import config
+
+    try:
+        available = [
+            context["name"] for context in config.list_kube_config_contexts()[0]
+        ]
+    except Exception as e:
+        raise click.BadParameter(f"cannot read the kubeconfig contexts: {e}")
+    if names == ["all"]:
+        return available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise click.BadParameter(
+            f"unknown context {unknown[0]!r}, expected one of: {', '.join(available)}"
+        )
+    return list(dict.fromkeys(names))
+
+
+def _context_env_name(context):
+    # Context names such as arn:aws:eks:...:cluster/prod become file-safe env names
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", context).strip("-") or "cluster"
+
+
+def _collect(chunks, collected):
+    # Pass the rendered chunks through while keeping them for the report server
+    for chunk in chunks:
+        collected.append(chunk)
+        yield chunk
+
+
+def _parse_history_window(ctx, param, value):
+    """Convert a window such as 6h, 2d, 1w or 3mo into a number of hours."""
+    try:
+        return parse_duration(value) / 3600
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
 
-# Main script logic using Click
-@click.command()
+# Main script logic using Click; without a subcommand, k8spulse monitors the
+# cluster and publishes the HTML report
+@click.group(invoke_without_command=True)
 @click.option("--env-name", default="staging", help="Environment name for the report.")
 @click.option(
-    "--interval", default=300, help="Interval in seconds between report generations."
+    "--contexts",
+    multiple=True,
+    callback=_parse_contexts,
+    help="Monitor these kubeconfig contexts (comma-separated, or all) from one process, each as an environment named after its context.",
+)
+@click.option(
+    "--interval",
+    default=300,
+    help="Interval in seconds between published reports (history, index and git).",
 )
 @click.option("--use-ai", is_flag=True, help="Use OpenAI to generate recommendations.")
+@click.option(
+    "--ai-token-budget",
+    default=1500,
+    help="Maximum size, in estimated tokens, of the cluster summary sent to OpenAI.",
+)
 @click.option(
     "--git-commit",
     is_flag=True,
     help="Commit and push the generated report to Git repository.",
 )
+@click.option(
+    "--git-interval",
+    default=0,
+    help="Minimum seconds between report commits; reports published in between are coalesced into the next commit.",
+)
+@click.option(
+    "--git-amend",
+    is_flag=True,
+    help="Amend the previous report commit instead of adding a new one, and force-push it with --force-with-lease.",
+)
 @click.option(
     "--zombies",
     is_flag=True,
@@ -60,224 +151,907 @@ console = Console()
     help="Detect Zombies.",
 )
 @click.option("--gpt-model", default="gpt-4o", help="GPT Model")
-def cli(env_name, interval, use_ai, git_commit, gpt_model, zombies):
+@click.option(
+    "--chart-format",
+    type=click.Choice(["svg", "png", "client"]),
+    default="svg",
+    help="Render charts as inline SVG, as matplotlib PNG images, or in the browser from a JSON history payload.",
+)
+@click.option(
+    "--history-asset",
+    is_flag=True,
+    help="With --chart-format client, write the history payload as a separate versioned .json file.",
+)
+@click.option(
+    "--gauge-cache-dir",
+    default=None,
+    help="Directory where rendered gauges are cached across restarts.",
+)
+@click.option(
+    "--history-window",
+    default="24h",
+    callback=_parse_history_window,
+    help="Time window of the history line chart, e.g. 6h, 7d, 2w or 3mo.",
+)
+@click.option(
+    "--render-workers",
+    default=4,
+    help="Number of worker threads used to render PNG charts.",
+)
+@click.option(
+    "--external-assets",
+    is_flag=True,
+    help="Write charts, node descriptions and event tables as content-hashed files under docs/assets instead of inlining them.",
+)
+@click.option(
+    "--detector-period",
+    "detector_periods",
+    multiple=True,
+    callback=_parse_detector_periods,
+    help="Override how often a detector runs, as NAME=SECONDS. Can be repeated.",
+)
+@click.option(
+    "--request-timeout",
+    default=REQUEST_TIMEOUT,
+    help="Seconds before a single Kubernetes or Cast.AI API call gives up.",
+)
+@click.option(
+    "--cycle-deadline",
+    default=60,
+    help="Seconds the report waits for slow detectors before rendering without them.",
+)
+@click.option(
+    "--shard-workers",
+    default=0,
+    type=click.IntRange(min=0),
+    help="List pods, deployments and events namespace by namespace on up to this many concurrent requests (0 lists them cluster-wide).",
+)
+@click.option(
+    "--shard-page-size",
+    default=500,
+    type=click.IntRange(min=1),
+    help="Objects per request when listing by namespace with --shard-workers.",
+)
+@click.option(
+    "--alert-rules",
+    default=None,
+    help="YAML or JSON file with alert rules; by default the rules mirror the red thresholds of the gauges.",
+)
+@click.option(
+    "--alert-webhook",
+    multiple=True,
+    help="POST firing and resolved alerts as JSON to this URL. Can be repeated.",
+)
+@click.option(
+    "--alert-file",
+    default=None,
+    help="Append firing and resolved alerts as JSON lines to this file.",
+)
+@click.option(
+    "--alert-stdout",
+    is_flag=True,
+    help="Print firing and resolved alerts as JSON lines.",
+)
+@click.option(
+    "--metrics-port",
+    type=int,
+    default=None,
+    help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics (JSON at /metrics.json).",
+)
+@click.option(
+    "--serve",
+    type=int,
+    default=None,
+    help="Serve the latest report, its assets and a JSON snapshot from memory on this port.",
+)
+@click.option(
+    "--serve-host",
+    default="127.0.0.1",
+    help="Address the --serve server listens on; use 0.0.0.0 to share it on the network.",
+)
+@click.option(
+    "--trace-file",
+    default=None,
+    help="Append a JSON trace of every report cycle to this file.",
+)
+@click.option(
+    "--profile",
+    default=None,
+    help="Directory where cProfile dumps of the main process and each detector run are written.",
+)
+@click.pass_context
+def cli(
+    ctx,
+    env_name,
+    contexts,
+    interval,
+    use_ai,
+    ai_token_budget,
+    git_commit,
+    git_interval,
+    git_amend,
+    gpt_model,
+    zombies,
+    chart_format,
+    gauge_cache_dir,
+    render_workers,
+    history_window,
+    history_asset,
+    external_assets,
+    detector_periods,
+    request_timeout,
+    cycle_deadline,
+    shard_workers,
+    shard_page_size,
+    alert_rules,
+    alert_webhook,
+    alert_file,
+    alert_stdout,
+    metrics_port,
+    serve,
+    serve_host,
+    trace_file,
+    profile,
+):
+    if ctx.invoked_subcommand is not None:
+        return
+    if contexts and zombies:
+        # The zombie check execs into pods through kubectl's current context
+        raise click.UsageError("--zombies cannot be combined with --contexts")
+
+    # The report stack (SQLite, pandas, Jinja, NumPy, OpenAI) is only
+    # imported to monitor, so subcommands such as snapshot start quickly
+    from k8spulse.db import (
+        init_db,
+        save_report_history,
+        load_report_history,
+        stream_html_report,
+        prepare_history_data_for_template,
+    )
+    from k8spulse.section_cache import SectionCache
+    from k8spulse import alerts
+    from k8spulse.openai_tools import Recommender, build_summary
+    from k8spulse.report_index import ReportIndex
+    from k8spulse.svg_charts import resource_percentages
+    from k8spulse.chart_cache import GaugeCache
+    from k8spulse.client_charts import (
+        build_history_payload,
+        chart_script,
+        dump_history_payload,
+        write_history_asset,
+    )
+
     template_name = "report_template.html"
+
+    # matplotlib is only imported when PNG charts are requested
+    if chart_format == "png":
+        from k8spulse.charts import MatplotlibChartRenderer
+
+        renderer = MatplotlibChartRenderer()
+        generate_dial_gauge_chart = renderer.dial_gauge
+        generate_line_chart = renderer.line_chart
+        generate_resource_dial_gauge = renderer.resource_gauge
+    else:
+        from k8spulse.svg_charts import (
+            generate_dial_gauge_svg as generate_dial_gauge_chart,
+            generate_line_chart_svg as generate_line_chart,
+            generate_resource_dial_gauge_svg as generate_resource_dial_gauge,
+        )
+    gauge_cache = GaugeCache(cache_dir=gauge_cache_dir)
+    # The SVG renderers are pure Python and hold the GIL, so threads would
+    # only add overhead; matplotlib releases it while Agg rasterizes
+    chart_pipeline = ChartPipeline(
+        max_workers=render_workers if chart_format == "png" else 1
+    )
+
     docs_dir = os.path.join(os.getcwd(), "docs")
     os.makedirs(docs_dir, exist_ok=True)
-    report_file = os.path.join(docs_dir, f"{env_name}_statistics.html")
+    report_index = ReportIndex(docs_dir)
 
-    while True:
-        console.log("[green]Starting Kubernetes monitoring cycle...[/green]")
-
-        with ProcessPoolExecutor() as executor:
-            futures = {
-                executor.submit(get_deployments_count): "total_deployments",
-                executor.submit(get_deployments_with_replicas): "deployments_with_replicas",
-                executor.submit(get_deployments_with_zero_replicas): "deployments_with_zero_replicas",
-                executor.submit(get_deployments_with_exact_replicas): "deployments_with_exact_replicas",
-                executor.submit(get_deployments_with_recent_restarts): "deployments_with_recent_start",
-                executor.submit(get_deployments_with_crashloopbackoff): "deployments_with_crashloopbackoff",
-                executor.submit(get_nodes_with_issues): "nodes_with_issues",
-                executor.submit(get_unusual_events): "unusual_events",
-                executor.submit(get_semaphore_status): "semaphore_statuses",
-                executor.submit(get_cluster_resource_metrics): "resource_metrics",
-                executor.submit(get_latest_cast_events): "cast_events",
-                executor.submit(get_node_pool_summary): "node_pool_summary",
-            }
+    # Every cluster of --contexts is its own environment, named after its
+    # context, with its own scheduler, history database, report and alerts;
+    # the detector workers, chart renderers, index, git and servers are shared
+    if contexts:
+        clusters = [(_context_env_name(context), context) for context in contexts]
+    else:
+        clusters = [(env_name, None)]
 
-            # Only submit zombie process detection if 'zombies' is True
-            if zombies:
-                futures[executor.submit(detect_zombie_processes_in_pods)] = "zombie_processes"
-
-            # Collect results as they complete
-            results = {}
-            for future in as_completed(futures):
-                key = futures[future]
-                try:
-                    results[key] = future.result()
-                except Exception as e:
-                    console.log(f"[red]Error occurred while fetching {key}: {e}[/red]")
-
-        # Extract results
-        total_deployments = results.get("total_deployments", 0)
-        deployments_with_replicas = results.get("deployments_with_replicas", 0)
-        deployments_with_zero_replicas = results.get("deployments_with_zero_replicas", 0)
-        deployments_with_exact_replicas = results.get("deployments_with_exact_replicas", 0)
-        deployments_with_recent_start = results.get("deployments_with_recent_start", 0)
-        deployments_with_crashloopbackoff = results.get("deployments_with_crashloopbackoff", 0)
-        nodes_with_issues = results.get("nodes_with_issues", [])
-        unusual_events = results.get("unusual_events", [])
-        semaphore_statuses = results.get("semaphore_statuses", [])
-        zombie_processes = results.get("zombie_processes", []) if zombies else []
-        resource_metrics = results.get("resource_metrics", {})
-        cast_events = results.get("cast_events", {})
-        node_pool_summary = results.get("node_pool_summary", {})
-
-        # Calculate and adjust percentages for CPU and memory
-        cpu_used_percentage = (
-            resource_metrics["total_cpu_used_mcores"]
-            / resource_metrics["total_cpu_capacity_mcores"]
-        ) * 100
-        cpu_requested_percentage = (
-            resource_metrics["total_cpu_requested_mcores"]
-            / resource_metrics["total_cpu_capacity_mcores"]
-        ) * 100
-
-        memory_used_percentage = (
-            resource_metrics["total_memory_used_mib"]
-            / resource_metrics["total_memory_capacity_mib"]
-        ) * 100
-        memory_requested_percentage = (
-            resource_metrics["total_memory_requested_mib"]
-            / resource_metrics["total_memory_capacity_mib"]
-        ) * 100
-
-        # Correct percentages if they are improbably low
-        if cpu_used_percentage < 1:
-            cpu_used_percentage *= 100
-
-        if cpu_requested_percentage < 1:
-            cpu_requested_percentage *= 100
-
-        if memory_used_percentage < 1:
-            memory_used_percentage *= 100
-
-        if memory_requested_percentage < 1:
-            memory_requested_percentage *= 100
-
-        # Save report history with added percentages
-        data = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "total_deployments": total_deployments,
-            "deployments_with_replicas": deployments_with_replicas,
-            "deployments_with_zero_replicas": deployments_with_zero_replicas,
-            "deployments_with_recent_start": deployments_with_recent_start,
-            "deployments_with_exact_replicas": deployments_with_exact_replicas,
-            "deployments_with_crashloopbackoff": deployments_with_crashloopbackoff,
-            "nodes_with_issues": nodes_with_issues,
-            "zombie_processes": zombie_processes,
-            # Add calculated percentages for CPU and memory usage
-            "cpu_used_percentage": cpu_used_percentage,
-            "cpu_requested_percentage": cpu_requested_percentage,
-            "memory_used_percentage": memory_used_percentage,
-            "memory_requested_percentage": memory_requested_percentage,
-            "cast_events": cast_events,
-            "node_pool_summary": node_pool_summary,
-        }
-
-        save_report_history(data)
-
-        # Load history data for generating charts
-        history_df = load_report_history(as_dataframe=True)
-
-        # Generate charts using dial gauges
-        gauge_chart_deployments_with_replicas = generate_dial_gauge_chart(
-            deployments_with_replicas,
-            "With Replicas",
-            max_value=total_deployments,
-            direction="direct",
-            red_threshold=60,
-            yellow_threshold=80,
-        )
-        gauge_chart_deployments_zero_replicas = generate_dial_gauge_chart(
-            deployments_with_zero_replicas,
-            "Zero Replicas",
-            max_value=total_deployments,
-            direction="inverse",
-            red_threshold=70,
-            yellow_threshold=50,
+    if metrics_port:
+        start_metrics_server(metrics_port)
+    git_publisher = None
+    if git_commit:
+        git_publisher = GitPublisher(
+            ", ".join(name for name, _ in clusters),
+            min_interval=git_interval,
+            amend=git_amend,
         )
-        gauge_chart_exact_replicas = generate_dial_gauge_chart(
-            deployments_with_exact_replicas,
-            "Exact Replicas",
-            max_value=total_deployments,
-            direction="direct",
-            red_threshold=50,
-            yellow_threshold=65,
-        )  # Example calculation
-        gauge_chart_crashloopbackoff = generate_dial_gauge_chart(
-            deployments_with_crashloopbackoff,
-            "CrashLoopBackOff",
-            max_value=total_deployments,
-            direction="inverse",
-            red_threshold=50,
-            yellow_threshold=30,
+        # Commit what is still queued when the monitor is stopped
+        atexit.register(git_publisher.close, 30)
+    recommender = None
+    if use_ai:
+        # One assistant and recommendation cache for every cluster
+        recommender = Recommender(gpt_model, token_budget=ai_token_budget)
+    rules = alert_sinks = None
+    if alert_rules or alert_webhook or alert_file or alert_stdout:
+        try:
+            rules = (
+                alerts.load_rules(alert_rules)
+                if alert_rules
+                else [alerts.AlertRule.from_dict(spec) for spec in alerts.DEFAULT_RULES]
+            )
+        except (OSError, ValueError) as e:
+            raise click.BadParameter(str(e), param_hint="--alert-rules")
+        alert_sinks = [
+            alerts.WebhookSink(url, timeout=request_timeout) for url in alert_webhook
+        ]
+        if alert_file:
+            alert_sinks.append(alerts.FileSink(alert_file))
+        if alert_stdout:
+            alert_sinks.append(alerts.StdoutSink())
+        console.log(f"[cyan]Evaluating {len(rules)} alert rules[/cyan]")
+    documents = None
+    if serve:
+        documents = ReportDocuments()
+        start_report_server(
+            documents,
+            serve,
+            serve_host,
+            index_path=f"/{clusters[0][0]}_statistics.html",
         )
-        gauge_chart_recently_restarted = generate_dial_gauge_chart(
-            deployments_with_recent_start,
-            "Restarted",
-            direction="inverse",
-            red_threshold=60,
-            yellow_threshold=30,
+    profiler = None
+    if profile:
+        # The main process is profiled cumulatively and every detector run in
+        # the workers is dumped separately; py-spy can instead attach to the
+        # logged PID with --subprocesses
+        os.makedirs(profile, exist_ok=True)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        console.log(
+            f"[cyan]Profiling to {profile} (main process PID {os.getpid()})[/cyan]"
         )
 
-        gauge_cluster_resource_metrics_cpu = generate_resource_dial_gauge(
-            "cpu", resource_metrics
+    detectors = load_detectors()
+    schedules = [
+        DetectorSchedule(detector, detector_periods.get(key))
+        for key, detector in detectors.items()
+        # Only schedule zombie process detection if 'zombies' is True
+        if zombies or key != "zombie_processes"
+    ]
+    # Detector batches beyond the worker count wait in the scheduler, by
+    # priority, rather than in the executor's queue
+    detector_workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=detector_workers)
+    sharding = _sharding(shard_workers, shard_page_size)
+
+    def monitor(env_name, kube_context=None, db_path=None):
+        report_file = os.path.join(docs_dir, f"{env_name}_statistics.html")
+        asset_store = (
+            AssetStore(docs_dir, keep_contents=bool(serve)) if external_assets else None
+        )
+        # Digest of the report file as last written
+        report_digest = None
+        report_path = f"/{os.path.basename(report_file)}"
+        snapshot_path = (
+            f"/{env_name}_snapshot.json" if kube_context else "/snapshot.json"
         )
-        gauge_cluster_resource_metrics_memory = generate_resource_dial_gauge(
-            "memory", resource_metrics
+        alert_engine = None
+        if rules is not None:
+            alert_engine = alerts.AlertEngine(rules, alert_sinks, env_name=env_name)
+            # Deliver the webhooks still queued when the monitor is stopped
+            atexit.register(alert_engine.close)
+
+        scheduler = DeadlineScheduler(
+            executor,
+            schedules,
+            profile_dir=profile,
+            request_timeout=request_timeout,
+            cycle_deadline=cycle_deadline,
+            sharding=sharding,
+            context=kube_context,
+            max_running=detector_workers,
         )
+        finished_detectors = set()
+        restart_tracker = RestartTracker()
+        last_published = None
+        recommendation = ""
+        section_cache = SectionCache()
+        # History only changes when a report is recorded, so it is loaded again
+        # after every write instead of on every cycle
+        history_df = history_data = None
+        # Results of the last published report, which the changes are relative to
+        baseline = None
+        baseline_timestamp = None
+        # Files written since the last publish that are committed with --git-commit
+        published_files = {report_file}
+        unpublished_changes = False
+
+        while True:
+            # Documents served from memory with --serve, by URL path
+            served = {}
+            scheduler.submit_due()
+            finished = scheduler.wait()
+            finished_detectors.update(finished)
+            if (
+                "container_restarts" in finished
+                and "container_restarts" not in scheduler.errors
+            ):
+                # Restarts are counted between consecutive runs of the detector
+                restarts = restart_tracker.update(
+                    scheduler.results["container_restarts"],
+                    scheduler.updated["container_restarts"],
+                )
+                metrics.inc("k8spulse_container_restarts_total", restarts["total"])
+                if restarts["deployments"]:
+                    console.log(
+                        f"[yellow]Containers restarted in {len(restarts['deployments'])} "
+                        f"deployments: {restarts['total']} restarts[/yellow]"
+                    )
+            # The first report waits for every detector, or for the cycle
+            # deadline when some of them straggle
+            if not scheduler.ready():
+                continue
+            if not finished_detectors and last_published is not None:
+                continue
+
+            cycle_start = time.perf_counter()
+            trace = {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "detectors": {
+                    key: scheduler.stats[key]
+                    for key in sorted(finished_detectors)
+                    if key in scheduler.stats
+                },
+            }
+            if kube_context:
+                trace["cluster"] = env_name
+            finished_detectors.clear()
+
+            # The report is re-rendered from the latest result of every detector;
+            # history, the index and git are only updated once per interval
+            now = time.time()
+            publish = last_published is None or now - last_published >= interval
+            if publish:
+                last_published = now
+                console.log("[green]Starting Kubernetes monitoring cycle...[/green]")
+            trace["publish"] = publish
+            # Detectors that failed or are disabled report the default of their
+            # output; stragglers and failed ones keep their last known result and
+            # are flagged as stale in the report
+            results = {
+                **{key: detector.default for key, detector in detectors.items()},
+                **scheduler.results,
+            }
+            # Deployments whose containers restarted recently, from the restart
+            # counters of the last runs
+            restart_rates = restart_tracker.rates()
+            results["deployments_with_recent_start"] = len(restart_rates)
+            stale_detectors = {
+                key: {
+                    "updated": (
+                        datetime.fromtimestamp(scheduler.updated[key]).strftime(
+                            "%H:%M:%S"
+                        )
+                        if key in scheduler.updated
+                        else None
+                    ),
+                    "reason": reason,
+                }
+                for key, reason in scheduler.stale().items()
+            }
+            if stale_detectors:
+                console.log(
+                    f"[yellow]Stale detectors: {', '.join(sorted(stale_detectors))}[/yellow]"
+                )
+            metrics.set("k8spulse_stale_detectors", len(stale_detectors))
+            trace["stale"] = sorted(stale_detectors)
+
+            # Alert rules see every cycle, whatever the publish interval
+            if alert_engine:
+                # Stale results are not evaluated, and every value is sampled
+                # when its detector produced it
+                reported = {
+                    key: value
+                    for key, value in scheduler.results.items()
+                    if key not in stale_detectors
+                }
+                if restart_tracker.samples and "container_restarts" in reported:
+                    reported["deployments_with_recent_start"] = len(restart_rates)
+                with metrics.stage("alerts", trace):
+                    values, sampled_at = alerts.alert_values(
+                        reported, scheduler.updated
+                    )
+                    notifications = alert_engine.evaluate(values, sampled_at=sampled_at)
+                trace["alerts"] = [
+                    f"{notification['rule']}:{notification['status']}"
+                    for notification in notifications
+                ]
+
+            # Extract results
+            total_deployments = results["total_deployments"]
+            deployments_with_replicas = results["deployments_with_replicas"]
+            deployments_with_zero_replicas = results["deployments_with_zero_replicas"]
+            deployments_with_exact_replicas = results["deployments_with_exact_replicas"]
+            deployments_with_recent_start = results["deployments_with_recent_start"]
+            deployments_with_crashloopbackoff = results[
+                "deployments_with_crashloopbackoff"
+            ]
+            nodes_with_issues = results["nodes_with_issues"]
+            unusual_events = results["unusual_events"]
+            semaphore_statuses = results["semaphore_statuses"]
+            zombie_processes = results["zombie_processes"] if zombies else []
+            resource_metrics = results["resource_metrics"]
+            cast_events = results["cast_events"]
+            node_pool_summary = results["node_pool_summary"]
+            deployment_snapshots = results["deployment_snapshots"]
+
+            # Calculate and adjust percentages for CPU and memory; a capacity of
+            # zero (no metrics yet) reports 0% instead of failing the cycle
+            _, cpu_used_percentage, cpu_requested_percentage = resource_percentages(
+                "cpu", resource_metrics
+            )
+            _, memory_used_percentage, memory_requested_percentage = (
+                resource_percentages("memory", resource_metrics)
+            )
+
+            # Save report history with added percentages
+            data = {
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "total_deployments": total_deployments,
+                "deployments_with_replicas": deployments_with_replicas,
+                "deployments_with_zero_replicas": deployments_with_zero_replicas,
+                "deployments_with_recent_start": deployments_with_recent_start,
+                "deployments_with_exact_replicas": deployments_with_exact_replicas,
+                "deployments_with_crashloopbackoff": deployments_with_crashloopbackoff,
+                "nodes_with_issues": nodes_with_issues,
+                "zombie_processes": zombie_processes,
+                # Add calculated percentages for CPU and memory usage
+                "cpu_used_percentage": cpu_used_percentage,
+                "cpu_requested_percentage": cpu_requested_percentage,
+                "memory_used_percentage": memory_used_percentage,
+                "memory_requested_percentage": memory_requested_percentage,
+                "cast_events": cast_events,
+                "node_pool_summary": node_pool_summary,
+                "deployment_snapshots": deployment_snapshots,
+            }
+
+            # A detector that never reported would show up as a drop to zero in
+            # the history charts, so such cycles are not recorded
+            no_history = [
+                key
+                for key in HISTORY_DETECTORS
+                if key in stale_detectors and stale_detectors[key]["updated"] is None
+            ]
+            if publish and no_history:
+                console.log(
+                    f"[yellow]No data yet from {', '.join(no_history)}, not recording history[/yellow]"
+                )
+            elif publish:
+                with metrics.stage("db_write", trace):
+                    save_report_history(data, path=db_path)
+                history_df = history_data = None
+
+            # Load history data for generating charts
+            if history_df is None:
+                with metrics.stage("history_load", trace):
+                    history_df = load_report_history(
+                        as_dataframe=True,
+                        window_hours=history_window,
+                        with_details=False,
+                        path=db_path,
+                    )
+
+            # Workloads, nodes and events that changed since the last published report
+            changes = None
+            if baseline is not None:
+                changes = diff_results(baseline, scheduler.results)
+                trace["changes"] = count_changes(changes)
+                for kind, count in trace["changes"].items():
+                    metrics.set("k8spulse_report_changes", count, kind=kind)
+                if any(changes.values()):
+                    console.log(
+                        "[yellow]Changes since the last report: "
+                        + ", ".join(
+                            f"{count} {kind}"
+                            for kind, count in trace["changes"].items()
+                            if count
+                        )
+                        + "[/yellow]"
+                    )
+
+            # Render independent charts concurrently in the chart pipeline
+            chart_jobs = {
+                "gauge_chart_deployments_with_replicas": partial(
+                    gauge_cache.dial_gauge,
+                    generate_dial_gauge_chart,
+                    deployments_with_replicas,
+                    "With Replicas",
+                    max_value=total_deployments,
+                    direction="direct",
+                    red_threshold=60,
+                    yellow_threshold=80,
+                ),
+                "gauge_chart_deployments_zero_replicas": partial(
+                    gauge_cache.dial_gauge,
+                    generate_dial_gauge_chart,
+                    deployments_with_zero_replicas,
+                    "Zero Replicas",
+                    max_value=total_deployments,
+                    direction="inverse",
+                    red_threshold=70,
+                    yellow_threshold=50,
+                ),
+                "gauge_chart_exact_replicas": partial(
+                    gauge_cache.dial_gauge,
+                    generate_dial_gauge_chart,
+                    deployments_with_exact_replicas,
+                    "Exact Replicas",
+                    max_value=total_deployments,
+                    direction="direct",
+                    red_threshold=50,
+                    yellow_threshold=65,
+                ),
+                "gauge_chart_crashloopbackoff": partial(
+                    gauge_cache.dial_gauge,
+                    generate_dial_gauge_chart,
+                    deployments_with_crashloopbackoff,
+                    "CrashLoopBackOff",
+                    max_value=total_deployments,
+                    direction="inverse",
+                    red_threshold=50,
+                    yellow_threshold=30,
+                ),
+                "gauge_chart_recently_restarted": partial(
+                    gauge_cache.dial_gauge,
+                    generate_dial_gauge_chart,
+                    deployments_with_recent_start,
+                    "Restarted",
+                    direction="inverse",
+                    red_threshold=60,
+                    yellow_threshold=30,
+                ),
+                "gauge_cluster_resource_metrics_cpu": partial(
+                    gauge_cache.resource_gauge,
+                    generate_resource_dial_gauge,
+                    "cpu",
+                    resource_metrics,
+                ),
+                "gauge_cluster_resource_metrics_memory": partial(
+                    gauge_cache.resource_gauge,
+                    generate_resource_dial_gauge,
+                    "memory",
+                    resource_metrics,
+                ),
+            }
+            if chart_format != "client":
+                chart_jobs["line_chart_image"] = partial(
+                    generate_line_chart, history_df
+                )
+            with metrics.stage("charts", trace):
+                charts = chart_pipeline.render(chart_jobs)
+
+            if chart_format == "client":
+                # The history chart is drawn in the browser from a compact JSON payload
+                history_payload = build_history_payload(history_df)
+                if external_assets:
+                    charts["history_url"] = asset_store.put(
+                        dump_history_payload(history_payload), "json"
+                    )
+                elif history_asset:
+                    charts["history_url"] = write_history_asset(
+                        docs_dir, env_name, history_payload
+                    )
+                    published_files.add(os.path.join(docs_dir, charts["history_url"]))
+                    served[f"/{charts['history_url']}"] = (
+                        dump_history_payload(history_payload),
+                        content_type_for(charts["history_url"]),
+                    )
+                else:
+                    charts["history_payload"] = dump_history_payload(history_payload)
+                charts["chart_script"] = chart_script()
+
+            with metrics.stage("history_table", trace):
+                if history_data is None:
+                    history_data = prepare_history_data_for_template(path=db_path)
+
+            # Sections are only rendered again when their data changed
+            with metrics.stage("sections", trace):
+                rendered_sections = {
+                    "unusual_events_list": section_cache.render(
+                        "unusual_events_list", unusual_events
+                    ),
+                    "cast_events_list": section_cache.render(
+                        "cast_events_list", cast_events
+                    ),
+                    "zombie_processes_list": section_cache.render(
+                        "zombie_processes_list", zombie_processes
+                    ),
+                    "history_table": section_cache.render(
+                        "history_table", history_data
+                    ),
+                }
+                if changes is not None:
+                    rendered_sections["report_changes"] = section_cache.render(
+                        "report_changes", changes, baseline_timestamp
+                    )
+
+            section_urls = {}
+            if external_assets:
+                # Unchanged charts, node descriptions and event tables keep their
+                # content-hashed URL, so only new assets are written and committed
+                for name, chart in charts.items():
+                    if name.startswith(("gauge_", "line_chart_")):
+                        charts[name] = asset_store.put_chart(chart)
+                nodes_with_issues = [
+                    {
+                        **node,
+                        "description_url": asset_store.put(node["description"], "txt"),
+                    }
+                    for node in nodes_with_issues
+                ]
+                section_urls["unusual_events_url"] = asset_store.put(
+                    rendered_sections["unusual_events_list"], "html"
+                )
+                section_urls["cast_events_url"] = asset_store.put(
+                    rendered_sections["cast_events_list"], "html"
+                )
+                published_files.update(asset_store.take_written())
+                for url, content in asset_store.take_contents().items():
+                    served[f"/{url}"] = (content, content_type_for(url))
+
+            # Node details link to their assets, so the list is rendered afterwards
+            rendered_sections["node_issues_list"] = section_cache.render(
+                "node_issues_list", nodes_with_issues
+            )
+            trace["sections_rendered"] = section_cache.take_rendered()
 
-        line_chart_image = generate_line_chart(history_df)
-
-        if use_ai:
-            # Generate recommendation using OpenAI
-            console.log("[cyan]Generating OpenAI recommendation...[/cyan]")
-            recommendation = get_openai_recommendation(report_file, gpt_model)
-        else:
-            recommendation = ""
-
-        context = {
-            "env_name": env_name,
-            "timestamp": data["timestamp"],
-            "total_deployments": total_deployments,
-            "deployments_with_replicas": deployments_with_replicas,
-            "deployments_with_zero_replicas": deployments_with_zero_replicas,
-            "deployments_with_recent_start": deployments_with_recent_start,
-            "deployments_with_exact_replicas": deployments_with_exact_replicas,
-            "deployments_with_crashloopbackoff": deployments_with_crashloopbackoff,
-            "nodes_with_issues": nodes_with_issues,
-            "unusual_events": unusual_events,
-            **semaphore_statuses,  # Merge semaphore statuses into the context
-            "gauge_chart_deployments_with_replicas": gauge_chart_deployments_with_replicas,
-            "gauge_chart_deployments_zero_replicas": gauge_chart_deployments_zero_replicas,
-            "gauge_chart_exact_replicas": gauge_chart_exact_replicas,
-            "gauge_chart_crashloopbackoff": gauge_chart_crashloopbackoff,
-            "gauge_chart_recently_restarted": gauge_chart_recently_restarted,
-            "gauge_cluster_resource_metrics_cpu": gauge_cluster_resource_metrics_cpu,
-            "gauge_cluster_resource_metrics_memory": gauge_cluster_resource_metrics_memory,
-            "line_chart_image": line_chart_image,
-            "use_ai": use_ai,
-            "history_data": prepare_history_data_for_template(),
-            "openai_recommendation": recommendation,
-            "zombies": zombies,
-            "zombies_processes": zombie_processes,
-            "cast_events": cast_events,
-            "node_pool_summary": node_pool_summary,
-        }
-
-        # Generate HTML report
-        rendered_html = render_html_report(template_name, context)
-        with open(report_file, "w") as f:
-            f.write(rendered_html)
-
-        console.log(f"[green]Report saved to {report_file}[/green]")
-        console.log(f"[green]Generate index[/green]")
-        generate_index_html()
-
-        # Commit and push to git if enabled
-        if git_commit:
             console.log(
-                "[cyan]Committing and pushing the report to Git repository...[/cyan]"
+                f"[cyan]Gauge cache: {gauge_cache.hits} hits, {gauge_cache.misses} misses; "
+                f"sections: {section_cache.hits} reused, {section_cache.misses} rendered[/cyan]"
             )
-            subprocess.run(["git", "add", report_file])
-            subprocess.run(["git", "commit", "-m", f"{env_name} statistics update"])
-            subprocess.run(["git", "push"])
 
-        console.log(
-            f"[green]Waiting for {interval} seconds before the next cycle...[/green]"
+            if use_ai and publish:
+                # Only asked again when the salient state of the cluster changed
+                with metrics.stage("openai", trace):
+                    recommendation = recommender.recommend(
+                        build_summary(
+                            {**results, **data}, restart_rates, stale_detectors
+                        )
+                    )
+
+            context = {
+                "env_name": env_name,
+                "timestamp": data["timestamp"],
+                "total_deployments": total_deployments,
+                "deployments_with_replicas": deployments_with_replicas,
+                "deployments_with_zero_replicas": deployments_with_zero_replicas,
+                "deployments_with_recent_start": deployments_with_recent_start,
+                "deployments_with_exact_replicas": deployments_with_exact_replicas,
+                "deployments_with_crashloopbackoff": deployments_with_crashloopbackoff,
+                "nodes_with_issues": nodes_with_issues,
+                "unusual_events": unusual_events,
+                **semaphore_statuses,  # Merge semaphore statuses into the context
+                **charts,  # Gauges and line chart rendered by the chart pipeline
+                **section_urls,
+                "rendered_sections": rendered_sections,
+                "use_ai": use_ai,
+                "history_data": history_data,
+                "chart_format": chart_format,
+                "external_assets": external_assets,
+                "openai_recommendation": recommendation,
+                "zombies": zombies,
+                "zombies_processes": zombie_processes,
+                "cast_events": cast_events,
+                "node_pool_summary": node_pool_summary,
+                "stale_detectors": stale_detectors,
+            }
+
+            # Generate HTML report; the file is only replaced when its bytes changed
+            with metrics.stage("render", trace):
+                report_chunks = []
+                stream = stream_html_report(template_name, context)
+                if documents is not None:
+                    stream = _collect(stream, report_chunks)
+                digest = write_atomic(report_file, stream, unless_digest=report_digest)
+                report_html = "".join(report_chunks)
+            changed = digest != report_digest
+            trace["report_changed"] = changed
+            report_digest = digest
+            if asset_store:
+                # Assets only the previous reports linked to are deleted, and
+                # the deletions are committed with the next report
+                published_files.update(asset_store.prune())
+
+            if documents is not None:
+                # Viewers get the state of this cycle right away, whatever the
+                # publish interval, without going through the disk or git
+                snapshot = {
+                    **data,
+                    **semaphore_statuses,
+                    "unusual_events": unusual_events,
+                    "resource_metrics": resource_metrics,
+                    "stale_detectors": stale_detectors,
+                    "changes": changes,
+                    "restart_rates": restart_rates,
+                    "alerts": alert_engine.firing() if alert_engine else [],
+                }
+                served[report_path] = (report_html, "text/html; charset=utf-8")
+                served[snapshot_path] = (
+                    json.dumps(snapshot, default=str),
+                    "application/json; charset=utf-8",
+                )
+                with metrics.stage("serve", trace):
+                    documents.publish(served, scope=env_name)
+
+            if changed:
+                console.log(f"[green]Report saved to {report_file}[/green]")
+                unpublished_changes = True
+
+            if publish and not unpublished_changes:
+                console.log("[yellow]Report unchanged, skipping index and git[/yellow]")
+            elif publish:
+                console.log(f"[green]Generate index[/green]")
+                with metrics.stage("index", trace):
+                    published_files.update(
+                        report_index.add(
+                            env_name, data["timestamp"], os.path.basename(report_file)
+                        )
+                    )
+
+                # Commit and push to git in the background if enabled
+                if git_publisher:
+                    git_publisher.submit(published_files)
+                published_files = {report_file}
+                unpublished_changes = False
+
+            cycle_seconds = time.perf_counter() - cycle_start
+            metrics.observe(
+                "k8spulse_stage_duration_seconds", cycle_seconds, stage="cycle"
+            )
+            metrics.set("k8spulse_process_resident_memory_bytes", current_rss_bytes())
+            metrics.set("k8spulse_last_cycle_timestamp_seconds", time.time())
+            trace["cycle_seconds"] = round(cycle_seconds, 6)
+            trace["rss_bytes"] = current_rss_bytes()
+            if trace_file:
+                with open(trace_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace) + "\n")
+
+            if publish:
+                # The next reports show what changed since this one
+                baseline = {
+                    key: scheduler.results[key]
+                    for key in DIFFED_DETECTORS
+                    if key in scheduler.results
+                }
+                baseline_timestamp = data["timestamp"]
+                if profiler:
+                    profiler.dump_stats(os.path.join(profile, "k8spulse.prof"))
+                console.log(
+                    f"[green]Next report will be published in {interval} seconds[/green]"
+                )
+
+    if not contexts:
+        monitor(env_name)
+        return
+
+    def monitor_cluster(env_name, kube_context):
+        db_path = f"k8spulse_{env_name}.sqlite"
+        try:
+            init_db(db_path)
+            monitor(env_name, kube_context, db_path)
+        except Exception:
+            # The other clusters keep being monitored
+            console.log(f"[red]Monitoring of {env_name} stopped:[/red]")
+            console.print_exception()
+
+    threads = [
+        threading.Thread(
+            target=monitor_cluster,
+            args=cluster,
+            name=f"monitor-{cluster[0]}",
+            daemon=True,
+        )
+        for cluster in clusters
+    ]
+    console.log(
+        f"[cyan]Monitoring {len(clusters)} clusters: "
+        f"{', '.join(name for name, _ in clusters)}[/cyan]"
+    )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@cli.command()
+@click.option("--once", is_flag=True, help="Take a single snapshot and exit.")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "ndjson"]),
+    default="json",
+    help="One JSON document per snapshot, or one JSON line per detector.",
+)
+@click.option(
+    "--interval",
+    default=60,
+    help="Interval in seconds between snapshots when --once is not given.",
+)
+@click.option(
+    "--detector",
+    "detector_keys",
+    multiple=True,
+    help="Only run this detector. Can be repeated.",
+)
+@click.option("--zombies", is_flag=True, help="Also run zombie process detection.")
+@click.option(
+    "--request-timeout",
+    default=REQUEST_TIMEOUT,
+    help="Seconds before a single Kubernetes or Cast.AI API call gives up.",
+)
+@click.option(
+    "--shard-workers",
+    default=0,
+    type=click.IntRange(min=0),
+    help="List pods, deployments and events namespace by namespace on up to this many concurrent requests (0 lists them cluster-wide).",
+)
+@click.option(
+    "--shard-page-size",
+    default=500,
+    type=click.IntRange(min=1),
+    help="Objects per request when listing by namespace with --shard-workers.",
+)
+@click.option(
+    "--context",
+    "kube_context",
+    default=None,
+    help="Kubeconfig context of the cluster, the current one by default.",
+)
+def snapshot(
+    once,
+    output_format,
+    interval,
+    detector_keys,
+    zombies,
+    request_timeout,
+    shard_workers,
+    shard_page_size,
+    kube_context,
+):
+    """Print the detector results as JSON, without rendering a report."""
+    from k8spulse.snapshot import format_snapshot, take_snapshot
+
+    detectors = load_detectors()
+    unknown = sorted(set(detector_keys) - set(detectors))
+    if unknown:
+        raise click.BadParameter(
+            f"unknown detector {unknown[0]!r}, expected one of: {', '.join(sorted(detectors))}",
+            param_hint="--detector",
+        )
+    if detector_keys:
+        selected = [detectors[key] for key in dict.fromkeys(detector_keys)]
+    else:
+        selected = [
+            detector
+            for key, detector in detectors.items()
+            if zombies or key != "zombie_processes"
+        ]
+
+    while True:
+        started = time.time()
+        click.echo(
+            format_snapshot(
+                take_snapshot(
+                    selected,
+                    request_timeout,
+                    _sharding(shard_workers, shard_page_size),
+                    kube_context,
+                ),
+                output_format,
+            )
         )
-        time.sleep(interval)
+        if once:
+            return
+        time.sleep(max(0, interval - (time.time() - started)))
 
 
 if __name__ == "__main__":
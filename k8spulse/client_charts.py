@@ -0,0 +1,68 @@
+import calendar
+import json
+import os
+import time
+from functools import lru_cache
+import numpy as np
+from rich.console import Console
+from k8spulse.atomic_file import write_atomic
+from k8spulse.downsample import lttb
+from k8spulse.svg_charts import LINE_CHART_MAX_POINTS, history_percentages
+
+console = Console()
+
+# Bump when the layout of the payload changes; it is part of the asset file name
+HISTORY_PAYLOAD_VERSION = 1
+
+static_dir = os.path.join(os.path.dirname(__file__), "static")
+
+
+def build_history_payload(history_df, max_points=LINE_CHART_MAX_POINTS):
+    """Build the compact JSON history consumed by the bundled chart script.
+
+    Every series is downsampled with LTTB and the union of the selected points
+    is sent for all series, so they share a single time axis. Timestamps are
+    sent as seconds since the epoch and percentages with two decimals.
+    """
+    if "timestamp" not in history_df.columns or history_df.empty:
+        return {"v": HISTORY_PAYLOAD_VERSION, "t": [], "s": {}}
+
+    timestamps, series = history_percentages(history_df)
+    x = np.arange(len(timestamps))
+    selected = np.unique(
+        np.concatenate(
+            [lttb(x, values, max_points)[0] for values in series.values()]
+        ).astype(int)
+    )
+
+    return {
+        "v": HISTORY_PAYLOAD_VERSION,
+        # Report timestamps are naive local times; they are encoded as if they
+        # were UTC so the browser shows exactly the same wall-clock time
+        "t": [
+            calendar.timegm(time.strptime(timestamps[i], "%Y-%m-%d %H:%M:%S"))
+            for i in selected
+        ],
+        "s": {
+            name: np.round(values[selected], 2).tolist()
+            for name, values in series.items()
+        },
+    }
+
+
+def dump_history_payload(payload):
+    # Compact separators, and "</" escaped so the JSON can sit inside a <script> tag
+    return json.dumps(payload, separators=(",", ":")).replace("</", "<\\/")
+
+
+def write_history_asset(docs_dir, env_name, payload):
+    """Write the payload as a versioned .json file next to the report and return its URL."""
+    filename = f"{env_name}_history.v{HISTORY_PAYLOAD_VERSION}.json"
+    write_atomic(os.path.join(docs_dir, filename), dump_history_payload(payload))
+    return filename
+
+
+@lru_cache(maxsize=None)
+def chart_script():
+    with open(os.path.join(static_dir, "k8spulse-charts.js"), encoding="utf-8") as f:
+        return f.read()
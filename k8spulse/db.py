@@ -1,108 +1,168 @@
 import os
 import sqlite3
 import pandas as pd
-from datetime import datetime
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    select_autoescape,
+)
 from rich.console import Console
 
 console = Console()
 
-# SQLite Database setup
+# SQLite Database setup; every function also takes the path of another
+# database, e.g. one per cluster with --contexts
 db_file = "k8spulse.sqlite"
 
 # HTML Template directory setup
 template_dir = os.path.join(os.path.dirname(__file__), "templates")
-env = Environment(loader=FileSystemLoader(template_dir))
+# Compiled templates are cached on disk, so a restarted process does not
+# compile them again; values are HTML-escaped unless marked as safe
+env = Environment(
+    loader=FileSystemLoader(template_dir),
+    bytecode_cache=FileSystemBytecodeCache(),
+    autoescape=select_autoescape(["html"]),
+)
 
-# Initialize the database
-with sqlite3.connect(db_file) as conn:
-    cursor = conn.cursor()
+# Number of rendered template chunks written to the report at once
+RENDER_BUFFER_SIZE = 64
 
-    # Crear la tabla report_history si no existe
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS report_history (
-            id INTEGER PRIMARY KEY,
-            timestamp TEXT UNIQUE,
-            total_deployments INTEGER,
-            deployments_with_replicas INTEGER,
-            deployments_with_zero_replicas INTEGER,
-            deployments_with_exact_replicas INTEGER,
-            deployments_with_crashloopbackoff INTEGER,
-            deployments_with_recent_start INTEGER
-        )
-    """
-    )
 
-    # Usar ALTER TABLE para agregar las nuevas columnas si no existen
-    try:
-        cursor.execute(
-            "ALTER TABLE report_history ADD COLUMN cpu_used_percentage REAL DEFAULT 0"
-        )
-    except sqlite3.OperationalError:
-        # La columna ya existe
-        pass
+def init_db(path=None):
+    """Create the tables of a history database, or add the columns it lacks."""
+    with sqlite3.connect(path or db_file) as conn:
+        cursor = conn.cursor()
 
-    try:
+        # Crear la tabla report_history si no existe
         cursor.execute(
-            "ALTER TABLE report_history ADD COLUMN cpu_requested_percentage REAL DEFAULT 0"
+            """
+            CREATE TABLE IF NOT EXISTS report_history (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT UNIQUE,
+                total_deployments INTEGER,
+                deployments_with_replicas INTEGER,
+                deployments_with_zero_replicas INTEGER,
+                deployments_with_exact_replicas INTEGER,
+                deployments_with_crashloopbackoff INTEGER,
+                deployments_with_recent_start INTEGER
+            )
+        """
         )
-    except sqlite3.OperationalError:
-        # La columna ya existe
-        pass
 
-    try:
+        # Usar ALTER TABLE para agregar las nuevas columnas si no existen
+        try:
+            cursor.execute(
+                "ALTER TABLE report_history ADD COLUMN cpu_used_percentage REAL DEFAULT 0"
+            )
+        except sqlite3.OperationalError:
+            # La columna ya existe
+            pass
+
+        try:
+            cursor.execute(
+                "ALTER TABLE report_history ADD COLUMN cpu_requested_percentage REAL DEFAULT 0"
+            )
+        except sqlite3.OperationalError:
+            # La columna ya existe
+            pass
+
+        try:
+            cursor.execute(
+                "ALTER TABLE report_history ADD COLUMN memory_used_percentage REAL DEFAULT 0"
+            )
+        except sqlite3.OperationalError:
+            # La columna ya existe
+            pass
+
+        try:
+            cursor.execute(
+                "ALTER TABLE report_history ADD COLUMN memory_requested_percentage REAL DEFAULT 0"
+            )
+        except sqlite3.OperationalError:
+            # La columna ya existe
+            pass
+
+        try:
+            cursor.execute(
+                "ALTER TABLE report_history ADD COLUMN deployment_keyframe INTEGER DEFAULT 0"
+            )
+        except sqlite3.OperationalError:
+            # La columna ya existe
+            pass
+
+        # Crear las tablas node_issues y zombie_processes si no existen
         cursor.execute(
-            "ALTER TABLE report_history ADD COLUMN memory_used_percentage REAL DEFAULT 0"
+            """
+            CREATE TABLE IF NOT EXISTS node_issues (
+                id INTEGER PRIMARY KEY,
+                report_id INTEGER,
+                name TEXT,
+                status TEXT,
+                description TEXT,
+                FOREIGN KEY (report_id) REFERENCES report_history(id)
+            )
+        """
         )
-    except sqlite3.OperationalError:
-        # La columna ya existe
-        pass
-
-    try:
         cursor.execute(
-            "ALTER TABLE report_history ADD COLUMN memory_requested_percentage REAL DEFAULT 0"
+            """
+            CREATE TABLE IF NOT EXISTS zombie_processes (
+                id INTEGER PRIMARY KEY,
+                report_id INTEGER,
+                namespace TEXT,
+                pod TEXT,
+                container TEXT,
+                pid INTEGER,
+                process_name TEXT,
+                FOREIGN KEY (report_id) REFERENCES report_history(id)
+            )
+        """
         )
-    except sqlite3.OperationalError:
-        # La columna ya existe
-        pass
 
-    # Crear las tablas node_issues y zombie_processes si no existen
-    cursor.execute(
+        # Per-deployment snapshots, delta encoded: only rows that changed since the
+        # previous cycle are stored, plus a full keyframe every few cycles.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deployment_snapshots (
+                id INTEGER PRIMARY KEY,
+                report_id INTEGER,
+                namespace TEXT,
+                name TEXT,
+                desired_replicas INTEGER,
+                ready_replicas INTEGER,
+                crashloop INTEGER,
+                restarts INTEGER,
+                deleted INTEGER DEFAULT 0,
+                FOREIGN KEY (report_id) REFERENCES report_history(id)
+            )
         """
-        CREATE TABLE IF NOT EXISTS node_issues (
-            id INTEGER PRIMARY KEY,
-            report_id INTEGER,
-            name TEXT,
-            status TEXT,
-            description TEXT,
-            FOREIGN KEY (report_id) REFERENCES report_history(id)
         )
-    """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS zombie_processes (
-            id INTEGER PRIMARY KEY,
-            report_id INTEGER,
-            namespace TEXT,
-            pod TEXT,
-            container TEXT,
-            pid INTEGER,
-            process_name TEXT,
-            FOREIGN KEY (report_id) REFERENCES report_history(id)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_deployment_snapshots_report ON deployment_snapshots (report_id)"
         )
-    """
-    )
-    conn.commit()
+        conn.commit()
 
 
-def load_report_history(as_dataframe=False):
+# Initialize the default database
+init_db()
+
+# Number of cycles between full deployment snapshot keyframes
+DEPLOYMENT_KEYFRAME_INTERVAL = 120
+
+# State of the last deployment snapshot written by this process to every
+# database, as {path: (state, cycles since the keyframe)}, used to compute deltas
+_deployment_states = {}
+
+
+def load_report_history(
+    as_dataframe=False, window_hours=24, with_details=True, path=None
+):
     console.log("[cyan]Loading report history...[/cyan]")
-    with sqlite3.connect(db_file) as conn:
+    with sqlite3.connect(path or db_file) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT * FROM report_history WHERE timestamp >= datetime('now', '-1 day') ORDER BY timestamp DESC;"
+            "SELECT * FROM report_history WHERE timestamp >= datetime('now', ?) ORDER BY timestamp DESC;",
+            (f"-{round(window_hours * 3600)} seconds",),
         )
         rows = cursor.fetchall()
 
@@ -110,23 +170,24 @@ def load_report_history(as_dataframe=False):
         history_list = []
         for row in rows:
             report_id = row[0]
-            history_list.append(
-                {
-                    "timestamp": row[1],
-                    "total_deployments": int(row[2]),
-                    "deployments_with_replicas": int(row[3]),
-                    "deployments_with_zero_replicas": int(row[4]),
-                    "deployments_with_exact_replicas": int(row[5]),
-                    "deployments_with_crashloopbackoff": int(row[6]),
-                    "deployments_with_recent_start": int(row[7]),
-                    "cpu_used_percentage": float(row[8]),
-                    "cpu_requested_percentage": float(row[9]),
-                    "memory_used_percentage": float(row[10]),
-                    "memory_requested_percentage": float(row[11]),
-                    "nodes_with_issues": load_node_issues(report_id),
-                    "zombie_processes": load_zombie_processes(report_id),
-                }
-            )
+            entry = {
+                "timestamp": row[1],
+                "total_deployments": int(row[2]),
+                "deployments_with_replicas": int(row[3]),
+                "deployments_with_zero_replicas": int(row[4]),
+                "deployments_with_exact_replicas": int(row[5]),
+                "deployments_with_crashloopbackoff": int(row[6]),
+                "deployments_with_recent_start": int(row[7]),
+                "cpu_used_percentage": float(row[8]),
+                "cpu_requested_percentage": float(row[9]),
+                "memory_used_percentage": float(row[10]),
+                "memory_requested_percentage": float(row[11]),
+            }
+            # Node issues and zombies cost two queries per row; charts don't need them
+            if with_details:
+                entry["nodes_with_issues"] = load_node_issues(report_id, path)
+                entry["zombie_processes"] = load_zombie_processes(report_id, path)
+            history_list.append(entry)
 
         # If a pandas DataFrame is requested
         if as_dataframe:
@@ -136,8 +197,8 @@ def load_report_history(as_dataframe=False):
         return history_list
 
 
-def load_node_issues(report_id):
-    with sqlite3.connect(db_file) as conn:
+def load_node_issues(report_id, path=None):
+    with sqlite3.connect(path or db_file) as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT name, status, description FROM node_issues WHERE report_id = ?",
@@ -149,8 +210,8 @@ def load_node_issues(report_id):
         ]
 
 
-def load_zombie_processes(report_id):
-    with sqlite3.connect(db_file) as conn:
+def load_zombie_processes(report_id, path=None):
+    with sqlite3.connect(path or db_file) as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT namespace, pod, container, pid, process_name FROM zombie_processes WHERE report_id = ?",
@@ -169,9 +230,9 @@ def load_zombie_processes(report_id):
         ]
 
 
-def prepare_history_data_for_template():
+def prepare_history_data_for_template(path=None):
     console.log("[cyan]Preparing history data for the template...[/cyan]")
-    history = load_report_history()  # Should return a list of dictionaries.
+    history = load_report_history(path=path)  # Should return a list of dictionaries.
 
     if len(history) == 0:
         console.log("[yellow]No history data found.[/yellow]")
@@ -214,9 +275,26 @@ def render_html_report(template_name, context):
     return template.render(context)
 
 
-def save_report_history(data):
+# Render the HTML report lazily, in chunks that can be written as they come
+def stream_html_report(template_name, context):
+    console.log("[cyan]Rendering HTML report...[/cyan]")
+    template = env.get_template(template_name)
+    # The document is written as it is rendered around the cached section
+    # fragments, so it is never held in memory as a whole
+    stream = template.stream(context)
+    stream.enable_buffering(RENDER_BUFFER_SIZE)
+    return stream
+
+
+# Render a single report section macro from sections.html as an HTML fragment
+def render_report_section(macro_name, *args):
+    sections = env.get_template("sections.html").module
+    return str(getattr(sections, macro_name)(*args))
+
+
+def save_report_history(data, path=None):
     console.log("[cyan]Saving report history...[/cyan]")
-    with sqlite3.connect(db_file) as conn:
+    with sqlite3.connect(path or db_file) as conn:
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -262,41 +340,113 @@ def save_report_history(data):
                     zombie["process_name"],
                 ),
             )
+        deployment_state = None
+        if data.get("deployment_snapshots") is not None:
+            deployment_state = save_deployment_snapshots(
+                cursor, report_id, data["deployment_snapshots"], path
+            )
+        # An error above leaves the block, which rolls the transaction back and
+        # keeps the previous state as the base of the next delta
         conn.commit()
+        if deployment_state is not None:
+            _deployment_states[path or db_file] = deployment_state
 
 
-# Define the directory where reports are saved
-REPORTS_DIR = "docs"
-
-
-# Function to get the list of generated reports
-def get_reports_list():
-    reports = []
-    for filename in os.listdir(REPORTS_DIR):
-        if filename.endswith(".html") and filename != "index.html":
-            report_path = os.path.join(REPORTS_DIR, filename)
-            # Extract the date from the filename or its metadata
-            report_date = datetime.fromtimestamp(
-                os.path.getmtime(report_path)
-            ).strftime("%Y-%m-%d %H:%M:%S")
-            reports.append(
-                {
-                    "name": filename.replace(".html", "")
-                    .replace("_", " ")
-                    .capitalize(),
-                    "link": filename,
-                    "date": report_date,
-                }
-            )
-    return sorted(reports, key=lambda x: x["date"], reverse=True)
+def save_deployment_snapshots(cursor, report_id, snapshots, path=None):
+    """Insert the snapshot rows of a report and return the new delta state.
+
+    The state must only replace the one in _deployment_states once the
+    rows are committed, or later deltas would be based on rows that are
+    not in the database.
+    """
+    last_state, cycles_since_keyframe = _deployment_states.get(
+        path or db_file, (None, 0)
+    )
 
+    state = {
+        (s["namespace"], s["name"]): (
+            int(s["desired_replicas"]),
+            int(s["ready_replicas"]),
+            int(bool(s["crashloop"])),
+            int(s["restarts"]),
+        )
+        for s in snapshots
+    }
 
-# Function to generate the index.html file
-def generate_index_html():
-    template = env.get_template("index.html")  # Use the template `index.html`
-    reports = get_reports_list()
-    rendered_index = template.render(reports=reports)
+    keyframe = (
+        last_state is None or cycles_since_keyframe >= DEPLOYMENT_KEYFRAME_INTERVAL
+    )
+    if keyframe:
+        rows = [(key, values, 0) for key, values in state.items()]
+        cycles_since_keyframe = 0
+    else:
+        rows = [
+            (key, values, 0)
+            for key, values in state.items()
+            if last_state.get(key) != values
+        ]
+        # Deployments that disappeared are recorded as tombstones
+        rows.extend(
+            (key, values, 1) for key, values in last_state.items() if key not in state
+        )
+        cycles_since_keyframe += 1
+
+    cursor.executemany(
+        """
+        INSERT INTO deployment_snapshots (
+            report_id, namespace, name, desired_replicas, ready_replicas, crashloop, restarts, deleted
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+        [(report_id, *key, *values, deleted) for key, values, deleted in rows],
+    )
+    if keyframe:
+        cursor.execute(
+            "UPDATE report_history SET deployment_keyframe = 1 WHERE id = ?",
+            (report_id,),
+        )
+    console.log(
+        f"[cyan]Stored {len(rows)} deployment snapshot rows ({'keyframe' if keyframe else 'delta'})...[/cyan]"
+    )
+    return state, cycles_since_keyframe
+
+
+def load_deployment_snapshot(timestamp, path=None):
+    """Rebuild the per-deployment state as it was at the given timestamp."""
+    with sqlite3.connect(path or db_file) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id FROM report_history WHERE timestamp <= ? ORDER BY timestamp DESC LIMIT 1",
+            (timestamp,),
+        )
+        target = cursor.fetchone()
+        if not target:
+            return []
+        cursor.execute(
+            "SELECT MAX(id) FROM report_history WHERE deployment_keyframe = 1 AND id <= ?",
+            (target[0],),
+        )
+        keyframe = cursor.fetchone()
+        if not keyframe or keyframe[0] is None:
+            return []
+        cursor.execute(
+            """
+            SELECT namespace, name, desired_replicas, ready_replicas, crashloop, restarts, deleted
+            FROM deployment_snapshots WHERE report_id BETWEEN ? AND ? ORDER BY report_id, id
+        """,
+            (keyframe[0], target[0]),
+        )
+        state = {}
+        for row in cursor.fetchall():
+            if row[6]:
+                state.pop((row[0], row[1]), None)
+                continue
+            state[(row[0], row[1])] = {
+                "namespace": row[0],
+                "name": row[1],
+                "desired_replicas": row[2],
+                "ready_replicas": row[3],
+                "crashloop": bool(row[4]),
+                "restarts": row[5],
+            }
+        return sorted(state.values(), key=lambda x: (x["namespace"], x["name"]))
 
-    # Save index.html in the reports directory
-    with open(os.path.join(REPORTS_DIR, "index.html"), "w") as f:
-        f.write(rendered_index)
@@ -1,39 +1,44 @@
-from kubernetes import client, config
-from datetime import datetime, timezone, timedelta
 import re
-import pandas as pd
-import numpy as np
 from rich.console import Console
 from collections import defaultdict
+from k8spulse.detector.plugins import detector
 
 console = Console()
 
-config.load_kube_config()
-
 
 # Functions to gather Kubernetes statistics
-def get_deployments_count():
+@detector(
+    "total_deployments",
+    resources={"deployments": ["spec.replicas"]},
+    output=int,
+    period=60,
+    priority=2,
+)
+def get_deployments_count(deployments):
     console.log("[cyan]Fetching deployments with more than 0 replicas...[/cyan]")
-    apps_v1 = client.AppsV1Api()
-    deployments = apps_v1.list_deployment_for_all_namespaces()
     count = sum(
         1
-        for deployment in deployments.items
+        for deployment in deployments
         if deployment.spec.replicas and deployment.spec.replicas > 0
     )
     return count
 
 
 # Function to gather deployments with at least one replica defined and at least one ready replica
-def get_deployments_with_replicas():
+@detector(
+    "deployments_with_replicas",
+    resources={"deployments": ["spec.replicas", "status.ready_replicas"]},
+    output=int,
+    period=60,
+    priority=2,
+)
+def get_deployments_with_replicas(deployments):
     console.log(
         "[cyan]Counting deployments with at least one replica defined and ready...[/cyan]"
     )
-    apps_v1 = client.AppsV1Api()
-    deployments = apps_v1.list_deployment_for_all_namespaces()
     count = sum(
         1
-        for deployment in deployments.items
+        for deployment in deployments
         if deployment.spec.replicas
         and deployment.spec.replicas > 0
         and deployment.status.ready_replicas
@@ -43,15 +48,20 @@ def get_deployments_with_replicas():
 
 
 # Function to gather deployments with at least one replica defined and exactly all replicas ready
-def get_deployments_with_exact_replicas():
+@detector(
+    "deployments_with_exact_replicas",
+    resources={"deployments": ["spec.replicas", "status.ready_replicas"]},
+    output=int,
+    period=60,
+    priority=2,
+)
+def get_deployments_with_exact_replicas(deployments):
     console.log(
         "[cyan]Counting deployments with exactly desired replicas ready...[/cyan]"
     )
-    apps_v1 = client.AppsV1Api()
-    deployments = apps_v1.list_deployment_for_all_namespaces()
     count = sum(
         1
-        for deployment in deployments.items
+        for deployment in deployments
         if deployment.spec.replicas
         and deployment.spec.replicas > 0
         and deployment.status.ready_replicas is not None
@@ -61,15 +71,20 @@ def get_deployments_with_exact_replicas():
 
 
 # Function to gather deployments with zero replicas ready but with at least one replica defined
-def get_deployments_with_zero_replicas():
+@detector(
+    "deployments_with_zero_replicas",
+    resources={"deployments": ["spec.replicas", "status.ready_replicas"]},
+    output=int,
+    period=60,
+    priority=2,
+)
+def get_deployments_with_zero_replicas(deployments):
     console.log(
         "[cyan]Counting deployments with zero ready replicas but having at least one defined...[/cyan]"
     )
-    apps_v1 = client.AppsV1Api()
-    deployments = apps_v1.list_deployment_for_all_namespaces()
     count = sum(
         1
-        for deployment in deployments.items
+        for deployment in deployments
         if deployment.spec.replicas
         and deployment.spec.replicas > 0
         and (
@@ -80,106 +95,164 @@ def get_deployments_with_zero_replicas():
     return count
 
 
-def get_deployments_with_recent_restarts():
-    console.log(
-        "[cyan]Counting deployments with pods recently restarted (last 10 minutes)...[/cyan]"
-    )
-    core_v1 = client.CoreV1Api()
-    now = datetime.now(
-        timezone.utc
-    )  # Cambiado a un objeto datetime con zona horaria UTC
-    ten_minutes_ago = now - timedelta(minutes=10)
-
-    pods = core_v1.list_pod_for_all_namespaces()
-    deployment_names = set()  # Usaremos un conjunto para evitar duplicados
-
-    for pod in pods.items:
-        if pod.status.container_statuses:
-            for container_status in pod.status.container_statuses:
-                if (
-                    container_status.restart_count > 0
-                    and container_status.state.terminated
-                ):
-                    last_restart_time = container_status.state.terminated.finished_at
-                    if last_restart_time:
-                        # Asegurarse de que last_restart_time tenga información de zona horaria
-                        last_restart_time = last_restart_time.astimezone(timezone.utc)
-                        if last_restart_time >= ten_minutes_ago:
-                            # Añadir el nombre del deployment relacionado al conjunto
-                            owner_references = pod.metadata.owner_references
-                            if owner_references:
-                                for owner in owner_references:
-                                    if owner.kind == "ReplicaSet":
-                                        deployment_name = owner.name.rsplit("-", 1)[
-                                            0
-                                        ]  # Obtener el nombre del deployment sin el sufijo del ReplicaSet
-                                        deployment_names.add(deployment_name)
-
-    return len(deployment_names)
-
-
-def get_deployments_with_crashloopbackoff():
+# Function to gather the restart counter of every container, by pod UID. The
+# counters are compared from one run to the next in the main process (see
+# k8spulse.restarts), which gives exact restart counts and rates per
+# deployment, including restarts only visible in the last state of a container
+@detector(
+    "container_restarts",
+    resources={
+        "pods": [
+            "metadata.uid",
+            "metadata.namespace",
+            "metadata.labels",
+            "metadata.owner_references",
+            "status.container_statuses",
+        ],
+        "ownership": [],
+    },
+    output=list,
+    period=30,
+    priority=1,
+)
+def get_container_restarts(pods, ownership):
+    console.log("[cyan]Collecting container restart counters...[/cyan]")
+    counters = []
+    for pod in pods:
+        deployment = ownership.deployment_of(pod)
+        counters.append(
+            {
+                "uid": pod.metadata.uid,
+                "deployment": "/".join(deployment) if deployment else None,
+                "containers": {
+                    container_status.name: container_status.restart_count or 0
+                    for container_status in pod.status.container_statuses or []
+                },
+            }
+        )
+    return counters
+
+
+@detector(
+    "deployments_with_crashloopbackoff",
+    resources={
+        "pods": [
+            "metadata.namespace",
+            "metadata.labels",
+            "metadata.owner_references",
+            "status.container_statuses",
+        ],
+        "deployments": ["metadata.namespace", "metadata.name"],
+        "ownership": [],
+    },
+    output=int,
+    period=15,
+    priority=0,
+)
+def get_deployments_with_crashloopbackoff(pods, deployments, ownership):
     console.log(
         "[cyan]Counting deployments with pods in CrashLoopBackOff state...[/cyan]"
     )
-    core_v1 = client.CoreV1Api()
-    apps_v1 = client.AppsV1Api()
-
-    # Get all pods
-    pods = core_v1.list_pod_for_all_namespaces()
 
-    # Track namespaces and labels of pods in CrashLoopBackOff
+    # Deployments owning a pod in CrashLoopBackOff, by (namespace, name)
     deployments_in_crashloop = set()
+    for pod in pods:
+        if any(
+            container_status.state.waiting
+            and container_status.state.waiting.reason == "CrashLoopBackOff"
+            for container_status in pod.status.container_statuses or []
+        ):
+            deployment = ownership.deployment_of(pod)
+            if deployment:
+                deployments_in_crashloop.add(deployment)
+
+    # Only count deployments that still exist
+    return sum(
+        1
+        for deployment in deployments
+        if (deployment.metadata.namespace, deployment.metadata.name)
+        in deployments_in_crashloop
+    )
+
 
-    for pod in pods.items:
+# Function to gather a per-deployment snapshot (replicas, crashloop flag and restarts)
+@detector(
+    "deployment_snapshots",
+    resources={
+        "deployments": [
+            "metadata.namespace",
+            "metadata.name",
+            "spec.replicas",
+            "status.ready_replicas",
+        ],
+        "pods": [
+            "metadata.namespace",
+            "metadata.labels",
+            "metadata.owner_references",
+            "status.container_statuses",
+        ],
+        "ownership": [],
+    },
+    output=list,
+    period=60,
+    priority=3,
+)
+def get_deployment_snapshots(deployments, pods, ownership):
+    console.log("[cyan]Collecting per-deployment snapshot...[/cyan]")
+
+    snapshots = {}
+    for deployment in deployments:
+        key = (deployment.metadata.namespace, deployment.metadata.name)
+        snapshots[key] = {
+            "namespace": deployment.metadata.namespace,
+            "name": deployment.metadata.name,
+            "desired_replicas": deployment.spec.replicas or 0,
+            "ready_replicas": deployment.status.ready_replicas or 0,
+            "crashloop": False,
+            "restarts": 0,
+        }
+
+    for pod in pods:
+        snapshot = snapshots.get(ownership.deployment_of(pod))
+        if snapshot is None:
+            continue
         for container_status in pod.status.container_statuses or []:
+            snapshot["restarts"] += container_status.restart_count or 0
             if (
                 container_status.state.waiting
                 and container_status.state.waiting.reason == "CrashLoopBackOff"
             ):
-                # Identify the deployment from pod metadata labels
-                labels = pod.metadata.labels
-                if labels:
-                    # Assuming the label `app` or `app.kubernetes.io/name` identifies the deployment
-                    app_label = labels.get("app") or labels.get(
-                        "app.kubernetes.io/name"
-                    )
-                    if app_label:
-                        deployments_in_crashloop.add(
-                            (pod.metadata.namespace, app_label)
-                        )
-
-    # Check for matching deployments
-    count = 0
-    for namespace, app_label in deployments_in_crashloop:
-        deployments = apps_v1.list_namespaced_deployment(namespace=namespace)
-        for deployment in deployments.items:
-            if (
-                deployment.metadata.labels.get("app") == app_label
-                or deployment.metadata.labels.get("app.kubernetes.io/name") == app_label
-            ):
-                count += 1
+                snapshot["crashloop"] = True
 
-    return count
+    return list(snapshots.values())
 
-# Function to gather deployments and pods by node pool using pandas and enhanced dynamic prefix analysis
-import re
-import pandas as pd
-from collections import defaultdict
-from difflib import SequenceMatcher
-from kubernetes import client
-from rich.console import Console
 
-console = Console()
-core_v1 = client.CoreV1Api()
-apps_v1 = client.AppsV1Api()
+# Function to gather deployments and pods by node pool using pandas and enhanced dynamic prefix analysis
+@detector(
+    "node_pool_summary",
+    resources={
+        "nodes": ["metadata.name"],
+        "pods": [
+            "metadata.namespace",
+            "metadata.labels",
+            "metadata.owner_references",
+            "spec.node_name",
+        ],
+        "deployments": ["metadata.namespace", "metadata.name"],
+        "ownership": [],
+    },
+    output={"deployments_per_node_pool": dict, "pods_per_node_pool": dict},
+    period=300,
+    priority=5,
+)
+def get_node_pool_summary(nodes, pods, deployments, ownership):
+    # pandas is only imported when the summary runs, so loading the
+    # detectors (e.g. for k8spulse snapshot) stays fast
+    import pandas as pd
 
-def get_node_pool_summary():
     console.log("[cyan]Fetching node pool summary...[/cyan]")
 
-    # Get all nodes
-    nodes = core_v1.list_node()
-    node_names = [node.metadata.name for node in nodes.items]
+    node_names = [node.metadata.name for node in nodes]
 
     # Create a DataFrame to store node names
     node_df = pd.DataFrame(node_names, columns=["node_name"])
@@ -222,39 +295,27 @@ def get_node_pool_summary():
     deployments_per_node_pool = defaultdict(int)
     pods_per_node_pool = defaultdict(int)
 
-    # Get all pods and determine their node pool
-    pods = core_v1.list_pod_for_all_namespaces()
-    pod_to_deployment = {}  # Mapping from pods to deployments
+    # Determine the node pool of every pod, counting the pods of every
+    # deployment per node pool in the same pass
+    deployment_node_pools = defaultdict(lambda: defaultdict(int))
 
-    for pod in pods.items:
+    for pod in pods:
         node_name = pod.spec.node_name
         if node_name and node_name in node_pools:
             node_pool = node_pools[node_name]
             pods_per_node_pool[node_pool] += 1
 
-            # Store the deployment name for this pod if it exists
-            owner_references = pod.metadata.owner_references
-            if owner_references:
-                for owner in owner_references:
-                    if owner.kind == "ReplicaSet":
-                        deployment_name = owner.name.rsplit("-", 1)[0]  # Extract deployment name from replicaset
-                        pod_to_deployment[pod.metadata.name] = deployment_name
-
-    # Get all deployments and determine their node pool using pod association
-    deployments = apps_v1.list_deployment_for_all_namespaces()
-
-    for deployment in deployments.items:
-        deployment_name = deployment.metadata.name
-        assigned_pool = "unknown"
-
-        # Determine the node pool based on associated pods
-        associated_pods = [pod_name for pod_name, dep_name in pod_to_deployment.items() if dep_name == deployment_name]
-        associated_node_pools = [node_pools.get(pod.spec.node_name, "unknown") for pod in pods.items if pod.metadata.name in associated_pods]
-
-        if associated_node_pools:
-            # Determine the most common node pool among the associated pods
-            assigned_pool = pd.Series(associated_node_pools).mode()[0]
+            deployment = ownership.deployment_of(pod)
+            if deployment:
+                deployment_node_pools[deployment][node_pool] += 1
 
+    # Every deployment belongs to the node pool most of its pods run in (the
+    # first one by name on a tie)
+    for deployment in deployments:
+        counts = deployment_node_pools.get(
+            (deployment.metadata.namespace, deployment.metadata.name)
+        )
+        assigned_pool = max(sorted(counts), key=counts.get) if counts else "unknown"
         deployments_per_node_pool[assigned_pool] += 1
 
     # Output summary
@@ -0,0 +1,168 @@
+import json
+import threading
+from types import SimpleNamespace
+from kubernetes import client
+from k8spulse.metrics import count_api_objects
+
+
+class OwnershipIndex:
+    """Top-level workload of every pod, without guessing from names or labels.
+
+    A pod points at its controller (a ReplicaSet, StatefulSet, DaemonSet,
+    Job...) in its owner references, and a ReplicaSet in turn at the
+    Deployment that created it. The index keeps the controller of every
+    ReplicaSet, so any pod resolves to its workload with a dictionary lookup.
+    update() applies a new ReplicaSet listing and only touches the
+    ReplicaSets that were added, changed or deleted since the previous one.
+    """
+
+    def __init__(self):
+        self._versions = {}  # uid -> (resourceVersion, (namespace, name))
+        self._owners = (
+            {}
+        )  # (namespace, name) -> (kind, name) of the controller, or None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._owners)
+
+    def update(self, replicasets):
+        """Apply the metadata of every current ReplicaSet, as returned by the API.
+
+        Returns the number of ReplicaSets that were (re)indexed and removed.
+        """
+        with self._lock:
+            seen = set()
+            changed = 0
+            for metadata in replicasets:
+                uid = metadata["uid"]
+                seen.add(uid)
+                version = metadata.get("resourceVersion")
+                cached = self._versions.get(uid)
+                if cached is not None and cached[0] == version:
+                    continue
+                key = (metadata.get("namespace"), metadata["name"])
+                controller = _controller(metadata.get("ownerReferences"))
+                self._owners[key] = (
+                    (controller["kind"], controller["name"]) if controller else None
+                )
+                self._versions[uid] = (version, key)
+                changed += 1
+
+            removed = [uid for uid in self._versions if uid not in seen]
+            for uid in removed:
+                _, key = self._versions.pop(uid)
+                self._owners.pop(key, None)
+            return changed, len(removed)
+
+    def workload_of(self, pod):
+        """(namespace, kind, name) of the workload a pod belongs to.
+
+        Pods without a controller are their own workload ("Pod"); a pod of a
+        ReplicaSet that was created after the last listing is attributed to
+        its Deployment through the pod-template-hash the Deployment names its
+        ReplicaSets with.
+        """
+        namespace = pod.metadata.namespace
+        owner = _controller(pod.metadata.owner_references)
+        if owner is None:
+            return namespace, "Pod", pod.metadata.name
+        kind, name = _owner_field(owner, "kind"), _owner_field(owner, "name")
+        if kind != "ReplicaSet":
+            return namespace, kind, name
+
+        key = (namespace, name)
+        if key in self._owners:
+            parent = self._owners[key]
+            return (namespace, *parent) if parent else (namespace, kind, name)
+        pod_template_hash = (pod.metadata.labels or {}).get("pod-template-hash")
+        suffix = f"-{pod_template_hash}"
+        if pod_template_hash and name.endswith(suffix):
+            return namespace, "Deployment", name[: -len(suffix)]
+        return namespace, kind, name
+
+    def deployment_of(self, pod):
+        """(namespace, name) of the Deployment a pod belongs to, or None."""
+        namespace, kind, name = self.workload_of(pod)
+        return (namespace, name) if kind == "Deployment" else None
+
+
+def _owner_field(owner, field):
+    # Owner references are dicts in raw API responses and models in pods
+    return owner.get(field) if isinstance(owner, dict) else getattr(owner, field)
+
+
+def _controller(owner_references):
+    """The owner reference marked as controller, else the first one."""
+    owner_references = owner_references or []
+    for owner in owner_references:
+        if _owner_field(owner, "controller"):
+            return owner
+    return owner_references[0] if owner_references else None
+
+
+# Asks the API server for the metadata of the objects only, without their pod
+# templates; a server that cannot convert the list sends the full objects
+METADATA_ONLY = (
+    "application/json;as=PartialObjectMetadataList;v=v1;g=meta.k8s.io,"
+    "application/json"
+)
+
+
+class MetadataList:
+    """A list response of object metadata, shaped like the list models of the client."""
+
+    def __init__(self, response):
+        listing = json.loads(response.data)
+        self.items = [item["metadata"] for item in listing["items"]]
+        self.metadata = SimpleNamespace(
+            _continue=(listing.get("metadata") or {}).get("continue")
+        )
+        count_api_objects(len(self.items))
+
+
+def list_replica_set_metadata(timeout):
+    """Metadata of every ReplicaSet, as plain dicts.
+
+    Only the metadata is requested, and the response is parsed as JSON
+    instead of being deserialized into models.
+    """
+    return MetadataList(
+        client.AppsV1Api().list_replica_set_for_all_namespaces(
+            _request_timeout=timeout,
+            _preload_content=False,
+            _headers={"Accept": METADATA_ONLY},
+        )
+    ).items
+
+
+def list_namespaced_replica_set_metadata(namespace, timeout, **page):
+    """One page of the ReplicaSet metadata of a namespace, as a MetadataList."""
+    return MetadataList(
+        client.AppsV1Api().list_namespaced_replica_set(
+            namespace,
+            _request_timeout=timeout,
+            _preload_content=False,
+            _headers={"Accept": METADATA_ONLY},
+            **page,
+        )
+    )
+
+
+# Kept for the life of the (worker) process, so every listing is applied
+# incrementally to the index of the previous one; worker processes serve
+# every cluster of --contexts, so there is one index per API server
+_indexes = {}
+
+
+def index_replica_sets(replicasets):
+    """Apply a listing of every ReplicaSet to the index of the current cluster."""
+    index = _indexes.setdefault(
+        client.Configuration.get_default_copy().host, OwnershipIndex()
+    )
+    index.update(replicasets)
+    return index
+
+
+def fetch_ownership(timeout):
+    return index_replica_sets(list_replica_set_metadata(timeout))
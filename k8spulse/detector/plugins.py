@@ -0,0 +1,397 @@
+import functools
+import importlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import entry_points
+from types import ModuleType
+from kubernetes import client, config
+from rich.console import Console
+from k8spulse.detector.ownership import (
+    fetch_ownership,
+    index_replica_sets,
+    list_namespaced_replica_set_metadata,
+)
+from k8spulse.detector.sharding import fetch_sharded
+from k8spulse.metrics import run_instrumented, with_api_stats
+
+console = Console()
+
+# Entry point group third-party packages register their detectors under
+ENTRY_POINT_GROUP = "k8spulse.detectors"
+
+BUILTIN_DETECTOR_MODULES = [
+    "k8spulse.detector.deployments",
+    "k8spulse.detector.status",
+    "k8spulse.detector.resources",
+    "k8spulse.detector.zombies",
+]
+
+# Seconds before a single Kubernetes API call gives up (see --request-timeout)
+REQUEST_TIMEOUT = 30
+
+
+class Resource:
+    """A kind of cluster object detectors can ask for.
+
+    fetch(timeout) returns the list of objects, giving up on API calls after
+    timeout seconds; model is the name of the kubernetes
+    client model of one object, used to check the fields detectors declare
+    (None for resources returned as plain dicts or other objects, such as
+    the ownership index). Namespaced kinds can also have
+    fetch_namespace(namespace, timeout, limit=..., _continue=...), which
+    returns one page of the objects of a namespace as the list response of
+    the API and lets the kind be listed in shards (see Sharding). When fetch
+    returns something built from the objects rather than the objects
+    themselves, build(objects) turns the objects listed in shards into it.
+    """
+
+    def __init__(self, kind, fetch, model=None, fetch_namespace=None, build=None):
+        self.kind = kind
+        self.fetch = fetch
+        self.model = model
+        self.fetch_namespace = fetch_namespace
+        self.build = build
+
+
+RESOURCES = {}
+
+
+def register_resource(kind, fetch, model=None, fetch_namespace=None, build=None):
+    """Make a new resource kind available to detectors, e.g. a custom resource."""
+    RESOURCES[kind] = Resource(kind, fetch, model, fetch_namespace, build)
+
+
+def _list_pod_metrics(timeout):
+    try:
+        return client.CustomObjectsApi().list_namespaced_custom_object(
+            group="metrics.k8s.io",
+            version="v1beta1",
+            namespace="default",
+            plural="pods",
+            _request_timeout=timeout,
+        )["items"]
+    except client.exceptions.ApiException as e:
+        console.log(
+            f"[yellow]Metrics server not available or error fetching metrics: {str(e)}[/yellow]"
+        )
+        return []
+
+
+register_resource(
+    "pods",
+    lambda timeout: client.CoreV1Api()
+    .list_pod_for_all_namespaces(_request_timeout=timeout)
+    .items,
+    "V1Pod",
+    lambda namespace, timeout, **page: client.CoreV1Api().list_namespaced_pod(
+        namespace, _request_timeout=timeout, **page
+    ),
+)
+register_resource(
+    "nodes",
+    lambda timeout: client.CoreV1Api().list_node(_request_timeout=timeout).items,
+    "V1Node",
+)
+register_resource(
+    "deployments",
+    lambda timeout: client.AppsV1Api()
+    .list_deployment_for_all_namespaces(_request_timeout=timeout)
+    .items,
+    "V1Deployment",
+    lambda namespace, timeout, **page: client.AppsV1Api().list_namespaced_deployment(
+        namespace, _request_timeout=timeout, **page
+    ),
+)
+register_resource(
+    "events",
+    lambda timeout: client.CoreV1Api()
+    .list_event_for_all_namespaces(_request_timeout=timeout)
+    .items,
+    "CoreV1Event",
+    lambda namespace, timeout, **page: client.CoreV1Api().list_namespaced_event(
+        namespace, _request_timeout=timeout, **page
+    ),
+)
+register_resource("pod_metrics", _list_pod_metrics)
+# Index of the workload every pod belongs to, from one ReplicaSet listing
+register_resource(
+    "ownership",
+    fetch_ownership,
+    fetch_namespace=list_namespaced_replica_set_metadata,
+    build=index_replica_sets,
+)
+
+
+class Detector:
+    """A check over cluster objects, declared with the @detector decorator.
+
+    resources maps every resource kind the detector reads to the fields it
+    uses (dotted attribute paths such as "status.container_statuses"); the
+    objects are passed to the function as keyword arguments named after the
+    kind. output is the type of the result, or for dict results a mapping of
+    the keys it must contain to their types. period and priority are the
+    scheduling defaults (see DetectorSchedule).
+
+    Called directly, a detector fetches the resources it needs itself; the
+    engine instead fetches them once for all the detectors due together and
+    calls run() with the shared data.
+    """
+
+    def __init__(
+        self, func, key, resources=None, output=object, period=60, priority=10
+    ):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.key = key
+        self.resources = {
+            kind: tuple(fields) for kind, fields in (resources or {}).items()
+        }
+        self.output = output
+        self.period = period
+        self.priority = priority
+
+    def __call__(self, **data):
+        missing = [kind for kind in self.resources if kind not in data]
+        return self.run({**data, **fetch_resources(missing)})
+
+    def __reduce__(self):
+        # The decorated function is shadowed by the detector in its module, so
+        # detectors are pickled (to reach the worker processes) by reference
+        return _import_detector, (self.__module__, self.__qualname__)
+
+    def __repr__(self):
+        return f"<Detector {self.key}>"
+
+    @property
+    def default(self):
+        """The value reported before the detector has produced a result."""
+        if isinstance(self.output, dict):
+            return {name: _default_value(t) for name, t in self.output.items()}
+        return _default_value(self.output)
+
+    def run(self, data):
+        result = self.func(**{kind: data[kind] for kind in self.resources})
+        _check_output(self.key, result, self.output)
+        return result
+
+
+def detector(key, resources=None, output=object, period=60, priority=10):
+    """Declare a function as a detector; see Detector for the arguments."""
+
+    def decorator(func):
+        return Detector(func, key, resources, output, period, priority)
+
+    return decorator
+
+
+def _default_value(value_type):
+    try:
+        return value_type()
+    except TypeError:
+        # Abstract types such as numbers.Real
+        return 0
+
+
+def _import_detector(module_name, qualname):
+    return getattr(importlib.import_module(module_name), qualname)
+
+
+def _check_output(key, value, schema):
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise TypeError(f"{key} returned {type(value).__name__}, expected dict")
+        for name, value_type in schema.items():
+            if not isinstance(value.get(name), value_type):
+                raise TypeError(
+                    f"{key} returned {type(value.get(name)).__name__} for {name!r}, "
+                    f"expected {value_type.__name__}"
+                )
+    elif not isinstance(value, schema):
+        raise TypeError(
+            f"{key} returned {type(value).__name__}, expected {schema.__name__}"
+        )
+
+
+def _check_fields(detector):
+    for kind, fields in detector.resources.items():
+        if kind not in RESOURCES:
+            raise ValueError(
+                f"{detector.key} needs unknown resource {kind!r}, expected one of: "
+                f"{', '.join(sorted(RESOURCES))}"
+            )
+        for field in fields if RESOURCES[kind].model else ():
+            type_name = RESOURCES[kind].model
+            for part in field.split("."):
+                model = getattr(client.models, type_name, None)
+                types = getattr(model, "openapi_types", None)
+                if not types or part not in types:
+                    raise ValueError(f"{detector.key}: {kind} have no field {field!r}")
+                # Lists are walked into, e.g. status.container_statuses.state
+                type_name = re.sub(r"^list\[(.+)\]$", r"\1", types[part], flags=re.I)
+
+
+def _module_detectors(module):
+    return [value for value in vars(module).values() if isinstance(value, Detector)]
+
+
+@functools.cache
+def load_detectors():
+    """Built-in detectors and those registered by plugins, by result key.
+
+    A plugin registers an entry point in the "k8spulse.detectors" group that
+    points at a detector, a list of detectors or a module defining them; a
+    plugin detector with the key of a built-in one replaces it.
+    """
+    candidates = []
+    for module_name in BUILTIN_DETECTOR_MODULES:
+        candidates.extend(_module_detectors(importlib.import_module(module_name)))
+
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            loaded = entry_point.load()
+        except Exception as e:
+            console.log(
+                f"[red]Error loading detector plugin {entry_point.name}: {e}[/red]"
+            )
+            continue
+        if isinstance(loaded, ModuleType):
+            candidates.extend(_module_detectors(loaded))
+        elif isinstance(loaded, Detector):
+            candidates.append(loaded)
+        else:
+            candidates.extend(loaded)
+
+    detectors = {}
+    for candidate in candidates:
+        try:
+            _check_fields(candidate)
+        except ValueError as e:
+            console.log(f"[red]Skipping detector {candidate.key}: {e}[/red]")
+            continue
+        if candidate.key in detectors:
+            console.log(
+                f"[yellow]Detector {candidate.key} from {candidate.__module__} "
+                f"replaces the one from {detectors[candidate.key].__module__}[/yellow]"
+            )
+        detectors[candidate.key] = candidate
+    return detectors
+
+
+def required_fields(detectors):
+    """Union of the resources the detectors need, as {kind: set of fields}."""
+    fields = {}
+    for detector in detectors:
+        for kind, kind_fields in detector.resources.items():
+            fields.setdefault(kind, set()).update(kind_fields)
+    return fields
+
+
+@functools.cache
+def _kube_configuration(context=None):
+    configuration = client.Configuration()
+    config.load_kube_config(context=context, client_configuration=configuration)
+    return configuration
+
+
+def fetch_resources(
+    kinds, request_timeout=REQUEST_TIMEOUT, failures=None, sharding=None, context=None
+):
+    """List every resource kind once, concurrently, as {kind: objects}.
+
+    With a failures dict, a kind that cannot be listed is recorded there as
+    {kind: error message} and left out instead of failing the whole fetch.
+    With sharding, the kinds that can be listed by namespace are listed in
+    shards (see Sharding) next to the cluster-wide requests of the others.
+    context is the kubeconfig context of the cluster, the current one by
+    default; the clients of the fetch talk to that cluster.
+    """
+    kinds = sorted(set(kinds))
+    if not kinds:
+        return {}
+    # Worker processes serve every cluster, one fetch at a time
+    client.Configuration.set_default(_kube_configuration(context))
+    sharded = {
+        kind: RESOURCES[kind]
+        for kind in kinds
+        if sharding and RESOURCES[kind].fetch_namespace
+    }
+    if sharded:
+        console.log(
+            f"[cyan]Fetching {', '.join(kinds)} ({', '.join(sharded)} by namespace)...[/cyan]"
+        )
+    else:
+        console.log(f"[cyan]Fetching {', '.join(kinds)}...[/cyan]")
+    whole = [kind for kind in kinds if kind not in sharded]
+    # The API calls of the fetch threads count in the stats of this run
+    with ThreadPoolExecutor(max_workers=len(whole) + 1) as executor:
+        futures = {
+            kind: executor.submit(
+                with_api_stats(RESOURCES[kind].fetch), request_timeout
+            )
+            for kind in whole
+        }
+        if sharded:
+            shards = executor.submit(
+                with_api_stats(fetch_sharded),
+                sharded,
+                request_timeout,
+                sharding,
+                failures,
+            )
+        fetched = {}
+        for kind, future in futures.items():
+            try:
+                fetched[kind] = future.result()
+            except Exception as e:
+                if failures is None:
+                    raise
+                failures[kind] = str(e)
+        if sharded:
+            fetched.update(shards.result())
+        return fetched
+
+
+def run_detectors(
+    detectors,
+    profile_dir=None,
+    request_timeout=REQUEST_TIMEOUT,
+    sharding=None,
+    context=None,
+):
+    """Fetch what the detectors need once and run all of them over the shared data.
+
+    Meant to run in the detector worker processes. Returns (outcomes, errors,
+    fetch_stats): the (result, stats) of every detector that succeeded, the
+    error message of every one that failed, and the stats of the fetch (None
+    when none of the detectors reads cluster objects). A resource kind that
+    cannot be listed, e.g. because the call timed out, only fails the
+    detectors that read it. sharding and context are passed on to
+    fetch_resources.
+    """
+    fetch_stats = None
+    kinds = required_fields(detectors)
+    failures = {}
+    if kinds:
+        data, fetch_stats = run_instrumented(
+            functools.partial(
+                fetch_resources, kinds, request_timeout, failures, sharding, context
+            ),
+            profile_dir,
+            name="fetch",
+        )
+    else:
+        data = {}
+
+    outcomes, errors = {}, {}
+    for detector in detectors:
+        failed = [kind for kind in detector.resources if kind in failures]
+        if failed:
+            errors[detector.key] = f"could not list {failed[0]}: {failures[failed[0]]}"
+            continue
+        try:
+            outcomes[detector.key] = run_instrumented(
+                functools.partial(detector.run, data), profile_dir, name=detector.key
+            )
+        except Exception as e:
+            errors[detector.key] = str(e)
+    return outcomes, errors, fetch_stats
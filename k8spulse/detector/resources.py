@@ -1,17 +1,29 @@
-from kubernetes import client, config
+import numbers
 from rich.console import Console
+from k8spulse.detector.plugins import detector
 
 console = Console()
 
 
-def get_cluster_resource_metrics():
-    # Load the configuration from the default environment
-    config.load_kube_config()
-
-    # Initialize APIs
-    v1 = client.CoreV1Api()
-    custom_api = client.CustomObjectsApi()  # API para obtener las métricas
-
+@detector(
+    "resource_metrics",
+    resources={
+        "nodes": ["status.capacity"],
+        "pods": ["spec.containers.resources"],
+        "pod_metrics": ["containers.usage"],
+    },
+    output={
+        "total_cpu_capacity_mcores": numbers.Real,
+        "total_memory_capacity_mib": numbers.Real,
+        "total_cpu_requested_mcores": numbers.Real,
+        "total_memory_requested_mib": numbers.Real,
+        "total_cpu_used_mcores": numbers.Real,
+        "total_memory_used_mib": numbers.Real,
+    },
+    period=60,
+    priority=2,
+)
+def get_cluster_resource_metrics(nodes, pods, pod_metrics):
     total_cpu_capacity = 0
     total_memory_capacity = 0
     total_cpu_requested = 0
@@ -19,9 +31,6 @@ def get_cluster_resource_metrics():
     total_cpu_used = 0
     total_memory_used = 0
 
-    nodes = v1.list_node().items
-    pods = v1.list_pod_for_all_namespaces().items
-
     # Calculate the total capacity of the cluster
     console.log("[cyan]Calculating total cluster capacity...[/cyan]")
     for node in nodes:
@@ -124,54 +133,39 @@ def get_cluster_resource_metrics():
                         f"[red]Invalid memory requested value: {memory_requested}[/red]"
                     )
 
-    # Attempt to retrieve usage data using Metrics API
-    try:
-        console.log(
-            "[cyan]Fetching real-time usage metrics from Metrics Server...[/cyan]"
-        )
-        metrics = custom_api.list_namespaced_custom_object(
-            group="metrics.k8s.io",
-            version="v1beta1",
-            namespace="default",
-            plural="pods",
-        )
-
-        for pod_metric in metrics["items"]:
-            for container_metric in pod_metric["containers"]:
-                # CPU usage
-                if "cpu" in container_metric["usage"]:
-                    cpu_used = container_metric["usage"]["cpu"]
-                    if "n" in cpu_used:
-                        total_cpu_used += (
-                            int(cpu_used.replace("n", "")) / 1e6
-                        )  # Convert nanocores to millicores
-                    elif "m" in cpu_used:
-                        total_cpu_used += int(cpu_used.replace("m", ""))
-                    elif cpu_used.isdigit():
-                        total_cpu_used += int(cpu_used) * 1000  # Assuming it's in cores
-
-                # Memory usage
-                if "memory" in container_metric["usage"]:
-                    memory_used = container_metric["usage"]["memory"]
-                    if "Ki" in memory_used:
-                        total_memory_used += int(memory_used.replace("Ki", "")) / 1024
-                    elif "Mi" in memory_used:
-                        total_memory_used += int(memory_used.replace("Mi", ""))
-                    elif "Gi" in memory_used:
-                        total_memory_used += int(memory_used.replace("Gi", "")) * 1024
-                    elif "M" in memory_used:
-                        total_memory_used += int(memory_used.replace("M", ""))
-                    elif memory_used.isdigit():
-                        total_memory_used += int(memory_used) / (1024 * 1024)
-                    else:
-                        console.log(
-                            f"[yellow]Unexpected memory usage unit: {memory_used}[/yellow]"
-                        )
-
-    except client.exceptions.ApiException as e:
-        console.log(
-            f"[yellow]Metrics server not available or error fetching metrics: {str(e)}[/yellow]"
-        )
+    # Usage data from the Metrics API (empty when the metrics server is not available)
+    console.log("[cyan]Calculating real-time usage from Metrics Server...[/cyan]")
+    for pod_metric in pod_metrics:
+        for container_metric in pod_metric["containers"]:
+            # CPU usage
+            if "cpu" in container_metric["usage"]:
+                cpu_used = container_metric["usage"]["cpu"]
+                if "n" in cpu_used:
+                    total_cpu_used += (
+                        int(cpu_used.replace("n", "")) / 1e6
+                    )  # Convert nanocores to millicores
+                elif "m" in cpu_used:
+                    total_cpu_used += int(cpu_used.replace("m", ""))
+                elif cpu_used.isdigit():
+                    total_cpu_used += int(cpu_used) * 1000  # Assuming it's in cores
+
+            # Memory usage
+            if "memory" in container_metric["usage"]:
+                memory_used = container_metric["usage"]["memory"]
+                if "Ki" in memory_used:
+                    total_memory_used += int(memory_used.replace("Ki", "")) / 1024
+                elif "Mi" in memory_used:
+                    total_memory_used += int(memory_used.replace("Mi", ""))
+                elif "Gi" in memory_used:
+                    total_memory_used += int(memory_used.replace("Gi", "")) * 1024
+                elif "M" in memory_used:
+                    total_memory_used += int(memory_used.replace("M", ""))
+                elif memory_used.isdigit():
+                    total_memory_used += int(memory_used) / (1024 * 1024)
+                else:
+                    console.log(
+                        f"[yellow]Unexpected memory usage unit: {memory_used}[/yellow]"
+                    )
 
     # Log all gathered metrics for better debugging
     console.log(f"[blue]Total CPU Capacity: {total_cpu_capacity} mcores[/blue]")
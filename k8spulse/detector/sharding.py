@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes import client
+from k8spulse.metrics import with_api_stats
+
+# Retrying a shard is worth it on throttling and server errors; other API
+# errors (e.g. forbidden) fail the same way every time
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class Sharding:
+    """How to split the listing of namespaced resources on very large clusters.
+
+    Instead of one cluster-wide request per kind, every namespace is listed
+    on its own, in pages of page_size objects, on at most `workers`
+    concurrent requests shared by all the kinds of a fetch. A shard that
+    fails (e.g. it timed out or was throttled) is retried up to `retries`
+    times with exponential backoff, starting at `backoff` seconds; an
+    expired continue token restarts the listing of its namespace.
+    """
+
+    def __init__(self, workers=8, page_size=500, retries=3, backoff=0.5):
+        self.workers = workers
+        self.page_size = page_size
+        self.retries = retries
+        self.backoff = backoff
+
+
+def _list_namespaces(timeout):
+    return [
+        namespace.metadata.name
+        for namespace in client.CoreV1Api()
+        .list_namespace(_request_timeout=timeout)
+        .items
+    ]
+
+
+def _list_shard(fetch_namespace, namespace, timeout, sharding):
+    items = []
+    token = None
+    attempts = 0
+    while True:
+        try:
+            page = fetch_namespace(
+                namespace, timeout, limit=sharding.page_size, _continue=token
+            )
+        except Exception as e:
+            status = getattr(e, "status", None)
+            if status == 410:
+                # The continue token expired, list the namespace again
+                items, token = [], None
+            elif status is not None and status not in RETRYABLE_STATUS:
+                raise
+            attempts += 1
+            if attempts > sharding.retries:
+                raise
+            time.sleep(sharding.backoff * 2 ** (attempts - 1))
+            continue
+        items.extend(page.items)
+        token = page.metadata._continue
+        if not token:
+            return items
+
+
+def fetch_sharded(resources, timeout, sharding, failures=None):
+    """List every resource namespace by namespace and merge the shards, as {kind: objects}.
+
+    resources maps kinds to their Resource, which must have fetch_namespace;
+    the objects of a Resource with build are passed through it.
+    With a failures dict, a kind with a shard that still fails after its
+    retries is recorded there as {kind: error message} and left out, as the
+    other shards alone would under-count; without it the error is raised.
+    """
+    try:
+        namespaces = _list_namespaces(timeout)
+    except Exception as e:
+        if failures is None:
+            raise
+        failures.update(dict.fromkeys(resources, f"could not list namespaces: {e}"))
+        return {}
+
+    with ThreadPoolExecutor(max_workers=sharding.workers) as executor:
+        futures = {
+            kind: [
+                executor.submit(
+                    with_api_stats(_list_shard),
+                    resource.fetch_namespace,
+                    namespace,
+                    timeout,
+                    sharding,
+                )
+                for namespace in namespaces
+            ]
+            for kind, resource in resources.items()
+        }
+        fetched = {}
+        for kind, shards in futures.items():
+            try:
+                items = [item for shard in shards for item in shard.result()]
+                build = resources[kind].build
+                fetched[kind] = build(items) if build else items
+            except Exception as e:
+                if failures is None:
+                    raise
+                failures[kind] = str(e)
+        return fetched
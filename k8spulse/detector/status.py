@@ -2,37 +2,70 @@ import os
 import requests
 import yaml
 from collections import defaultdict
-from kubernetes import client, config
 from rich.console import Console
+from k8spulse.detector.plugins import REQUEST_TIMEOUT, detector
 
 console = Console()
 
-# Load Kubernetes config
-config.load_kube_config()
 
-
-def get_nodes_with_issues():
+def describe_node(node):
+    """YAML dump of a node without the fields that change on every update.
+
+    The resourceVersion, managed fields and heartbeat times of the conditions
+    change all the time without saying anything about the node, and would
+    make every description (and its content-hashed asset) a new one.
+    """
+    description = node.to_dict()
+    metadata = description.get("metadata") or {}
+    metadata.pop("resource_version", None)
+    metadata.pop("managed_fields", None)
+    for condition in (description.get("status") or {}).get("conditions") or []:
+        condition.pop("last_heartbeat_time", None)
+    return yaml.dump(description)
+
+
+@detector(
+    "nodes_with_issues",
+    # The node description is a dump of the whole object
+    resources={"nodes": ["metadata", "spec", "status"]},
+    output=list,
+    period=30,
+    priority=1,
+)
+def get_nodes_with_issues(nodes):
     console.log("[cyan]Identifying nodes with issues...[/cyan]")
-    core_v1 = client.CoreV1Api()
-    nodes = core_v1.list_node()
     nodes_with_issues = []
-    for node in nodes.items:
+    for node in nodes:
         for condition in node.status.conditions:
             if condition.type == "Ready" and condition.status != "True":
                 nodes_with_issues.append(
                     {
                         "name": node.metadata.name,
                         "status": condition.status,
-                        "description": yaml.dump(node.to_dict()),
+                        "description": describe_node(node),
                     }
                 )
     return nodes_with_issues
 
 
-def get_unusual_events():
+@detector(
+    "unusual_events",
+    resources={
+        "events": [
+            "metadata.namespace",
+            "type",
+            "reason",
+            "message",
+            "first_timestamp",
+            "last_timestamp",
+        ]
+    },
+    output=list,
+    period=60,
+    priority=3,
+)
+def get_unusual_events(events):
     console.log("[cyan]Fetching unusual events from Kubernetes...[/cyan]")
-    core_v1 = client.CoreV1Api()
-    events = core_v1.list_event_for_all_namespaces()
     event_summary = defaultdict(
         lambda: {
             "count": 0,
@@ -44,7 +77,7 @@ def get_unusual_events():
         }
     )
 
-    for event in events.items:
+    for event in events:
         if event.type != "Normal":
             key = (event.metadata.namespace, event.reason, event.message)
             event_summary[key]["count"] += 1
@@ -61,88 +94,76 @@ def get_unusual_events():
     return sorted_events[:50]
 
 
-def get_semaphore_status():
+# Status key, namespace and name of the system deployments shown in the semaphore
+SEMAPHORE_DEPLOYMENTS = [
+    ("kube_dns_status", "kube-system", "kube-dns"),
+    ("cast_ai_agent_status", "castai-agent", "castai-agent"),
+    (
+        "cast_ai_workload_autoscaler_status",
+        "castai-agent",
+        "castai-workload-autoscaler",
+    ),
+    (
+        "cast_ai_cluster_controller_status",
+        "castai-agent",
+        "castai-cluster-controller",
+    ),
+]
+
+
+def _has_ready_replicas(deployment):
+    ready_replicas = deployment.status.ready_replicas
+    return bool(ready_replicas and ready_replicas > 0)
+
+
+@detector(
+    "semaphore_statuses",
+    resources={
+        "deployments": ["metadata.namespace", "metadata.name", "status.ready_replicas"]
+    },
+    output={
+        "metrics_server_status": bool,
+        "kube_dns_status": bool,
+        "cast_ai_agent_status": bool,
+        "cast_ai_workload_autoscaler_status": bool,
+        "cast_ai_cluster_controller_status": bool,
+    },
+    period=15,
+    priority=0,
+)
+def get_semaphore_status(deployments):
     console.log("[cyan]Fetching status of Kubernetes services...[/cyan]")
-    apps_v1 = client.AppsV1Api()
-    statuses = {
-        "metrics_server_status": False,
-        "kube_dns_status": False,
-        "cast_ai_agent_status": False,
-        "cast_ai_workload_autoscaler_status": False,
-        "cast_ai_cluster_controller_status": False,
+    by_name = {
+        (deployment.metadata.namespace, deployment.metadata.name): deployment
+        for deployment in deployments
     }
 
     # Metrics Server
-    try:
-        deployments = apps_v1.list_namespaced_deployment(namespace="kube-system")
-        metrics_server = next(
-            (
-                deployment
-                for deployment in deployments.items
-                if deployment.metadata.name.startswith("metrics-server")
-            ),
-            None,
-        )
-        if (
-            metrics_server
-            and metrics_server.status.ready_replicas
-            and metrics_server.status.ready_replicas > 0
-        ):
-            statuses["metrics_server_status"] = True
-    except client.exceptions.ApiException:
-        console.log("[red]Error fetching metrics-server status[/red]")
-
-    # Kube-DNS
-    try:
-        kube_dns = apps_v1.read_namespaced_deployment(
-            name="kube-dns", namespace="kube-system"
+    metrics_server = next(
+        (
+            deployment
+            for (namespace, name), deployment in by_name.items()
+            if namespace == "kube-system" and name.startswith("metrics-server")
+        ),
+        None,
+    )
+    statuses = {
+        "metrics_server_status": bool(
+            metrics_server and _has_ready_replicas(metrics_server)
         )
-        if kube_dns.status.ready_replicas and kube_dns.status.ready_replicas > 0:
-            statuses["kube_dns_status"] = True
-    except client.exceptions.ApiException:
-        console.log("[red]Error fetching kube-dns status[/red]")
+    }
 
-    # CAST AI Agent
-    try:
-        cast_ai_agent = apps_v1.read_namespaced_deployment(
-            name="castai-agent", namespace="castai-agent"
-        )
-        if (
-            cast_ai_agent.status.ready_replicas
-            and cast_ai_agent.status.ready_replicas > 0
-        ):
-            statuses["cast_ai_agent_status"] = True
-    except client.exceptions.ApiException:
-        console.log("[red]Error fetching castai-agent status[/red]")
-
-    # CAST AI Workload Autoscaler
-    try:
-        cast_ai_workload_autoscaler = apps_v1.read_namespaced_deployment(
-            name="castai-workload-autoscaler", namespace="castai-agent"
-        )
-        if (
-            cast_ai_workload_autoscaler.status.ready_replicas
-            and cast_ai_workload_autoscaler.status.ready_replicas > 0
-        ):
-            statuses["cast_ai_workload_autoscaler_status"] = True
-    except client.exceptions.ApiException:
-        console.log("[red]Error fetching castai-workload-autoscaler status[/red]")
-
-    # CAST AI Cluster Controller
-    try:
-        cast_ai_cluster_controller = apps_v1.read_namespaced_deployment(
-            name="castai-cluster-controller", namespace="castai-agent"
-        )
-        if (
-            cast_ai_cluster_controller.status.ready_replicas
-            and cast_ai_cluster_controller.status.ready_replicas > 0
-        ):
-            statuses["cast_ai_cluster_controller_status"] = True
-    except client.exceptions.ApiException:
-        console.log("[red]Error fetching castai-cluster-controller status[/red]")
+    # Kube-DNS and CAST AI components
+    for status_key, namespace, name in SEMAPHORE_DEPLOYMENTS:
+        deployment = by_name.get((namespace, name))
+        if deployment is None:
+            console.log(f"[red]Deployment {namespace}/{name} not found[/red]")
+        statuses[status_key] = bool(deployment and _has_ready_replicas(deployment))
 
     return statuses
 
+
+@detector("cast_events", output=list, period=120, priority=4)
 def get_latest_cast_events(limit=50):
     console.log("[cyan]Starting to fetch the latest Cast.AI events...[/cyan]")
 
@@ -175,7 +196,7 @@ def get_latest_cast_events(limit=50):
 
     try:
         # Make the request
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
 
         # Log the response status code
         console.log(f"[yellow]Response status code: {response.status_code}[/yellow]")
@@ -2,10 +2,13 @@ import re
 import shutil
 import subprocess
 from rich.console import Console
+from k8spulse.detector.plugins import detector
 
 console = Console()
 
 
+# Execs into the pods through kubectl rather than reading shared cluster objects
+@detector("zombie_processes", output=list, period=900, priority=9)
 def detect_zombie_processes_in_pods(interval=300):
     # Verify if kubectl is installed
     if not shutil.which("kubectl"):
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """Downsample a series with the largest-triangle-three-buckets algorithm.
+
+    Returns at most `threshold` points, always keeping the first and the last
+    one and, for every bucket in between, the point that forms the largest
+    triangle with the previously selected point and the next bucket's average.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    # Bucket edges over the points between the first and the last one
+    edges = np.append(np.linspace(1, n - 1, threshold - 1).astype(int), n)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # Averages of every bucket (and of the last point) do not depend on the
+    # selection, so they are computed for all buckets at once
+    sizes = np.diff(edges)
+    avg_x = np.add.reduceat(x, edges[:-1]) / sizes
+    avg_y = np.add.reduceat(y, edges[:-1]) / sizes
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return x[selected], y[selected]
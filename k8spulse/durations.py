@@ -0,0 +1,24 @@
+import re
+
+# Seconds per unit; a bare number is in seconds
+UNITS = {
+    "": 1,
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+    "d": 86400,
+    "w": 7 * 86400,
+    "mo": 30 * 86400,
+}
+
+
+def parse_duration(value):
+    """Convert a duration such as 90, 30s, 10m, 2h, 7d, 2w or 3mo into seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(mo|s|m|h|d|w)?\s*", str(value).lower())
+    if not match:
+        raise ValueError(
+            f"Invalid duration '{value}'. Use seconds or a number followed by s, m, h, d, w or mo."
+        )
+    return float(match.group(1)) * UNITS[match.group(2) or ""]
@@ -0,0 +1,201 @@
+import math
+import os
+import subprocess
+import threading
+import time
+from rich.console import Console
+from k8spulse.metrics import metrics
+
+console = Console()
+
+# Trailer marking the commits made by k8spulse, so --git-amend only ever
+# rewrites report commits
+REPORT_TRAILER = "K8sPulse-Report"
+
+# Delay before retrying a failed commit or push, doubled on every failure up
+# to the maximum
+RETRY_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+
+
+def retry_delay(failures):
+    return min(RETRY_SECONDS * 2 ** (failures - 1), RETRY_MAX_SECONDS)
+
+
+class GitPublisher:
+    """Commit and push published files from a background thread.
+
+    submit() only records the files and returns, so the monitoring loop never
+    waits on git. Files submitted while a commit or push is running, or within
+    min_interval seconds of the last commit, are coalesced into the next
+    commit. The files of a failed commit are queued again; a failed commit
+    or push is retried with exponential backoff and includes every file and
+    commit added in the meantime. With amend, a HEAD commit made by k8spulse
+    for the same environment is amended instead of stacking a new commit on
+    it, and pushed with --force-with-lease, so report-only history does not
+    grow with every cycle.
+    """
+
+    def __init__(self, env_name, min_interval=0, amend=False, cwd=None):
+        self.env_name = env_name
+        self.min_interval = min_interval
+        self.amend = amend
+        self.cwd = cwd
+        self._cond = threading.Condition()
+        self._pending = set()
+        self._last_commit = -math.inf
+        self._commit_retry_at = 0
+        self._commit_failures = 0
+        self._needs_push = False
+        self._push_at = 0
+        self._push_failures = 0
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, paths):
+        """Queue files for the next commit."""
+        with self._cond:
+            self._pending.update(paths)
+            self._cond.notify()
+
+    def close(self, timeout=None):
+        """Commit what is pending, try a last push and stop the thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _commit_at(self):
+        return max(self._last_commit + self.min_interval, self._commit_retry_at)
+
+    def _next_action_at(self):
+        commit_at = self._commit_at() if self._pending else math.inf
+        push_at = self._push_at if self._needs_push else math.inf
+        return min(commit_at, push_at)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        break
+                    wait = self._next_action_at() - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(None if wait == math.inf else wait)
+                stopping = self._stopping
+                paths = None
+                if self._pending and (
+                    stopping or time.monotonic() >= self._commit_at()
+                ):
+                    paths, self._pending = sorted(self._pending), set()
+
+            if paths:
+                self._last_commit = time.monotonic()
+                committed = self._commit(paths)
+                if committed is None:
+                    self._retry_commit(paths, stopping)
+                else:
+                    self._commit_failures = 0
+                    self._commit_retry_at = 0
+                if committed:
+                    self._needs_push = True
+                    self._push_at = 0
+            if self._needs_push and (stopping or time.monotonic() >= self._push_at):
+                self._push()
+            if stopping:
+                return
+
+    def _git(self, step, *args):
+        start = time.perf_counter()
+        result = subprocess.run(
+            ["git", *args], cwd=self.cwd, capture_output=True, text=True
+        )
+        metrics.observe(
+            "k8spulse_git_duration_seconds", time.perf_counter() - start, step=step
+        )
+        return result
+
+    def _fail(self, step, result):
+        metrics.inc("k8spulse_git_failures_total", step=step)
+        output = (result.stderr or result.stdout).strip()
+        console.log(f"[red]git {step} failed: {output}[/red]")
+
+    def _retry_commit(self, paths, stopping):
+        # The files go back in the queue, merged with the ones submitted
+        # since, so a failed commit never loses them
+        with self._cond:
+            self._pending.update(paths)
+        if stopping:
+            console.log(
+                f"[red]Exiting with {len(paths)} report files left uncommitted[/red]"
+            )
+            return
+        self._commit_failures += 1
+        delay = retry_delay(self._commit_failures)
+        self._commit_retry_at = time.monotonic() + delay
+        console.log(f"[yellow]Retrying the commit in {delay} seconds[/yellow]")
+
+    def _amend_head(self):
+        result = self._git("log", "log", "-1", "--format=%B")
+        return (
+            result.returncode == 0
+            and f"{REPORT_TRAILER}: {self.env_name}" in result.stdout
+        )
+
+    def _commit(self, paths):
+        # True when a commit was made, False when the files did not change
+        # and None when git failed
+        existing = [path for path in paths if os.path.exists(path)]
+        deleted = [path for path in paths if path not in existing]
+        if existing:
+            result = self._git("add", "add", "--", *existing)
+            if result.returncode != 0:
+                self._fail("add", result)
+                return None
+        if deleted:
+            # Files deleted since they were submitted, e.g. pruned assets;
+            # ones that were never committed are ignored
+            result = self._git(
+                "add", "rm", "--cached", "--quiet", "--ignore-unmatch", "--", *deleted
+            )
+            if result.returncode != 0:
+                self._fail("add", result)
+                return None
+
+        if self._git("diff", "diff", "--cached", "--quiet").returncode == 0:
+            # The files did not change since the last commit
+            return False
+
+        message = (
+            f"{self.env_name} statistics update\n\n{REPORT_TRAILER}: {self.env_name}"
+        )
+        args = ["commit", "-m", message]
+        amend = self.amend and self._amend_head()
+        if amend:
+            args.append("--amend")
+        result = self._git("commit", *args)
+        if result.returncode != 0:
+            self._fail("commit", result)
+            return None
+        metrics.inc("k8spulse_git_commits_total", amended=str(amend).lower())
+        console.log(
+            f"[green]{'Amended' if amend else 'Committed'} {len(paths)} report files[/green]"
+        )
+        return True
+
+    def _push(self):
+        args = ["push", "--force-with-lease"] if self.amend else ["push"]
+        result = self._git("push", *args)
+        if result.returncode == 0:
+            self._needs_push = False
+            self._push_failures = 0
+            console.log("[green]Pushed the report to the Git repository[/green]")
+            return
+
+        self._fail("push", result)
+        self._push_failures += 1
+        delay = retry_delay(self._push_failures)
+        self._push_at = time.monotonic() + delay
+        console.log(f"[yellow]Retrying the push in {delay} seconds[/yellow]")
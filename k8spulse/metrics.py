@@ -0,0 +1,352 @@
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rich.console import Console
+
+console = Console()
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Description of every metric, the # HELP line of the Prometheus endpoint
+HELP = {
+    "k8spulse_alert_firing": "1 while the alert rule is firing, else 0.",
+    "k8spulse_alert_notification_failures_total": "Alert notifications a sink failed to deliver.",
+    "k8spulse_alert_notifications_total": "Alert notifications sent, by sink.",
+    "k8spulse_api_calls_total": "Kubernetes API calls, by detector (or shared fetch) and resource.",
+    "k8spulse_api_objects_total": "Objects listed from the Kubernetes API.",
+    "k8spulse_api_response_bytes_total": "Bytes of Kubernetes API responses.",
+    "k8spulse_container_restarts_total": "Container restarts counted between detector runs.",
+    "k8spulse_detector_duration_seconds": "Duration of detector runs.",
+    "k8spulse_detector_errors_total": "Detector runs that failed.",
+    "k8spulse_fetch_duration_seconds": "Duration of the resource fetches shared by detector batches.",
+    "k8spulse_git_commits_total": "Report commits made by the git publisher.",
+    "k8spulse_git_duration_seconds": "Duration of git commands, by step.",
+    "k8spulse_git_failures_total": "git commands that failed, by step.",
+    "k8spulse_last_cycle_timestamp_seconds": "Unix time the last report cycle ended.",
+    "k8spulse_openai_cache_hits_total": "Recommendations reused from the cache.",
+    "k8spulse_openai_prompt_tokens": "Estimated tokens of the last OpenAI prompt.",
+    "k8spulse_openai_requests_total": "Recommendations requested from OpenAI.",
+    "k8spulse_process_resident_memory_bytes": "Resident memory of the main process.",
+    "k8spulse_report_changes": "Changes since the last published report, by kind.",
+    "k8spulse_stage_duration_seconds": "Duration of the stages of a report cycle.",
+    "k8spulse_stale_detectors": "Detectors whose latest result cannot be trusted.",
+    "k8spulse_worker_max_rss_bytes": "Peak resident memory of a detector worker process.",
+}
+
+
+def current_rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and latency histograms.
+
+    Metrics are identified by a name and a tuple of (label, value) pairs and
+    can be exposed in the Prometheus text format or as JSON.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = defaultdict(Histogram)
+        self.counters = defaultdict(float)
+        self.gauges = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            self.histograms[self._key(name, labels)].observe(value)
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    @contextmanager
+    def stage(self, stage, trace=None):
+        """Time a stage of the report cycle, recording it in the trace dict if given."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("k8spulse_stage_duration_seconds", elapsed, stage=stage)
+            if trace is not None:
+                trace.setdefault("stages", {})[stage] = round(elapsed, 6)
+
+    def record_detector(self, detector, stats):
+        """Merge the stats returned by run_instrumented for one detector run."""
+        self.observe(
+            "k8spulse_detector_duration_seconds", stats["duration"], detector=detector
+        )
+        # ru_maxrss is the peak of the worker process over its lifetime, not
+        # of one detector run
+        self.set(
+            "k8spulse_worker_max_rss_bytes",
+            stats["max_rss_bytes"],
+            worker=stats["worker"],
+        )
+        for resource_name, api in stats["api"].items():
+            labels = {"detector": detector, "resource": resource_name}
+            self.inc("k8spulse_api_calls_total", api["calls"], **labels)
+            self.inc("k8spulse_api_response_bytes_total", api["bytes"], **labels)
+            self.inc("k8spulse_api_objects_total", api["objects"], **labels)
+
+    def record_fetch(self, stats):
+        """Merge the stats of a resource fetch shared by several detectors."""
+        self.observe("k8spulse_fetch_duration_seconds", stats["duration"])
+        for resource_name, api in stats["api"].items():
+            labels = {"detector": "fetch", "resource": resource_name}
+            self.inc("k8spulse_api_calls_total", api["calls"], **labels)
+            self.inc("k8spulse_api_response_bytes_total", api["bytes"], **labels)
+            self.inc("k8spulse_api_objects_total", api["objects"], **labels)
+
+    def to_prometheus(self):
+        lines = []
+        described = set()
+
+        def family(name, kind):
+            # The series of a metric follow its # HELP and # TYPE lines
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                family(name, "counter")
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                family(name, "gauge")
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                family(name, "histogram")
+                for bound, total in histogram.cumulative():
+                    bucket_labels = labels + (("le", f"{bound:g}"),)
+                    lines.append(
+                        f"{name}_bucket{_format_labels(bucket_labels)} {total}"
+                    )
+                inf_labels = labels + (("le", "+Inf"),)
+                lines.append(
+                    f"{name}_bucket{_format_labels(inf_labels)} {histogram.count}"
+                )
+                lines.append(
+                    f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}"
+                )
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        def entry(name, labels, **values):
+            return {"name": name, "labels": dict(labels), **values}
+
+        with self._lock:
+            return {
+                "counters": [
+                    entry(n, l, value=v) for (n, l), v in self.counters.items()
+                ],
+                "gauges": [entry(n, l, value=v) for (n, l), v in self.gauges.items()],
+                "histograms": [
+                    entry(n, l, count=h.count, sum=h.sum, buckets=dict(h.cumulative()))
+                    for (n, l), h in self.histograms.items()
+                ],
+            }
+
+
+def _format_value(value):
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+metrics = MetricsRegistry()
+
+
+# Kubernetes API accounting, collected inside the detector worker processes.
+# Every run_instrumented() call counts in its own dict, so runs on several
+# threads of a process (e.g. snapshots of several clusters) stay apart
+_api_stats = contextvars.ContextVar("api_stats", default=None)
+_api_local = threading.local()
+_api_instrumented = False
+
+
+def _resource_from_url(url):
+    # /api/v1/namespaces/ns/pods -> pods, /apis/apps/v1/deployments -> deployments
+    path = url.split("://", 1)[-1].split("/", 1)[-1].split("?", 1)[0]
+    segments = [s for s in path.split("/") if s]
+    if segments[:1] == ["api"]:
+        segments = segments[2:]
+    elif segments[:1] == ["apis"]:
+        segments = segments[3:]
+    if segments[:1] == ["namespaces"] and len(segments) > 2:
+        segments = segments[2:]
+    return segments[0] if segments else "unknown"
+
+
+def install_api_instrumentation():
+    """Count Kubernetes API calls, response bytes and listed objects per resource."""
+    global _api_instrumented
+    if _api_instrumented:
+        return
+    from kubernetes.client import api_client, rest
+
+    request = rest.RESTClientObject.request
+    deserialize = api_client.ApiClient.deserialize
+
+    def counted_request(self, method, url, *args, **kwargs):
+        resource_name = _resource_from_url(url)
+        _api_local.resource = resource_name
+        response = request(self, method, url, *args, **kwargs)
+        api_stats = _api_stats.get()
+        if api_stats is not None:
+            stats = api_stats[resource_name]
+            stats["calls"] += 1
+            # Older clients expose the body as .data, newer ones on the urllib3 response
+            body = getattr(response, "data", None) or getattr(
+                getattr(response, "response", None), "data", None
+            )
+            stats["bytes"] += len(body or b"")
+        return response
+
+    def counted_deserialize(self, *args, **kwargs):
+        result = deserialize(self, *args, **kwargs)
+        items = (
+            result.get("items")
+            if isinstance(result, dict)
+            else getattr(result, "items", None)
+        )
+        if isinstance(items, list):
+            count_api_objects(len(items))
+        return result
+
+    rest.RESTClientObject.request = counted_request
+    api_client.ApiClient.deserialize = counted_deserialize
+    _api_instrumented = True
+
+
+def count_api_objects(count):
+    """Count objects listed from a response that was not deserialized into models."""
+    api_stats = _api_stats.get()
+    if api_stats is not None:
+        api_stats[getattr(_api_local, "resource", "unknown")]["objects"] += count
+
+
+def with_api_stats(func):
+    """Wrap func so the API calls it makes on another thread count in this run.
+
+    Threads do not inherit context variables, so work handed to a thread
+    pool by a detector or fetch is wrapped to run in a copy of its context.
+    """
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def run_instrumented(func, profile_dir=None, name=None):
+    """Run a detector and return (result, stats) for MetricsRegistry.record_detector.
+
+    Meant to run in the detector worker processes. With profile_dir, the run
+    is profiled and dumped as <name>.prof there (the function name by default).
+    """
+    install_api_instrumentation()
+    api_stats = defaultdict(lambda: {"calls": 0, "bytes": 0, "objects": 0})
+    token = _api_stats.set(api_stats)
+    profiler = cProfile.Profile() if profile_dir else None
+
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        result = func()
+    finally:
+        _api_stats.reset(token)
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(
+                os.path.join(profile_dir, f"{name or func.__name__}.prof")
+            )
+    stats = {
+        "duration": time.perf_counter() - start,
+        # Peak of the whole process so far, see record_detector
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "worker": os.getpid(),
+        "api": {name: dict(values) for name, values in api_stats.items()},
+    }
+    return result, stats
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = metrics.to_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/metrics.json":
+            body = json.dumps(metrics.to_dict()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics (Prometheus) and /metrics.json from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    console.log(f"[cyan]Serving metrics on http://{host}:{port}/metrics[/cyan]")
+    return server
@@ -1,91 +1,350 @@
+import hashlib
+import json
+import threading
 import time
-from openai import OpenAI
+from collections import OrderedDict
 from rich.console import Console
+from k8spulse.metrics import metrics
 
 console = Console()
 
-# Initialize OpenAI client (it will automatically use the API key from environment variables)
+# Upper bound of the prompt built from a cycle, in tokens
+PROMPT_TOKEN_BUDGET = 1500
 
+# JSON of identifiers and numbers tokenizes worse than prose, so a token is
+# counted as 3 characters instead of the usual 4: the estimate errs on the
+# side of a smaller prompt and no tokenizer is needed
+CHARS_PER_TOKEN = 3
 
-def get_openai_recommendation(report_file_path, gpt_model):
-    client = OpenAI()
+# Longest text (event message, node condition...) kept in the prompt
+MAX_TEXT_LENGTH = 200
 
-    console.log("[cyan]Requesting recommendation from OpenAI...[/cyan]")
+# Lists of the summary, most significant first, that are shortened (from
+# their least significant end) until the prompt fits in its budget
+TRIMMED_LISTS = (
+    "failing_deployments",
+    "restarting_deployments",
+    "nodes_with_issues",
+    "unusual_events",
+    "cast_events",
+)
 
-    # Step 1: Upload the report file to OpenAI
-    with open(report_file_path, "rb") as report_file:
-        uploaded_file = client.files.create(file=report_file, purpose="assistants")
-    file_id = uploaded_file.id
+# Deployment counts of the report, as deployments_with_<count>
+DEPLOYMENT_COUNTS = (
+    "replicas",
+    "zero_replicas",
+    "exact_replicas",
+    "recent_start",
+    "crashloopbackoff",
+)
 
-    if not file_id:
-        console.log("[red]Error: Failed to upload the report to OpenAI.[/red]")
-        return ""
+# Utilization, and the share of the deployments in each count, only change
+# the recommendation when they move by this many points
+PERCENTAGE_STEP = 5
 
-    # Step 2: Create a new thread
-    thread_response = client.beta.threads.create()
-    thread_id = thread_response.id
+# Deployment counts left out of the fingerprint: pods (re)start all the time,
+# and the restarting deployments are fingerprinted by name instead
+VOLATILE_DEPLOYMENT_COUNTS = {"recent_start"}
 
-    if not thread_id:
-        console.log("[red]Error: Failed to create a new thread in OpenAI.[/red]")
-        return ""
+# Seconds a recommendation run may stay queued or in progress before it is
+# cancelled and the cycle goes on without a recommendation
+RUN_TIMEOUT = 120
 
-    # Step 3: Send a message to the thread
-    message_response = client.beta.threads.messages.create(
-        thread_id=thread_id,
-        role="user",
-        content="Attached is a Kubernetes cluster report. Please analyze it and provide a concise and actionable recommendation to improve the overall health of the cluster. Focus on issues related to deployments, pods, metrics server, and CrashLoopBackOff. Only return the result in HTML to put in a innerHTML format with a good style, without using ``` or any other code block delimiters.",
-        attachments=[{"file_id": file_id, "tools": [{"type": "file_search"}]}],
-    )
-    message_id = message_response.id
-
-    if not message_id:
-        console.log("[red]Error: Failed to send a message to OpenAI.[/red]")
-        return ""
-
-    # Step 4: Create the assistant using GPT-4o
-    assistant_response = client.beta.assistants.create(
-        instructions="You are an assistant that provides actionable recommendations based on Kubernetes cluster reports. Consider that Cast.ai is used to analyze resources taints issues that could be normal when using dynamic auto-scaling.",
-        name="Kubernetes Health Assistant",
-        tools=[{"type": "file_search"}],
-        model=gpt_model,
-        temperature=0.7,
-        top_p=1.0,
-    )
-    assistant_id = assistant_response.id
+# Seconds between two polls of the status of a run
+RUN_POLL_INTERVAL = 2
 
-    if not assistant_id:
-        console.log("[red]Error: Failed to create the assistant in OpenAI.[/red]")
-        return ""
+INSTRUCTIONS = (
+    "You are an assistant that provides actionable recommendations based on "
+    "Kubernetes cluster reports. Consider that Cast.ai is used to analyze "
+    "resources taints issues that could be normal when using dynamic auto-scaling."
+)
 
-    # Step 5: Create a run for the thread with the assistant
-    run_response = client.beta.threads.runs.create(
-        thread_id=thread_id, assistant_id=assistant_id
-    )
-    run_id = run_response.id
+PROMPT = (
+    "Below is a JSON summary of a Kubernetes cluster. Please analyze it and "
+    "provide a concise and actionable recommendation to improve the overall "
+    "health of the cluster. Focus on issues related to deployments, pods, "
+    "metrics server, and CrashLoopBackOff. Lists may be shortened; 'omitted' "
+    "counts the entries left out of each. Only return the result in HTML to "
+    "put in a innerHTML format with a good style, without using ``` or any "
+    "other code block delimiters.\n\n"
+)
+
+# Runs end in one of these states when they did not complete
+FAILED_RUN_STATUSES = {"failed", "cancelled", "expired", "incomplete"}
+
+
+def _truncate(text, length=MAX_TEXT_LENGTH):
+    text = str(text or "")
+    return text if len(text) <= length else text[: length - 3] + "..."
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
 
-    if not run_id:
-        console.log("[red]Error: Failed to create a run in OpenAI.[/red]")
-        return ""
 
-    # Step 6: Wait for the run to complete
-    while True:
-        time.sleep(5)  # Wait a few seconds before trying to get the response
-        run_status_response = client.beta.threads.runs.retrieve(
-            thread_id=thread_id, run_id=run_id
+def _dumps(summary):
+    return json.dumps(summary, separators=(",", ":"), sort_keys=True, default=str)
+
+
+def build_summary(results, restart_rates=None, stale_detectors=None):
+    """Salient state of a cycle, as a dict of short values and sorted lists.
+
+    results holds the detector results and CPU/memory percentages of the
+    cycle (the history record). Per-deployment and per-event lists are
+    sorted by significance, so the most important entries survive when
+    fit_summary() shortens them; everything is JSON serializable.
+    """
+    deployments = results.get("deployment_snapshots") or []
+    failing = [
+        snapshot
+        for snapshot in deployments
+        if snapshot["crashloop"]
+        or snapshot["ready_replicas"] < snapshot["desired_replicas"]
+    ]
+    failing.sort(
+        key=lambda s: (
+            not s["crashloop"],
+            s["ready_replicas"] - s["desired_replicas"],
+            -s["restarts"],
         )
-        status = run_status_response.status
+    )
+    rates = sorted((restart_rates or {}).items(), key=lambda item: -item[1])
+    semaphores = {
+        key.removesuffix("_status"): value
+        for key, value in (results.get("semaphore_statuses") or {}).items()
+    }
+    return {
+        "deployments": {
+            "total": results.get("total_deployments", 0),
+            **{
+                key: results.get(f"deployments_with_{key}", 0)
+                for key in DEPLOYMENT_COUNTS
+            },
+        },
+        "utilization_percent": {
+            key: round(results.get(f"{key}_percentage") or 0, 1)
+            for key in ("cpu_used", "cpu_requested", "memory_used", "memory_requested")
+        },
+        "components_up": semaphores,
+        "failing_deployments": [
+            {
+                "deployment": f"{s['namespace']}/{s['name']}",
+                "ready": f"{s['ready_replicas']}/{s['desired_replicas']}",
+                "crashloop": s["crashloop"],
+                "restarts": s["restarts"],
+            }
+            for s in failing
+        ],
+        "restarting_deployments": [
+            {"deployment": deployment, "restarts_per_minute": rate}
+            for deployment, rate in rates
+        ],
+        "nodes_with_issues": [
+            {"node": node["name"], "ready": node["status"]}
+            for node in results.get("nodes_with_issues") or []
+        ],
+        # Already sorted by count by the detector
+        "unusual_events": [
+            {
+                "namespace": event["namespace"],
+                "reason": event["reason"],
+                "message": _truncate(event["message"]),
+                "count": event["count"],
+            }
+            for event in results.get("unusual_events") or []
+        ],
+        "cast_events": [
+            {
+                "type": event.get("eventType"),
+                "node": ((event.get("event") or {}).get("node") or {}).get("name"),
+                "time": event.get("time"),
+            }
+            for event in results.get("cast_events") or []
+        ],
+        "zombie_processes": len(results.get("zombie_processes") or []),
+        "stale_detectors": sorted(stale_detectors or []),
+    }
 
-        if status == "completed":
+
+def fit_summary(summary, budget=PROMPT_TOKEN_BUDGET):
+    """Shorten the lists of a summary until its JSON fits in budget tokens.
+
+    The longest list is halved first, keeping its most significant half,
+    and the number of entries left out of each list is recorded under
+    "omitted". Returns the summary and its JSON.
+    """
+    summary = dict(summary)
+    omitted = {}
+    text = _dumps(summary)
+    while estimate_tokens(text) > budget:
+        longest = max(
+            (key for key in TRIMMED_LISTS if len(summary.get(key) or []) > 0),
+            key=lambda key: len(summary[key]),
+            default=None,
+        )
+        if longest is None:
             break
-        elif status == "failed":
-            console.log("[red]Error: The run has failed.[/red]")
+        kept = len(summary[longest]) // 2
+        omitted[longest] = omitted.get(longest, 0) + len(summary[longest]) - kept
+        summary[longest] = summary[longest][:kept]
+        summary["omitted"] = omitted
+        text = _dumps(summary)
+    return summary, text
+
+
+def _bucket(value, total=100):
+    # Share of total, in PERCENTAGE_STEP points
+    return int(100 * value / total // PERCENTAGE_STEP) if total else 0
+
+
+def fingerprint(summary):
+    """Digest of what a recommendation depends on, ignoring small fluctuations.
+
+    Utilization and the deployment counts (as a share of all deployments)
+    are bucketed in PERCENTAGE_STEP points, failing deployments are reduced
+    to whether they crash loop or have no ready replica at all, restart
+    rates and event counts to which deployments restart and which events
+    occur, and timestamps are left out, so two cycles only get different
+    fingerprints when the state of the cluster meaningfully changed.
+    """
+    counts = summary["deployments"]
+    salient = {
+        "deployments": {
+            key: _bucket(value, counts["total"])
+            for key, value in counts.items()
+            if key != "total" and key not in VOLATILE_DEPLOYMENT_COUNTS
+        },
+        "utilization_percent": {
+            key: _bucket(value) for key, value in summary["utilization_percent"].items()
+        },
+        "components_up": summary["components_up"],
+        "failing_deployments": sorted(
+            (d["deployment"], d["crashloop"], d["ready"].startswith("0/"))
+            for d in summary["failing_deployments"]
+        ),
+        "restarting_deployments": sorted(
+            d["deployment"] for d in summary["restarting_deployments"]
+        ),
+        "nodes_with_issues": sorted(
+            (n["node"], n["ready"]) for n in summary["nodes_with_issues"]
+        ),
+        "unusual_events": sorted(
+            (e["namespace"], e["reason"], e["message"])
+            for e in summary["unusual_events"]
+        ),
+        # Cast.AI keeps adding and removing nodes, only new kinds of events count
+        "cast_events": sorted({str(e["type"]) for e in summary["cast_events"]}),
+        "zombie_processes": summary["zombie_processes"],
+        "stale_detectors": summary["stale_detectors"],
+    }
+    return hashlib.sha256(_dumps(salient).encode()).hexdigest()
+
+
+class Recommender:
+    """OpenAI recommendations for the state of a cluster, asked only when it changes.
+
+    The assistant is created on the first request and reused by every later
+    one (and by every cluster sharing the recommender). Each request sends
+    the summary built by build_summary(), cut down to `token_budget` tokens,
+    as the message text; the recommendations of the last `cache_size`
+    fingerprints are kept, so a cycle whose salient state was already seen
+    reuses its recommendation without calling the API. A run that has not
+    ended after `run_timeout` seconds is cancelled.
+    """
+
+    def __init__(
+        self,
+        gpt_model,
+        token_budget=PROMPT_TOKEN_BUDGET,
+        cache_size=32,
+        client=None,
+        run_timeout=RUN_TIMEOUT,
+    ):
+        self.gpt_model = gpt_model
+        self.token_budget = token_budget
+        self.cache_size = cache_size
+        self.run_timeout = run_timeout
+        self._client = client
+        self._assistant_id = None
+        self._cache = OrderedDict()  # fingerprint -> recommendation
+        self._lock = threading.Lock()
+
+    def _openai(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            # The API key is read from the OPENAI_API_KEY environment variable
+            self._client = OpenAI()
+        return self._client
+
+    def _assistant(self):
+        with self._lock:
+            if self._assistant_id is None:
+                assistant = self._openai().beta.assistants.create(
+                    instructions=INSTRUCTIONS,
+                    name="Kubernetes Health Assistant",
+                    model=self.gpt_model,
+                    temperature=0.7,
+                    top_p=1.0,
+                )
+                self._assistant_id = assistant.id
+            return self._assistant_id
+
+    def recommend(self, summary):
+        """Recommendation for a summary, from the cache or the API ("" on failure)."""
+        key = fingerprint(summary)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                metrics.inc("k8spulse_openai_cache_hits_total")
+                console.log(
+                    "[cyan]Cluster state unchanged, reusing the OpenAI recommendation[/cyan]"
+                )
+                return self._cache[key]
+
+        _, text = fit_summary(summary, self.token_budget)
+        metrics.set("k8spulse_openai_prompt_tokens", estimate_tokens(text))
+        console.log(
+            f"[cyan]Requesting recommendation from OpenAI (~{estimate_tokens(text)} tokens)...[/cyan]"
+        )
+        try:
+            recommendation = self._request(PROMPT + text)
+        except Exception as e:
+            console.log(f"[red]Error requesting the OpenAI recommendation: {e}[/red]")
+            recommendation = ""
+        metrics.inc("k8spulse_openai_requests_total")
+        if not recommendation:
+            # Not cached, so the next cycle asks again
             return ""
 
-    # Step 7: Retrieve the final message from the assistant
-    messages_response = client.beta.threads.messages.list(thread_id=thread_id)
-    messages = messages_response.data
+        with self._lock:
+            self._cache[key] = recommendation
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return recommendation
 
-    # Extract the content from the last message
-    recommendation = messages[0].content[0].text.value if messages else ""
+    def _request(self, content):
+        client = self._openai()
+        run = client.beta.threads.create_and_run(
+            assistant_id=self._assistant(),
+            thread={"messages": [{"role": "user", "content": content}]},
+        )
+        deadline = time.monotonic() + self.run_timeout
+        while run.status not in {"completed"} | FAILED_RUN_STATUSES:
+            if time.monotonic() >= deadline:
+                console.log(
+                    f"[red]Error: The OpenAI run is still {run.status} after "
+                    f"{self.run_timeout}s, cancelling it.[/red]"
+                )
+                client.beta.threads.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+                return ""
+            time.sleep(RUN_POLL_INTERVAL)
+            run = client.beta.threads.runs.retrieve(
+                thread_id=run.thread_id, run_id=run.id
+            )
+        if run.status != "completed":
+            console.log(f"[red]Error: The OpenAI run ended as {run.status}.[/red]")
+            return ""
 
-    return recommendation
+        messages = client.beta.threads.messages.list(thread_id=run.thread_id, limit=1)
+        return messages.data[0].content[0].text.value if messages.data else ""
@@ -0,0 +1,95 @@
+# Detectors whose results are compared between reports
+DIFFED_DETECTORS = ("deployment_snapshots", "nodes_with_issues", "unusual_events")
+
+
+def _workload_failure(snapshot):
+    if snapshot["crashloop"]:
+        return "CrashLoopBackOff"
+    if snapshot["desired_replicas"] > 0 and snapshot["ready_replicas"] == 0:
+        return "no ready replicas"
+    return None
+
+
+def _failing_workloads(snapshots):
+    failing = {}
+    for snapshot in snapshots:
+        reason = _workload_failure(snapshot)
+        if reason:
+            failing[(snapshot["namespace"], snapshot["name"])] = reason
+    return failing
+
+
+def _event_key(event):
+    # Events are grouped by namespace, reason and message by the detector
+    return event["namespace"], event["reason"], event["message"]
+
+
+def diff_results(previous, current):
+    """Changes between two sets of detector results, e.g. of consecutive reports.
+
+    Returns the workloads that started failing (CrashLoopBackOff or no ready
+    replicas) and those that recovered, the nodes that became NotReady and
+    those that no longer are, and the warning events that were not reported
+    before. A detector is only compared when both sets hold a result for it,
+    and skipped when the result is the same object, i.e. it did not run again.
+    """
+    changes = {
+        "failing_workloads": [],
+        "recovered_workloads": [],
+        "not_ready_nodes": [],
+        "recovered_nodes": [],
+        "new_events": [],
+    }
+
+    def changed(key):
+        return key in previous and key in current and previous[key] is not current[key]
+
+    if changed("deployment_snapshots"):
+        before = _failing_workloads(previous["deployment_snapshots"])
+        after = _failing_workloads(current["deployment_snapshots"])
+        present = {
+            (snapshot["namespace"], snapshot["name"])
+            for snapshot in current["deployment_snapshots"]
+        }
+        changes["failing_workloads"] = [
+            {"namespace": namespace, "name": name, "reason": reason}
+            for (namespace, name), reason in sorted(after.items())
+            if (namespace, name) not in before
+        ]
+        # Deleted deployments did not recover
+        changes["recovered_workloads"] = [
+            {"namespace": namespace, "name": name, "reason": reason}
+            for (namespace, name), reason in sorted(before.items())
+            if (namespace, name) not in after and (namespace, name) in present
+        ]
+
+    if changed("nodes_with_issues"):
+        before = {
+            node["name"]: node["status"] for node in previous["nodes_with_issues"]
+        }
+        after = {node["name"]: node["status"] for node in current["nodes_with_issues"]}
+        changes["not_ready_nodes"] = [
+            {"name": name, "status": status}
+            for name, status in sorted(after.items())
+            if name not in before
+        ]
+        changes["recovered_nodes"] = [
+            {"name": name, "status": status}
+            for name, status in sorted(before.items())
+            if name not in after
+        ]
+
+    if changed("unusual_events"):
+        seen = {_event_key(event) for event in previous["unusual_events"]}
+        changes["new_events"] = [
+            event
+            for event in current["unusual_events"]
+            if _event_key(event) not in seen
+        ]
+
+    return changes
+
+
+def count_changes(changes):
+    """Number of changes of every kind, e.g. for traces and metrics."""
+    return {kind: len(items) for kind, items in changes.items()}
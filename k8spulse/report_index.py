@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+from datetime import datetime
+from rich.console import Console
+from k8spulse.atomic_file import write_atomic
+from k8spulse.db import env
+
+console = Console()
+
+MANIFEST_FILE = "reports.jsonl"
+INDEX_PAGE_SIZE = 50
+
+# The manifest is compacted to one line per report once it holds this many
+# lines, and at least twice as many as there are reports
+MANIFEST_COMPACT_LINES = 1000
+
+
+def index_page_name(page):
+    return f"index-{page}.html"
+
+
+class ReportIndex:
+    """Paginated index of the report files backed by an append-only manifest.
+
+    The report of an environment is overwritten in place every cycle, so the
+    index lists every report URL once, as a listing of docs/ would, with the
+    time it was last published. Every publish appends a line to
+    docs/reports.jsonl, and the last line of a URL holds its time; the
+    manifest is compacted to a line per URL when it grows. Pages hold
+    INDEX_PAGE_SIZE reports in the order they first appeared, so a publish
+    only renders the page of its report and index.html (which shows the
+    last page). The manifest is read once, at startup.
+    """
+
+    def __init__(self, docs_dir, page_size=INDEX_PAGE_SIZE):
+        self.docs_dir = docs_dir
+        self.page_size = page_size
+        self.manifest_path = os.path.join(docs_dir, MANIFEST_FILE)
+        self._entries = []  # in the order the reports first appeared
+        self._positions = {}  # url -> position in _entries
+        self._lines = 0
+        # Index files rewritten at startup, returned by the next add()
+        self._written = []
+        # Reports of several clusters (--contexts) are added from their threads
+        self._lock = threading.Lock()
+
+        if not os.path.exists(self.manifest_path):
+            self._seed_manifest()
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._record(json.loads(line))
+        if self._needs_compaction():
+            self._written.append(self._compact())
+        if not os.path.exists(os.path.join(docs_dir, "index.html")):
+            self._render_all()
+
+    @property
+    def count(self):
+        return len(self._entries)
+
+    @property
+    def pages(self):
+        return max(1, -(-self.count // self.page_size))
+
+    def _seed_manifest(self):
+        # Reports generated before the manifest existed are listed once, by mtime
+        reports = []
+        for filename in os.listdir(self.docs_dir):
+            if filename.endswith("_statistics.html"):
+                mtime = os.path.getmtime(os.path.join(self.docs_dir, filename))
+                reports.append(
+                    {
+                        "env_name": filename[: -len("_statistics.html")],
+                        "timestamp": datetime.fromtimestamp(mtime).strftime(
+                            "%Y-%m-%d %H:%M:%S"
+                        ),
+                        "url": filename,
+                    }
+                )
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            for report in sorted(reports, key=lambda r: r["timestamp"]):
+                f.write(json.dumps(report) + "\n")
+
+    def _record(self, entry):
+        # Returns the position of the entry, and whether its URL is new
+        self._lines += 1
+        position = self._positions.get(entry["url"])
+        if position is None:
+            self._positions[entry["url"]] = position = len(self._entries)
+            self._entries.append(entry)
+            return position, True
+        self._entries[position] = entry
+        return position, False
+
+    def _needs_compaction(self):
+        return self._lines >= max(MANIFEST_COMPACT_LINES, 2 * self.count)
+
+    def _compact(self):
+        write_atomic(
+            self.manifest_path,
+            "".join(json.dumps(entry) + "\n" for entry in self._entries),
+        )
+        self._lines = self.count
+        return self.manifest_path
+
+    def _render_all(self):
+        # A seeded manifest gets its pages rendered here, and the pages left
+        # over from a larger index are removed
+        for page in range(1, self.pages + 1):
+            self._written.append(self._render_page(page, index_page_name(page)))
+        self._written.append(self._render_page(self.pages, "index.html"))
+        page = self.pages + 1
+        while os.path.exists(os.path.join(self.docs_dir, index_page_name(page))):
+            path = os.path.join(self.docs_dir, index_page_name(page))
+            os.remove(path)
+            self._written.append(path)
+            page += 1
+        console.log(f"[cyan]Rebuilt the report index of {self.count} reports[/cyan]")
+
+    def _render_page(self, page, filename):
+        template = env.get_template("index.html")
+        path = os.path.join(self.docs_dir, filename)
+        entries = self._entries[(page - 1) * self.page_size : page * self.page_size]
+        write_atomic(
+            path,
+            template.render(
+                reports=list(reversed(entries)),
+                page=page,
+                pages=self.pages,
+                newer_url=index_page_name(page + 1) if page < self.pages else None,
+                older_url=index_page_name(page - 1) if page > 1 else None,
+            ),
+        )
+        return path
+
+    def add(self, env_name, timestamp, url):
+        """Record a published report and return the index files that were written."""
+        with self._lock:
+            written, self._written = self._written, []
+            entry = {"env_name": env_name, "timestamp": timestamp, "url": url}
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            written.append(self.manifest_path)
+            position, new = self._record(entry)
+            if self._needs_compaction():
+                self._compact()
+
+            page = position // self.page_size + 1
+            if new and position % self.page_size == 0 and page > 1:
+                # The previous page is now full; render it a last time so it
+                # links to the new one
+                written.append(self._render_page(page - 1, index_page_name(page - 1)))
+            written.append(self._render_page(page, index_page_name(page)))
+            if page == self.pages:
+                written.append(self._render_page(page, "index.html"))
+            return written
@@ -0,0 +1,95 @@
+import time
+from collections import deque
+
+# Deployments whose containers restarted within this many seconds are
+# reported as recently restarted
+RECENT_RESTART_WINDOW = 600
+
+
+class RestartTracker:
+    """Exact container restarts, from the counters of consecutive runs.
+
+    Every run of the container_restarts detector returns the restart counter
+    of every container by pod UID. The counters of the previous run are kept,
+    so the restarts in between are the difference of the two, whether the
+    container is running again or still terminated. A pod seen for the first
+    time contributes all its restarts (it was created since the previous run)
+    except on the first run, which only sets the baseline; deleted pods are
+    dropped, so each update is O(pods) in time and memory.
+
+    The restarts of the last `window` seconds are kept per deployment to
+    report which deployments restarted recently and at what rate.
+    """
+
+    def __init__(self, window=RECENT_RESTART_WINDOW):
+        self.window = window
+        self.samples = 0
+        self._counters = None
+        self._started = None
+        self._restarts = deque()  # (timestamp, deployment, restarts)
+
+    def update(self, pods, now=None):
+        """Record the counters of a run and return the restarts since the previous one.
+
+        Returns {"total": restarts, "deployments": {"namespace/name": restarts}};
+        restarts of pods not owned by a Deployment only count in the total.
+        """
+        now = time.time() if now is None else now
+        first = self._counters is None
+        previous = self._counters or {}
+        counters = {}
+        total = 0
+        deployments = {}
+        for pod in pods:
+            counters[pod["uid"]] = pod["containers"]
+            if first:
+                continue
+            seen = previous.get(pod["uid"], {})
+            restarts = 0
+            for container, count in pod["containers"].items():
+                before = seen.get(container, 0)
+                # A counter that went down was reset, e.g. by the kubelet
+                restarts += count - before if count >= before else count
+            if restarts:
+                total += restarts
+                if pod["deployment"]:
+                    deployments[pod["deployment"]] = (
+                        deployments.get(pod["deployment"], 0) + restarts
+                    )
+
+        self._counters = counters
+        self.samples += 1
+        if self._started is None:
+            self._started = now
+        for deployment, restarts in deployments.items():
+            self._restarts.append((now, deployment, restarts))
+        self._expire(now)
+        return {"total": total, "deployments": deployments}
+
+    def _expire(self, now):
+        while self._restarts and self._restarts[0][0] < now - self.window:
+            self._restarts.popleft()
+
+    def recent(self, now=None):
+        """Restarts of every deployment within the window, by "namespace/name"."""
+        self._expire(time.time() if now is None else now)
+        recent = {}
+        for _, deployment, restarts in self._restarts:
+            recent[deployment] = recent.get(deployment, 0) + restarts
+        return recent
+
+    def rates(self, now=None):
+        """Restarts per minute of every deployment that restarted within the window.
+
+        Until the tracker has been running for a whole window, the rate is
+        over the time since the first run.
+        """
+        now = time.time() if now is None else now
+        recent = self.recent(now)
+        if not recent:
+            return {}
+        minutes = max(min(self.window, now - self._started), 1) / 60
+        return {
+            deployment: round(restarts / minutes, 4)
+            for deployment, restarts in sorted(recent.items())
+        }
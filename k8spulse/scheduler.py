@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from rich.console import Console
+from k8spulse.detector.plugins import run_detectors
+from k8spulse.metrics import metrics
+
+console = Console()
+
+
+class DetectorSchedule:
+    """How often a detector runs, defaulting to the period and priority it declares.
+
+    period is in seconds; jitter is a fraction of the period, and every run
+    starts up to that much after its deadline, drawn again for each run, so
+    detectors with the same period do not all hit the API server at once;
+    detectors with a lower priority value are submitted first when more are
+    due than there are workers to run them.
+    """
+
+    def __init__(self, detector, period=None, jitter=0.1, priority=None):
+        self.detector = detector
+        self.key = detector.key
+        self.period = period or detector.period
+        self.jitter = jitter
+        self.priority = detector.priority if priority is None else priority
+
+
+class DeadlineScheduler:
+    """Run detectors on an executor against wall-clock deadlines.
+
+    Deadlines advance by whole periods from the first run, so a slow cycle
+    never makes the schedule drift. The detectors due together that read
+    cluster objects and have the same priority are submitted as one batch,
+    which fetches the union of the resources they need once; the others
+    (e.g. external APIs) run on their own. At most max_running batches run
+    at once; the detectors due beyond that wait, by priority, for a batch to
+    finish. A detector that is still running or waiting when it becomes due
+    again skips that run instead of piling up. The latest result of every detector
+    is kept in `results`, the time it arrived in `updated`, and the timing and
+    API stats of its last run in `stats`; a failed run keeps the previous
+    result and records the error in `errors`.
+
+    Every Kubernetes call gives up after request_timeout seconds. The first
+    report does not wait more than cycle_deadline seconds for every detector
+    to finish, and a detector still running after cycle_deadline seconds is
+    reported as stale, so one hung call never holds the report back. With
+    sharding, namespaced resources are listed in shards (see Sharding). The
+    detectors read the cluster of the kubeconfig context, the current one by
+    default, so schedulers of several clusters can share one executor.
+    """
+
+    def __init__(
+        self,
+        executor,
+        schedules,
+        profile_dir=None,
+        request_timeout=None,
+        cycle_deadline=None,
+        sharding=None,
+        context=None,
+        max_running=None,
+    ):
+        self.executor = executor
+        self.max_running = max_running
+        self.sharding = sharding
+        self.context = context
+        self.profile_dir = profile_dir
+        self.request_timeout = request_timeout
+        self.cycle_deadline = cycle_deadline
+        self.schedules = {schedule.key: schedule for schedule in schedules}
+        self.results = {}
+        self.stats = {}
+        self.updated = {}
+        self.errors = {}
+        self.completed = set()
+        self._running = {}
+        self._submitted = {}
+        self._deadlines = {}
+        self._pending = []  # (priority, sequence, key) of due detectors
+        self._heap = []
+        self._sequence = itertools.count()
+
+        now = self.started = time.time()
+        for schedule in schedules:
+            self._deadlines[schedule.key] = now
+            self._push(schedule, now)
+
+    def _push(self, schedule, deadline):
+        run_at = deadline + random.uniform(0, schedule.jitter * schedule.period)
+        heapq.heappush(
+            self._heap, (run_at, schedule.priority, next(self._sequence), schedule.key)
+        )
+
+    def _reschedule(self, schedule, now):
+        deadline = self._deadlines[schedule.key] + schedule.period
+        if deadline <= now:
+            # Missed whole periods (e.g. the host was suspended)
+            deadline += ((now - deadline) // schedule.period + 1) * schedule.period
+        self._deadlines[schedule.key] = deadline
+        self._push(schedule, deadline)
+
+    def submit_due(self):
+        """Queue every detector whose deadline has passed and submit them by priority."""
+        now = time.time()
+        running = {key for keys in self._running.values() for key in keys}
+        waiting = {key for _, _, key in self._pending}
+        while self._heap and self._heap[0][0] <= now:
+            _, priority, sequence, key = heapq.heappop(self._heap)
+            self._reschedule(self.schedules[key], now)
+            if key in running or key in waiting:
+                console.log(
+                    f"[yellow]{key} is still running or waiting, skipping this run[/yellow]"
+                )
+            else:
+                heapq.heappush(self._pending, (priority, sequence, key))
+                waiting.add(key)
+
+        while self._pending and (
+            self.max_running is None or len(self._running) < self.max_running
+        ):
+            # The detectors of the most urgent priority share one fetch
+            priority = self._pending[0][0]
+            detectors = []
+            while self._pending and self._pending[0][0] == priority:
+                detectors.append(
+                    self.schedules[heapq.heappop(self._pending)[2]].detector
+                )
+            batch = [detector for detector in detectors if detector.resources]
+            if batch:
+                self._submit(batch)
+            for detector in detectors:
+                if not detector.resources:
+                    self._submit([detector])
+
+    def _submit(self, detectors):
+        future = self.executor.submit(
+            run_detectors,
+            detectors,
+            self.profile_dir,
+            self.request_timeout,
+            self.sharding,
+            self.context,
+        )
+        self._running[future] = [detector.key for detector in detectors]
+        now = time.time()
+        for detector in detectors:
+            self._submitted[detector.key] = now
+
+    def wait(self):
+        """Wait for running detectors until the next deadline.
+
+        Returns the keys of the detectors that finished.
+        """
+        now = time.time()
+        wake_at = [self._heap[0][0]] if self._heap else []
+        if self.cycle_deadline is not None and not self.ready():
+            wake_at.append(self.started + self.cycle_deadline)
+        timeout = max(0, min(wake_at) - now) if wake_at else None
+        if not self._running:
+            time.sleep(timeout or 0)
+            return []
+
+        done, _ = wait(self._running, timeout=timeout, return_when=FIRST_COMPLETED)
+        finished = []
+        for future in done:
+            keys = self._running.pop(future)
+            try:
+                outcomes, errors, fetch_stats = future.result()
+            except Exception as e:
+                # The shared fetch failed, so none of the detectors could run
+                outcomes, errors, fetch_stats = {}, dict.fromkeys(keys, str(e)), None
+            if fetch_stats:
+                metrics.record_fetch(fetch_stats)
+            for key in keys:
+                if key in outcomes:
+                    self.results[key], self.stats[key] = outcomes[key]
+                    self.updated[key] = time.time()
+                    self.errors.pop(key, None)
+                    metrics.record_detector(key, self.stats[key])
+                else:
+                    self.errors[key] = errors[key]
+                    metrics.inc("k8spulse_detector_errors_total", detector=key)
+                    console.log(
+                        f"[red]Error occurred while fetching {key}: {errors[key]}[/red]"
+                    )
+                self.completed.add(key)
+                finished.append(key)
+        return finished
+
+    def ready(self):
+        """True once every detector has run at least once or the cycle deadline passed."""
+        return self.completed.issuperset(self.schedules) or (
+            self.cycle_deadline is not None
+            and time.time() >= self.started + self.cycle_deadline
+        )
+
+    def stale(self):
+        """Detectors whose latest result cannot be trusted, with the reason.
+
+        Returns {key: reason} for the detectors still running after the cycle
+        deadline, those whose last run failed and those without a result yet;
+        their latest result, if any, is still in `results`.
+        """
+        now = time.time()
+        running = {key for keys in self._running.values() for key in keys}
+        stale = {}
+        for key in self.schedules:
+            running_for = now - self._submitted.get(key, now)
+            if (
+                key in running
+                and self.cycle_deadline is not None
+                and running_for > self.cycle_deadline
+            ):
+                stale[key] = f"still running after {running_for:.0f}s"
+            elif key in self.errors:
+                stale[key] = f"failed: {self.errors[key]}"
+            elif key not in self.updated:
+                stale[key] = "running" if key in running else "not run yet"
+        return stale
@@ -0,0 +1,53 @@
+import hashlib
+import json
+from markupsafe import Markup
+from k8spulse.db import render_report_section
+
+
+class SectionCache:
+    """Rendered report sections, re-rendered only when their data changes.
+
+    Each section macro keeps the fragment of its last render together with
+    its arguments and their fingerprint. Detectors run on their own periods,
+    so most cycles pass the very same result objects as the previous one and
+    the fragment is reused without even hashing them; equal data in new
+    objects costs a hash, and only changed data is rendered with Jinja.
+    """
+
+    def __init__(self, render=render_report_section):
+        self.render_section = render
+        self.hits = 0
+        self.misses = 0
+        self.rendered = []
+        self._entries = {}
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def take_rendered(self):
+        """Names of the sections rendered since the last call."""
+        rendered, self.rendered = self.rendered, []
+        return rendered
+
+    def render(self, name, *args):
+        entry = self._entries.get(name)
+        if entry is not None:
+            cached_args, fingerprint, html = entry
+            if len(cached_args) == len(args) and all(
+                cached is arg for cached, arg in zip(cached_args, args)
+            ):
+                self.hits += 1
+                return html
+
+        new_fingerprint = hashlib.sha256(
+            json.dumps(args, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        if entry is not None and entry[1] == new_fingerprint:
+            self.hits += 1
+            html = entry[2]
+        else:
+            self.misses += 1
+            self.rendered.append(name)
+            html = Markup(self.render_section(name, *args))
+        self._entries[name] = (args, new_fingerprint, html)
+        return html
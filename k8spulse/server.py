@@ -0,0 +1,195 @@
+import gzip
+import hashlib
+import mimetypes
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rich.console import Console
+
+console = Console()
+
+# Content types worth compressing; images are already compressed or tiny
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+)
+# Below this size gzip saves less than the header costs
+MIN_GZIP_SIZE = 512
+
+# Content-hashed assets never change under the same URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else is revalidated on every request, which is cheap with an ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+class Document:
+    """A served response body with its precomputed ETag and gzip variant."""
+
+    def __init__(self, content, content_type, immutable=False, modified=None):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self.body = content
+        self.content_type = content_type
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+        self.cache_control = (
+            IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        )
+        self.modified = modified or time.time()
+        self.gzipped = None
+        if len(content) >= MIN_GZIP_SIZE and content_type.startswith(
+            COMPRESSIBLE_TYPES
+        ):
+            self.gzipped = gzip.compress(content, compresslevel=6, mtime=0)
+
+    @property
+    def gzip_etag(self):
+        return self.etag[:-1] + '-gzip"'
+
+
+class ReportDocuments:
+    """The latest report, its assets and JSON snapshot, by URL path.
+
+    publish() swaps the whole set at once, so a request never sees a report
+    together with the assets of another cycle. Documents whose content did
+    not change keep their ETag, gzip variant and modification time. Every
+    scope (e.g. one cluster of --contexts) publishes its own set, which
+    leaves the documents of the other scopes alone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._scopes = {}
+
+    def publish(self, contents, immutable_prefixes=("/assets/",), scope=None):
+        """Replace the served documents of the scope with {path: (content, content_type)}."""
+        with self._lock:
+            previous = self._scopes.get(scope, {})
+        documents = {}
+        for path, (content, content_type) in contents.items():
+            document = previous.get(path)
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            if document is None or document.body != content:
+                document = Document(
+                    content, content_type, immutable=path.startswith(immutable_prefixes)
+                )
+            documents[path] = document
+        with self._lock:
+            self._scopes[scope] = documents
+            self._documents = {
+                path: document
+                for scope_documents in self._scopes.values()
+                for path, document in scope_documents.items()
+            }
+
+    def get(self, path):
+        with self._lock:
+            return self._documents.get(path)
+
+
+def content_type_for(path):
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/json":
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _accepts_gzip(header):
+    for coding in (header or "").split(","):
+        name, *params = coding.split(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _etag_matches(header, document):
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or document.etag in tags or document.gzip_etag in tags
+
+
+class _ReportHandler(BaseHTTPRequestHandler):
+    documents = None
+    index_path = None
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        path = self.path.split("?", 1)[0]
+        document = self.documents.get(self.index_path if path == "/" else path)
+        if document is None:
+            self.send_error(404)
+            return
+
+        use_gzip = document.gzipped is not None and _accepts_gzip(
+            self.headers.get("Accept-Encoding")
+        )
+        etag = document.gzip_etag if use_gzip else document.etag
+
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            not_modified = _etag_matches(if_none_match, document)
+        else:
+            not_modified = self._not_modified_since(document)
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(document.modified, usegmt=True))
+        self.send_header("Cache-Control", document.cache_control)
+        if document.gzipped is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        if not_modified:
+            self.end_headers()
+            return
+
+        body = document.gzipped if use_gzip else document.body
+        self.send_header("Content-Type", document.content_type)
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _not_modified_since(self, document):
+        header = self.headers.get("If-Modified-Since")
+        if not header:
+            return False
+        try:
+            since = parsedate_to_datetime(header).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have a resolution of one second
+        return int(document.modified) <= since
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_report_server(documents, port, host="127.0.0.1", index_path="/"):
+    """Serve the documents from a daemon thread; "/" serves index_path."""
+    handler = type(
+        "ReportHandler",
+        (_ReportHandler,),
+        {"documents": documents, "index_path": index_path},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    console.log(f"[cyan]Serving the latest report on http://{host}:{port}/[/cyan]")
+    return server
@@ -0,0 +1,72 @@
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from k8spulse.detector.plugins import REQUEST_TIMEOUT, run_detectors
+
+
+def take_snapshot(
+    detectors, request_timeout=REQUEST_TIMEOUT, sharding=None, context=None
+):
+    """Run the detectors once in this process and return their results.
+
+    As in the scheduler, the detectors that read cluster objects share a
+    single fetch while the others (e.g. external APIs) run next to it. Log
+    output goes to stderr, so stdout only carries the snapshot. Returns
+    {"timestamp", "results": {key: result}, "errors": {key: message},
+    "durations": {key: seconds}}.
+    """
+    batch = [detector for detector in detectors if detector.resources]
+    groups = [[detector] for detector in detectors if not detector.resources]
+    if batch:
+        groups.append(batch)
+
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    results, errors, durations = {}, {}, {}
+    with redirect_stdout(sys.stderr):
+        with ThreadPoolExecutor(max_workers=max(len(groups), 1)) as executor:
+            futures = [
+                executor.submit(
+                    run_detectors,
+                    group,
+                    request_timeout=request_timeout,
+                    sharding=sharding,
+                    context=context,
+                )
+                for group in groups
+            ]
+            for group, future in zip(groups, futures):
+                try:
+                    outcomes, group_errors, _ = future.result()
+                except Exception as e:
+                    outcomes = {}
+                    group_errors = {detector.key: str(e) for detector in group}
+                for key, (result, stats) in outcomes.items():
+                    results[key] = result
+                    durations[key] = round(stats["duration"], 6)
+                errors.update(group_errors)
+
+    return {
+        "timestamp": timestamp,
+        "results": dict(sorted(results.items())),
+        "errors": dict(sorted(errors.items())),
+        "durations": dict(sorted(durations.items())),
+    }
+
+
+def format_snapshot(snapshot, output_format="json"):
+    """Serialize a snapshot as one JSON document, or as one line per detector."""
+    if output_format == "json":
+        return json.dumps(snapshot, indent=2, default=str)
+
+    lines = []
+    for key in sorted({**snapshot["results"], **snapshot["errors"]}):
+        line = {"timestamp": snapshot["timestamp"], "detector": key}
+        if key in snapshot["results"]:
+            line["result"] = snapshot["results"][key]
+            line["duration"] = snapshot["durations"][key]
+        else:
+            line["error"] = snapshot["errors"][key]
+        lines.append(json.dumps(line, default=str))
+    return "\n".join(lines)
@@ -0,0 +1,202 @@
+/*
+ * k8sPulse interactive history chart.
+ *
+ * Renders the compact history payload ({v, t: [epoch seconds], s: {name: [values]}})
+ * as an SVG line chart with hover read-out, drag-to-zoom, double-click to reset
+ * and legend entries that toggle series. No dependencies.
+ */
+(function () {
+  "use strict";
+
+  var SVG_NS = "http://www.w3.org/2000/svg";
+  var COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd"];
+  var WIDTH = 1600, HEIGHT = 600;
+  var LEFT = 70, RIGHT = 1570, TOP = 50, BOTTOM = 470;
+
+  function el(name, attrs, parent) {
+    var node = document.createElementNS(SVG_NS, name);
+    for (var key in attrs) node.setAttribute(key, attrs[key]);
+    if (parent) parent.appendChild(node);
+    return node;
+  }
+
+  function label(seconds) {
+    // Timestamps are encoded as UTC so they read as the original wall-clock time
+    return new Date(seconds * 1000).toISOString().slice(0, 19).replace("T", " ");
+  }
+
+  function render(container, data) {
+    var names = Object.keys(data.s);
+    var hidden = {};
+    var view = { from: data.t[0], to: data.t[data.t.length - 1] };
+
+    container.innerHTML = "";
+    var svg = el("svg", {
+      viewBox: "0 0 " + WIDTH + " " + HEIGHT,
+      width: "100%",
+      role: "img",
+      "aria-label": "Kubernetes Metrics Over Time",
+      style: "background: white; border-radius: 12px; user-select: none;"
+    }, container);
+    var plot = el("g", {}, svg);
+    var overlay = el("g", {}, svg);
+    var tooltip = document.createElement("div");
+    tooltip.style.cssText =
+      "position: absolute; display: none; pointer-events: none; background: rgba(0,0,0,0.8);" +
+      "color: white; padding: 6px 8px; border-radius: 6px; font-size: 12px; text-align: left;";
+    container.style.position = "relative";
+    container.appendChild(tooltip);
+
+    function visible(i) {
+      return data.t[i] >= view.from && data.t[i] <= view.to;
+    }
+
+    function draw() {
+      plot.innerHTML = "";
+      var span = Math.max(view.to - view.from, 1);
+      var yMax = 1;
+      names.forEach(function (name) {
+        if (hidden[name]) return;
+        data.s[name].forEach(function (v, i) {
+          if (visible(i) && v > yMax) yMax = v;
+        });
+      });
+      yMax *= 1.05;
+
+      var px = function (t) { return LEFT + (t - view.from) / span * (RIGHT - LEFT); };
+      var py = function (v) { return BOTTOM - v / yMax * (BOTTOM - TOP); };
+      draw.px = px;
+      draw.invert = function (x) { return view.from + (x - LEFT) / (RIGHT - LEFT) * span; };
+
+      el("rect", { x: LEFT, y: TOP, width: RIGHT - LEFT, height: BOTTOM - TOP, fill: "none", stroke: "black" }, plot);
+      el("text", { x: (LEFT + RIGHT) / 2, y: 30, "text-anchor": "middle", "font-size": 17, "font-family": "sans-serif" }, plot)
+        .textContent = "Kubernetes Metrics Over Time (Percentage)";
+
+      for (var step = 0; step <= 5; step++) {
+        var value = yMax / 5 * step;
+        el("text", { x: LEFT - 8, y: py(value), "text-anchor": "end", "dominant-baseline": "middle", "font-size": 12, "font-family": "sans-serif" }, plot)
+          .textContent = value.toFixed(0);
+      }
+      for (var k = 0; k <= 7; k++) {
+        var t = view.from + span * k / 7;
+        var x = px(t);
+        el("text", { x: x, y: BOTTOM + 12, "text-anchor": "end", "font-size": 12, "font-family": "sans-serif", transform: "rotate(-45 " + x + " " + (BOTTOM + 12) + ")" }, plot)
+          .textContent = label(t);
+      }
+
+      names.forEach(function (name, index) {
+        var color = COLORS[index % COLORS.length];
+        if (!hidden[name]) {
+          var points = [];
+          data.s[name].forEach(function (v, i) {
+            if (visible(i)) points.push(px(data.t[i]).toFixed(1) + "," + py(v).toFixed(1));
+          });
+          el("polyline", { points: points.join(" "), fill: "none", stroke: color, "stroke-width": 1.5 }, plot);
+        }
+        var legend = el("g", { style: "cursor: pointer;", opacity: hidden[name] ? 0.35 : 1 }, plot);
+        var ly = TOP + 20 + index * 20;
+        el("line", { x1: LEFT + 12, y1: ly, x2: LEFT + 40, y2: ly, stroke: color, "stroke-width": 2 }, legend);
+        el("text", { x: LEFT + 48, y: ly, "dominant-baseline": "middle", "font-size": 12, "font-family": "sans-serif" }, legend)
+          .textContent = name;
+        legend.addEventListener("click", function () {
+          hidden[name] = !hidden[name];
+          draw();
+        });
+      });
+    }
+
+    function toSvgX(event) {
+      var box = svg.getBoundingClientRect();
+      return (event.clientX - box.left) / box.width * WIDTH;
+    }
+
+    function nearest(t) {
+      var best = -1;
+      for (var i = 0; i < data.t.length; i++) {
+        if (visible(i) && (best < 0 || Math.abs(data.t[i] - t) < Math.abs(data.t[best] - t))) best = i;
+      }
+      return best;
+    }
+
+    var dragStart = null, selection = null, cursor = null;
+
+    svg.addEventListener("mousedown", function (event) {
+      dragStart = toSvgX(event);
+      selection = el("rect", { y: TOP, height: BOTTOM - TOP, x: dragStart, width: 0, fill: "rgba(59,130,246,0.2)" }, overlay);
+    });
+
+    svg.addEventListener("mousemove", function (event) {
+      var x = Math.min(Math.max(toSvgX(event), LEFT), RIGHT);
+      if (selection) {
+        selection.setAttribute("x", Math.min(dragStart, x));
+        selection.setAttribute("width", Math.abs(x - dragStart));
+      }
+      var i = nearest(draw.invert(x));
+      if (i < 0) return;
+      if (!cursor) cursor = el("line", { y1: TOP, y2: BOTTOM, stroke: "#888", "stroke-dasharray": "4 4" }, overlay);
+      cursor.setAttribute("x1", draw.px(data.t[i]));
+      cursor.setAttribute("x2", draw.px(data.t[i]));
+      var rows = ["<strong>" + label(data.t[i]) + "</strong>"];
+      names.forEach(function (name, index) {
+        if (!hidden[name]) {
+          rows.push('<span style="color:' + COLORS[index % COLORS.length] + '">&#9632;</span> ' +
+            name + ": " + data.s[name][i].toFixed(2) + "%");
+        }
+      });
+      tooltip.innerHTML = rows.join("<br>");
+      tooltip.style.display = "block";
+      var box = svg.getBoundingClientRect();
+      tooltip.style.left = (event.clientX - box.left + 16) + "px";
+      tooltip.style.top = (event.clientY - box.top + 16) + "px";
+    });
+
+    svg.addEventListener("mouseup", function (event) {
+      if (selection) {
+        var x = toSvgX(event);
+        if (Math.abs(x - dragStart) > 5) {
+          var from = draw.invert(Math.min(dragStart, x)), to = draw.invert(Math.max(dragStart, x));
+          view = { from: from, to: to };
+          draw();
+        }
+        overlay.removeChild(selection);
+        selection = null;
+      }
+    });
+
+    svg.addEventListener("mouseleave", function () {
+      tooltip.style.display = "none";
+      if (cursor) { overlay.removeChild(cursor); cursor = null; }
+      if (selection) { overlay.removeChild(selection); selection = null; }
+    });
+
+    svg.addEventListener("dblclick", function () {
+      view = { from: data.t[0], to: data.t[data.t.length - 1] };
+      draw();
+    });
+
+    if (!data.t.length) {
+      container.textContent = "No history data available.";
+      return;
+    }
+    draw();
+  }
+
+  function load(container) {
+    var src = container.getAttribute("data-src");
+    if (src) {
+      fetch(src, { cache: "no-cache" })
+        .then(function (response) { return response.json(); })
+        .then(function (data) { render(container, data); })
+        .catch(function () { container.textContent = "Could not load " + src; });
+      return;
+    }
+    var embedded = document.getElementById(container.getAttribute("data-payload"));
+    if (embedded) render(container, JSON.parse(embedded.textContent));
+  }
+
+  window.K8sPulseCharts = { render: render };
+  document.addEventListener("DOMContentLoaded", function () {
+    var charts = document.querySelectorAll("[data-k8spulse-chart]");
+    for (var i = 0; i < charts.length; i++) load(charts[i]);
+  });
+})();
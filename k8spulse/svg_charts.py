@@ -0,0 +1,276 @@
+from html import escape
+import math
+import numpy as np
+from rich.console import Console
+from k8spulse.downsample import lttb
+
+console = Console()
+
+GREEN = "#4CAF50"
+YELLOW = "#FFC107"
+RED = "#FF4444"
+
+# Same palette matplotlib uses by default, so SVG and PNG charts look alike
+SERIES_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd"]
+
+LINE_CHART_SERIES = [
+    "deployments_with_replicas",
+    "deployments_with_zero_replicas",
+    "deployments_with_exact_replicas",
+    "deployments_with_crashloopbackoff",
+    "deployments_with_recent_start",
+]
+
+# About one point per horizontal pixel of the 16-inch history chart
+LINE_CHART_MAX_POINTS = 1500
+
+
+def gauge_percentage(value, min_value=0, max_value=100):
+    if max_value == min_value:
+        return 0
+    percentage = (value - min_value) / (max_value - min_value) * 100
+    return min(max(percentage, 0), 100)  # Limit percentage between 0 and 100
+
+
+def gauge_color(percentage, direction, yellow_threshold, red_threshold):
+    if direction == "inverse":
+        # Inverse: less is better
+        if percentage <= yellow_threshold:
+            return GREEN
+        elif percentage <= red_threshold:
+            return YELLOW
+        return RED
+    # Direct: more is better
+    if percentage >= yellow_threshold:
+        return GREEN
+    elif percentage >= red_threshold:
+        return YELLOW
+    return RED
+
+
+def resource_percentages(resource_type, metrics):
+    """Return (title, used_percentage, requested_percentage) or None for an unknown type."""
+    if resource_type == "cpu":
+        total = metrics["total_cpu_capacity_mcores"]
+        used = metrics["total_cpu_used_mcores"]
+        requested = metrics["total_cpu_requested_mcores"]
+        title = "CPU Usage"
+    elif resource_type == "memory":
+        total = metrics["total_memory_capacity_mib"]
+        used = metrics["total_memory_used_mib"]
+        requested = metrics["total_memory_requested_mib"]
+        title = "Memory Usage"
+    else:
+        return None
+
+    used_percentage = (used / total) * 100 if total else 0
+    requested_percentage = (requested / total) * 100 if total else 0
+
+    # If any percentage is improbably low (< 1%), multiply by 100
+    if used_percentage < 1:
+        used_percentage *= 100
+    if requested_percentage < 1:
+        requested_percentage *= 100
+
+    return title, used_percentage, requested_percentage
+
+
+def history_percentages(history_df):
+    """Return the sorted timestamps and the full percentage series of the line chart.
+
+    Percentages are computed on NumPy arrays without touching the DataFrame.
+    """
+    history_df = history_df.sort_values("timestamp")
+    timestamps = history_df["timestamp"].tolist()
+    totals = history_df["total_deployments"].to_numpy(dtype=float)
+
+    series = {}
+    for column in LINE_CHART_SERIES:
+        values = history_df[column].to_numpy(dtype=float)
+        series[f"{column}_pct"] = np.divide(
+            values * 100, totals, out=np.zeros_like(values), where=totals > 0
+        )
+    return timestamps, series
+
+
+def line_chart_series(history_df, max_points=LINE_CHART_MAX_POINTS):
+    """Return the sorted timestamps and the downsampled percentage series of the line chart.
+
+    Each series is a (x, y) pair where x are positions in the timestamps list,
+    reduced with LTTB to at most `max_points` points.
+    """
+    timestamps, series = history_percentages(history_df)
+    x = np.arange(len(timestamps))
+    return timestamps, {
+        name: lttb(x, values, max_points) for name, values in series.items()
+    }
+
+
+def _wedge_path(theta, radius=90):
+    # Pie slice from 0° to theta (counter-clockwise), y axis pointing down
+    if theta <= 0:
+        return ""
+    if theta >= 180:
+        return f"M 0 0 L {radius} 0 A {radius} {radius} 0 0 0 {-radius} 0 Z"
+    x = radius * math.cos(math.radians(theta))
+    y = -radius * math.sin(math.radians(theta))
+    return f"M 0 0 L {radius} 0 A {radius} {radius} 0 0 0 {x:.2f} {y:.2f} Z"
+
+
+# Function to generate a gauge chart as an inline SVG document
+def generate_dial_gauge_svg(
+    value,
+    title,
+    min_value=0,
+    max_value=100,
+    direction="direct",
+    yellow_threshold=50,
+    red_threshold=80,
+):
+    percentage = gauge_percentage(value, min_value, max_value)
+    color = gauge_color(percentage, direction, yellow_threshold, red_threshold)
+    theta = percentage / 100 * 180  # Scale to half-circle (0° to 180°)
+
+    wedge = _wedge_path(theta)
+    wedge_element = (
+        f'<path d="{wedge}" fill="{color}" stroke="black" stroke-width="1"/>'
+        if wedge
+        else ""
+    )
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="500" height="250" '
+        f'viewBox="-255 -110 510 255" role="img" aria-label="{escape(title)}">'
+        f"<title>{escape(title)}</title>"
+        f"{wedge_element}"
+        '<text x="0" y="-18" text-anchor="middle" dominant-baseline="middle" '
+        f'font-family="sans-serif" font-size="20" font-weight="bold">{percentage:.0f}%</text>'
+        '<text x="0" y="118" text-anchor="middle" dominant-baseline="middle" '
+        f'font-family="sans-serif" font-size="17">{escape(title)}</text>'
+        "</svg>"
+    )
+
+
+def generate_resource_dial_gauge_svg(resource_type, metrics):
+    percentages = resource_percentages(resource_type, metrics)
+    if percentages is None:
+        console.log(
+            "[red]Invalid resource type specified. Use 'cpu' or 'memory'.[/red]"
+        )
+        return ""
+    title, used_percentage, requested_percentage = percentages
+
+    # Reproduce the matplotlib layout: default axes box on a 1000x500 figure,
+    # x from 0 to pi with 5% margins and y from 0 to 1.
+    x_min, x_max = -0.05 * math.pi, 1.05 * math.pi
+    y_min, y_max = -0.05, 1.05
+
+    def px(x):
+        return 125 + (x - x_min) / (x_max - x_min) * 775
+
+    def py(y):
+        return 60 + (y_max - y) / (y_max - y_min) * 385
+
+    def band(start, end, fill, opacity):
+        start, end = max(start, 0), min(end, math.pi)
+        if end <= start:
+            return ""
+        return (
+            f'<rect x="{px(start):.1f}" y="{py(1):.1f}" width="{px(end) - px(start):.1f}" '
+            f'height="{py(0) - py(1):.1f}" fill="{fill}" fill-opacity="{opacity}" '
+            'stroke="black" stroke-width="1.5"/>'
+        )
+
+    requested_x = requested_percentage / 100 * math.pi
+    used_x = used_percentage / 100 * math.pi
+
+    def label(x, text, anchor):
+        width = 27 * len(text)
+        left = px(x) if anchor == "start" else px(x) - width
+        return (
+            f'<rect x="{left - 8:.1f}" y="{py(0.5) - 33:.1f}" width="{width + 16}" height="66" '
+            'rx="12" fill="white" stroke="black"/>'
+            f'<text x="{px(x):.1f}" y="{py(0.5):.1f}" text-anchor="{anchor}" '
+            'dominant-baseline="middle" font-family="sans-serif" font-size="33" '
+            f'font-weight="bold">{text}</text>'
+        )
+
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="1000" height="500" '
+        f'viewBox="0 0 1000 500" role="img" aria-label="{escape(title)}">'
+        f"<title>{escape(title)}</title>"
+        f"{band(0, requested_x, '#90CAF9', 0.7)}"
+        f"{band(0, used_x, GREEN, 0.8)}"
+        f"{band(requested_x, math.pi, 'white', 0.5)}"
+        f"{label(0.1 * math.pi, f'U:{used_percentage:.0f}%', 'start')}"
+        f"{label(0.9 * math.pi, f'R:{requested_percentage:.0f}%', 'end')}"
+        f'<text x="{px(0):.1f}" y="{py(-0.3):.1f}" text-anchor="middle" '
+        f'font-family="sans-serif" font-size="22" font-weight="bold">{escape(title)}</text>'
+        "</svg>"
+    )
+
+
+# Function to generate the history line chart as an inline SVG document
+def generate_line_chart_svg(history_df):
+    if "timestamp" not in history_df.columns:
+        console.log(
+            "[red]Error: 'timestamp' column not found in history data. Cannot generate line chart.[/red]"
+        )
+        return ""
+
+    timestamps, series = line_chart_series(history_df)
+
+    width, height = 1600, 600
+    left, right, top, bottom = 90, 1570, 50, 470
+    count = len(timestamps)
+    y_top = max([float(y.max(initial=0)) for _, y in series.values()] + [1]) * 1.05
+
+    def px(i):
+        return left + (i / (count - 1) if count > 1 else 0.5) * (right - left)
+
+    def py(v):
+        return bottom - v / y_top * (bottom - top)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" role="img" aria-label="Kubernetes Metrics Over Time">',
+        '<rect width="100%" height="100%" fill="white"/>',
+        f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" '
+        'fill="none" stroke="black"/>',
+        f'<text x="{(left + right) / 2}" y="30" text-anchor="middle" font-family="sans-serif" '
+        'font-size="17">Kubernetes Metrics Over Time (Percentage)</text>',
+        f'<text x="{(left + right) / 2}" y="590" text-anchor="middle" font-family="sans-serif" '
+        'font-size="14">Time</text>',
+        f'<text x="25" y="{(top + bottom) / 2}" text-anchor="middle" font-family="sans-serif" '
+        f'font-size="14" transform="rotate(-90 25 {(top + bottom) / 2})">Percentage (%)</text>',
+    ]
+
+    for step in range(6):
+        value = y_top / 5 * step
+        parts.append(
+            f'<text x="{left - 8}" y="{py(value):.1f}" text-anchor="end" dominant-baseline="middle" '
+            f'font-family="sans-serif" font-size="12">{value:.0f}</text>'
+        )
+
+    for i in sorted({round(k * (count - 1) / 7) for k in range(8)} if count else []):
+        x = px(i)
+        parts.append(
+            f'<text x="{x:.1f}" y="{bottom + 12}" text-anchor="end" font-family="sans-serif" '
+            f'font-size="12" transform="rotate(-45 {x:.1f} {bottom + 12})">{escape(str(timestamps[i]))}</text>'
+        )
+
+    for index, (name, (xs, ys)) in enumerate(series.items()):
+        color = SERIES_COLORS[index % len(SERIES_COLORS)]
+        points = " ".join(f"{px(i):.1f},{py(v):.1f}" for i, v in zip(xs, ys))
+        parts.append(
+            f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="1.5"/>'
+        )
+        legend_y = top + 20 + index * 20
+        parts.append(
+            f'<line x1="{left + 12}" y1="{legend_y}" x2="{left + 40}" y2="{legend_y}" '
+            f'stroke="{color}" stroke-width="2"/>'
+            f'<text x="{left + 48}" y="{legend_y}" dominant-baseline="middle" '
+            f'font-family="sans-serif" font-size="12">{name}</text>'
+        )
+
+    parts.append("</svg>")
+    return "".join(parts)
@@ -0,0 +1,183 @@
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from k8spulse.alerts import (
+    AlertEngine,
+    AlertRule,
+    FileSink,
+    WebhookSink,
+    alert_values,
+)
+from k8spulse.metrics import metrics
+
+
+def statuses(notifications):
+    return [(n["rule"], n["status"]) for n in notifications]
+
+
+def test_hysteresis_resolves_only_past_clear():
+    rule = AlertRule("HighCPU", "cpu", threshold=80, clear=50)
+    engine = AlertEngine([rule], [])
+
+    assert statuses(engine.evaluate({"cpu": 85}, now=0)) == [("HighCPU", "firing")]
+    # Back under the threshold but not under clear: still firing
+    assert engine.evaluate({"cpu": 70}, now=10) == []
+    assert engine.evaluate({"cpu": 81}, now=20) == []
+    assert engine.firing() == ["HighCPU"]
+    assert statuses(engine.evaluate({"cpu": 45}, now=30)) == [("HighCPU", "resolved")]
+    assert engine.firing() == []
+
+
+def test_fires_once_the_condition_held_for_its_duration():
+    rule = AlertRule("HighCPU", "cpu", threshold=80, for_seconds=600)
+    engine = AlertEngine([rule], [])
+
+    assert engine.evaluate({"cpu": 90}, now=0) == []
+    assert engine.evaluate({"cpu": 90}, now=300) == []
+    notifications = engine.evaluate({"cpu": 90}, now=600)
+    assert statuses(notifications) == [("HighCPU", "firing")]
+    assert notifications[0]["started_at"] == datetime.fromtimestamp(0).isoformat(
+        timespec="seconds"
+    )
+
+
+def test_pending_resets_when_the_condition_stops_holding():
+    rule = AlertRule("HighCPU", "cpu", threshold=80, for_seconds=600)
+    engine = AlertEngine([rule], [])
+
+    engine.evaluate({"cpu": 90}, now=0)
+    engine.evaluate({"cpu": 60}, now=300)
+    assert engine.evaluate({"cpu": 90}, now=600) == []
+    assert statuses(engine.evaluate({"cpu": 90}, now=1200)) == [("HighCPU", "firing")]
+
+
+def test_a_result_that_is_not_new_is_not_sampled_again():
+    # A detector that stopped reporting keeps its last result; seen again on
+    # every cycle, it must not make the condition hold for longer
+    rule = AlertRule("HighCPU", "cpu", threshold=80, for_seconds=600)
+    engine = AlertEngine([rule], [])
+
+    for now in range(0, 1800, 15):
+        assert engine.evaluate({"cpu": 90}, now=now, sampled_at={"cpu": 0}) == []
+    assert engine.series["cpu"].size == 1
+
+
+def test_missing_metrics_keep_the_rule_state():
+    rule = AlertRule("HighCPU", "cpu", threshold=80, clear=50)
+    engine = AlertEngine([rule], [])
+
+    engine.evaluate({"cpu": 90}, now=0)
+    assert engine.evaluate({}, now=60) == []
+    assert engine.firing() == ["HighCPU"]
+
+
+def test_window_aggregates_are_weighted_by_samples_not_cycles():
+    rule = AlertRule("HighCPU", "cpu", threshold=80, window=600, aggregate="mean")
+    engine = AlertEngine([rule], [])
+
+    engine.evaluate({"cpu": 100}, now=0)
+    # Many cycles while the detector did not run again
+    for now in range(1, 100):
+        engine.evaluate({"cpu": 100}, now=now, sampled_at={"cpu": 0})
+    # The mean is (100 + 0) / 2, not ~99 as if every cycle were a sample
+    notifications = engine.evaluate({"cpu": 0}, now=120)
+    assert statuses(notifications) == [("HighCPU", "resolved")]
+    assert notifications[0]["value"] == 50
+    assert engine.series["cpu"].size == 2
+
+
+def test_alert_values_are_sampled_when_their_detector_reported():
+    values, sampled_at = alert_values(
+        {
+            "total_deployments": 10,
+            "deployments_with_crashloopbackoff": 4,
+            "deployments_with_recent_start": 2,
+        },
+        {
+            "total_deployments": 100.0,
+            "deployments_with_crashloopbackoff": 130.0,
+            "container_restarts": 90.0,
+        },
+    )
+    assert values["crashloop_percentage"] == 40
+    assert sampled_at["crashloop_percentage"] == 130.0
+    assert sampled_at["total_deployments"] == 100.0
+    assert sampled_at["deployments_with_recent_start"] == 90.0
+
+
+def test_file_sink_appends_json_lines(tmp_path):
+    path = tmp_path / "alerts.jsonl"
+    engine = AlertEngine(
+        [AlertRule("HighCPU", "cpu", threshold=80)],
+        [FileSink(str(path))],
+        env_name="prod",
+    )
+    engine.evaluate({"cpu": 90}, now=0)
+    engine.evaluate({"cpu": 10}, now=60)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(line["status"], line["env"], line["value"]) for line in lines] == [
+        ("firing", "prod", 90),
+        ("resolved", "prod", 10),
+    ]
+
+
+@pytest.fixture
+def webhook_stub():
+    """A local HTTP server recording the JSON bodies POSTed to it."""
+
+    class Handler(BaseHTTPRequestHandler):
+        received = []
+        status = 200
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            Handler.received.append((self.headers["Content-Type"], json.loads(body)))
+            self.send_response(Handler.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield Handler, f"http://127.0.0.1:{server.server_address[1]}/hook"
+    server.shutdown()
+    server.server_close()
+
+
+def test_webhook_sink_posts_notifications_in_order(webhook_stub):
+    handler, url = webhook_stub
+    sink = WebhookSink(url, timeout=5)
+    engine = AlertEngine([AlertRule("HighCPU", "cpu", threshold=80)], [sink])
+    engine.evaluate({"cpu": 90}, now=0)
+    engine.evaluate({"cpu": 10}, now=60)
+    sink.close()
+
+    assert [
+        (content_type, body["rule"], body["status"])
+        for content_type, body in handler.received
+    ] == [
+        ("application/json", "HighCPU", "firing"),
+        ("application/json", "HighCPU", "resolved"),
+    ]
+
+
+def test_webhook_sink_counts_failures(webhook_stub):
+    handler, url = webhook_stub
+    handler.status = 500
+    key = ("k8spulse_alert_notification_failures_total", (("sink", "webhook"),))
+    failures = metrics.counters[key]
+
+    sink = WebhookSink(url, timeout=5)
+    sink.send({"rule": "HighCPU", "status": "firing"})
+    sink.close()
+
+    assert len(handler.received) == 1
+    assert metrics.counters[key] == failures + 1
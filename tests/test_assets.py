@@ -0,0 +1,34 @@
+import os
+
+from k8spulse.assets import AssetStore
+
+
+def write_report(docs, name, *urls):
+    with open(os.path.join(docs, name), "w", encoding="utf-8") as f:
+        f.write("".join(f'<img src="{url}">' for url in urls))
+
+
+def test_prune_keeps_only_the_assets_of_the_reports(tmp_path):
+    docs = str(tmp_path)
+    store = AssetStore(docs)
+    old = store.put("<svg>old</svg>", "svg")
+    current = store.put("<svg>current</svg>", "svg")
+    write_report(docs, "prod_statistics.html", current)
+
+    removed = store.prune()
+    assert [os.path.basename(path) for path in removed] == [os.path.basename(old)]
+    assert os.path.exists(os.path.join(docs, current))
+    # Files that are not assets are left alone
+    (tmp_path / "assets" / "notes.txt").write_text("keep")
+    assert store.prune() == []
+
+
+def test_prune_keeps_what_another_store_put_since_its_last_prune(tmp_path):
+    docs = str(tmp_path)
+    prod, dev = AssetStore(docs), AssetStore(docs)
+    pending = dev.put("<svg>dev</svg>", "svg")
+
+    assert prod.prune() == []
+    write_report(docs, "dev_statistics.html")
+    dev.prune()
+    assert not os.path.exists(os.path.join(docs, pending))
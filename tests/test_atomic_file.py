@@ -0,0 +1,23 @@
+import os
+
+from k8spulse.atomic_file import write_atomic
+
+
+def test_identical_content_leaves_the_file_untouched(tmp_path):
+    path = str(tmp_path / "report.html")
+    digest = write_atomic(path, ["<html>", "</html>"])
+    os.utime(path, (0, 0))
+
+    assert write_atomic(path, "<html></html>", unless_digest=digest) == digest
+    assert os.path.getmtime(path) == 0
+    assert os.listdir(tmp_path) == ["report.html"]
+
+
+def test_changed_content_replaces_the_file(tmp_path):
+    path = str(tmp_path / "report.html")
+    digest = write_atomic(path, "old")
+
+    assert write_atomic(path, [b"new"], unless_digest=digest) != digest
+    with open(path) as f:
+        assert f.read() == "new"
+    assert oct(os.stat(path).st_mode & 0o777) == "0o644"
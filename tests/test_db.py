@@ -0,0 +1,105 @@
+import pytest
+
+from k8spulse import db
+
+
+def snapshot(name, ready=1, restarts=0, crashloop=False):
+    return {
+        "namespace": "shop",
+        "name": name,
+        "desired_replicas": 1,
+        "ready_replicas": ready,
+        "crashloop": crashloop,
+        "restarts": restarts,
+    }
+
+
+def save(path, timestamp, snapshots):
+    db.save_report_history(
+        {
+            "timestamp": timestamp,
+            "total_deployments": len(snapshots),
+            "deployments_with_replicas": len(snapshots),
+            "deployments_with_zero_replicas": 0,
+            "deployments_with_exact_replicas": len(snapshots),
+            "deployments_with_crashloopbackoff": 0,
+            "deployments_with_recent_start": 0,
+            "nodes_with_issues": [],
+            "zombie_processes": [],
+            "deployment_snapshots": snapshots,
+        },
+        path,
+    )
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    db.init_db(path)
+    yield path
+    db._deployment_states.pop(path, None)
+
+
+def names(state):
+    return [(s["name"], s["ready_replicas"], s["restarts"]) for s in state]
+
+
+def test_deltas_rebuild_every_cycle(path):
+    cycles = [
+        [snapshot("api"), snapshot("cart")],
+        [snapshot("api", restarts=2), snapshot("cart")],
+        [snapshot("api", restarts=2), snapshot("web", ready=0)],
+    ]
+    for minute, snapshots in enumerate(cycles):
+        save(path, f"2026-01-01 00:0{minute}:00", snapshots)
+
+    assert names(db.load_deployment_snapshot("2026-01-01 00:00:00", path)) == [
+        ("api", 1, 0),
+        ("cart", 1, 0),
+    ]
+    assert names(db.load_deployment_snapshot("2026-01-01 00:01:30", path)) == [
+        ("api", 1, 2),
+        ("cart", 1, 0),
+    ]
+    # cart was deleted, web appeared
+    assert names(db.load_deployment_snapshot("2026-01-01 00:02:00", path)) == [
+        ("api", 1, 2),
+        ("web", 0, 0),
+    ]
+
+
+def test_keyframes_are_written_periodically(path, monkeypatch):
+    monkeypatch.setattr(db, "DEPLOYMENT_KEYFRAME_INTERVAL", 2)
+    for minute in range(5):
+        save(path, f"2026-01-01 00:0{minute}:00", [snapshot("api", restarts=minute)])
+
+    with db.sqlite3.connect(path) as conn:
+        keyframes = conn.execute(
+            "SELECT COUNT(*) FROM report_history WHERE deployment_keyframe = 1"
+        ).fetchone()[0]
+    assert keyframes == 2
+    assert names(db.load_deployment_snapshot("2026-01-01 00:04:00", path)) == [
+        ("api", 1, 4)
+    ]
+
+
+def test_a_failed_save_keeps_the_delta_base(path, monkeypatch):
+    save(path, "2026-01-01 00:00:00", [snapshot("api")])
+
+    save_snapshots = db.save_deployment_snapshots
+
+    def failing(*args, **kwargs):
+        save_snapshots(*args, **kwargs)
+        raise db.sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(db, "save_deployment_snapshots", failing)
+    with pytest.raises(db.sqlite3.OperationalError):
+        save(path, "2026-01-01 00:01:00", [snapshot("api", restarts=3)])
+    monkeypatch.undo()
+
+    # The failed cycle left nothing behind, so this delta must still record
+    # the change from the first cycle
+    save(path, "2026-01-01 00:02:00", [snapshot("api", restarts=3)])
+    assert names(db.load_deployment_snapshot("2026-01-01 00:02:00", path)) == [
+        ("api", 1, 3)
+    ]
@@ -0,0 +1,24 @@
+import numpy as np
+
+from k8spulse.downsample import lttb
+
+
+def test_short_series_are_returned_whole():
+    x, y = lttb([0, 1, 2], [5, 6, 7], threshold=10)
+    assert x.tolist() == [0, 1, 2]
+    assert y.tolist() == [5, 6, 7]
+
+
+def test_the_ends_and_the_peaks_of_every_bucket_are_kept():
+    x = np.arange(100)
+    y = np.zeros(100)
+    y[30] = 50
+    y[70] = -40
+
+    sampled_x, sampled_y = lttb(x, y, threshold=10)
+    assert len(sampled_x) == 10
+    assert sampled_x[0] == 0 and sampled_x[-1] == 99
+    assert 30 in sampled_x and 70 in sampled_x
+    assert np.all(np.diff(sampled_x) > 0)
+    # Every point is one of the series
+    assert np.array_equal(sampled_y, y[sampled_x.astype(int)])
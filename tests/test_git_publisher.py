@@ -0,0 +1,59 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+from k8spulse import git_publisher
+from k8spulse.git_publisher import GitPublisher
+
+
+def git(repo, *args):
+    return subprocess.run(
+        ["git", *args], cwd=repo, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.name", "k8spulse")
+    git(tmp_path, "config", "user.email", "k8spulse@example.com")
+    # The hook fails every commit while the file "broken" exists
+    hook = tmp_path / ".git" / "hooks" / "pre-commit"
+    hook.write_text("#!/bin/sh\ntest ! -e broken\n")
+    hook.chmod(0o755)
+    return tmp_path
+
+
+def test_the_files_of_a_failed_commit_are_committed_on_retry(repo, monkeypatch):
+    monkeypatch.setattr(git_publisher, "RETRY_SECONDS", 0.1)
+    (repo / "broken").touch()
+    (repo / "prod_statistics.html").write_text("report")
+
+    publisher = GitPublisher("prod", cwd=str(repo))
+    try:
+        publisher.submit([str(repo / "prod_statistics.html")])
+        wait_for(lambda: publisher._commit_failures >= 1)
+        with publisher._cond:
+            assert publisher._pending == {str(repo / "prod_statistics.html")}
+
+        (repo / "index.html").write_text("index")
+        publisher.submit([str(repo / "index.html")])
+        os.remove(repo / "broken")
+        wait_for(lambda: not publisher._pending and publisher._commit_failures == 0)
+    finally:
+        publisher.close(5)
+
+    assert sorted(git(repo, "ls-files").split()) == [
+        "index.html",
+        "prod_statistics.html",
+    ]
+    assert git(repo, "rev-list", "--count", "HEAD").strip() == "1"
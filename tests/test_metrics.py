@@ -0,0 +1,59 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from k8spulse.metrics import (
+    MetricsRegistry,
+    count_api_objects,
+    run_instrumented,
+    with_api_stats,
+)
+
+
+def test_every_metric_family_is_typed_once():
+    registry = MetricsRegistry()
+    registry.inc("k8spulse_detector_errors_total", detector="a")
+    registry.inc("k8spulse_detector_errors_total", detector="b")
+    registry.set("k8spulse_stale_detectors", 1)
+    registry.observe("k8spulse_stage_duration_seconds", 0.2, stage="render")
+
+    lines = registry.to_prometheus().splitlines()
+    assert [line for line in lines if line.startswith("# TYPE")] == [
+        "# TYPE k8spulse_detector_errors_total counter",
+        "# TYPE k8spulse_stale_detectors gauge",
+        "# TYPE k8spulse_stage_duration_seconds histogram",
+    ]
+    help_line = lines.index("# TYPE k8spulse_detector_errors_total counter") - 1
+    assert lines[help_line].startswith("# HELP k8spulse_detector_errors_total ")
+    assert lines[help_line + 2].startswith("k8spulse_detector_errors_total{")
+
+
+def test_runs_on_several_threads_keep_their_own_api_stats():
+    both_counting = threading.Barrier(2)
+
+    def detector(count):
+        def run():
+            count_api_objects(count)
+            both_counting.wait(timeout=5)
+            count_api_objects(count)
+
+        return run_instrumented(run)[1]["api"]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first, second = executor.map(detector, [1, 10])
+    assert first["unknown"]["objects"] == 2
+    assert second["unknown"]["objects"] == 20
+
+
+def test_fetch_threads_count_in_the_run_that_started_them():
+    def fetch():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(with_api_stats(count_api_objects), 3) for _ in range(2)
+            ]
+            for future in futures:
+                future.result()
+            # Work not wrapped is not attributed to any run
+            executor.submit(count_api_objects, 100).result()
+
+    _, stats = run_instrumented(fetch)
+    assert stats["api"]["unknown"]["objects"] == 6
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+from k8spulse import openai_tools
+from k8spulse.openai_tools import Recommender, build_summary, fingerprint
+
+
+def results(**overrides):
+    snapshots = [
+        {
+            "namespace": "shop",
+            "name": "cart",
+            "ready_replicas": 2,
+            "desired_replicas": 3,
+            "crashloop": False,
+            "restarts": 4,
+        },
+        {
+            "namespace": "shop",
+            "name": "api",
+            "ready_replicas": 0,
+            "desired_replicas": 2,
+            "crashloop": True,
+            "restarts": 30,
+        },
+    ]
+    return {
+        "total_deployments": 200,
+        "deployments_with_replicas": 178,
+        "deployments_with_zero_replicas": 22,
+        "deployments_with_exact_replicas": 168,
+        "deployments_with_recent_start": 12,
+        "deployments_with_crashloopbackoff": 12,
+        "cpu_used_percentage": 41.0,
+        "deployment_snapshots": snapshots,
+        **overrides,
+    }
+
+
+def test_fingerprint_ignores_count_and_replica_fluctuations():
+    before = build_summary(results())
+    snapshots = results()["deployment_snapshots"]
+    snapshots[0] = {**snapshots[0], "ready_replicas": 1, "restarts": 9}
+    after = build_summary(
+        results(
+            total_deployments=201,
+            deployments_with_replicas=179,
+            deployments_with_recent_start=40,
+            deployments_with_crashloopbackoff=13,
+            cpu_used_percentage=43.0,
+            deployment_snapshots=snapshots,
+        )
+    )
+    assert fingerprint(after) == fingerprint(before)
+
+
+def test_fingerprint_changes_with_the_state_of_failing_deployments():
+    before = build_summary(results())
+    snapshots = results()["deployment_snapshots"]
+    # No ready replica left
+    snapshots[0] = {**snapshots[0], "ready_replicas": 0}
+    assert fingerprint(build_summary(results(deployment_snapshots=snapshots))) != (
+        fingerprint(before)
+    )
+    # Many more deployments crash looping
+    summary = build_summary(results(deployments_with_crashloopbackoff=40))
+    assert fingerprint(summary) != fingerprint(before)
+
+
+class FakeRuns:
+    """Runs of the OpenAI client that never leave the queue."""
+
+    def __init__(self):
+        self.retrieved = 0
+        self.cancelled = []
+
+    def retrieve(self, thread_id, run_id):
+        self.retrieved += 1
+        return SimpleNamespace(id=run_id, thread_id=thread_id, status="queued")
+
+    def cancel(self, thread_id, run_id):
+        self.cancelled.append(run_id)
+
+
+def test_a_run_that_does_not_end_is_cancelled(monkeypatch):
+    monkeypatch.setattr(openai_tools, "RUN_POLL_INTERVAL", 0.01)
+    runs = FakeRuns()
+    threads = SimpleNamespace(
+        runs=runs,
+        create_and_run=lambda **kwargs: SimpleNamespace(
+            id="run", thread_id="thread", status="queued"
+        ),
+    )
+    client = SimpleNamespace(
+        beta=SimpleNamespace(
+            threads=threads,
+            assistants=SimpleNamespace(
+                create=lambda **kwargs: SimpleNamespace(id="assistant")
+            ),
+        )
+    )
+    recommender = Recommender("gpt-4o", client=client, run_timeout=0.05)
+
+    assert recommender.recommend(build_summary(results())) == ""
+    assert runs.cancelled == ["run"]
+    assert runs.retrieved > 0
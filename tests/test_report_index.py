@@ -0,0 +1,71 @@
+import os
+import re
+
+from k8spulse import report_index
+from k8spulse.report_index import ReportIndex
+
+
+def links(docs_dir, filename):
+    with open(os.path.join(docs_dir, filename), encoding="utf-8") as f:
+        return re.findall(
+            r'<a href="(\w+_statistics\.html)">[^<]* - ([^<]+)</a>', f.read()
+        )
+
+
+def manifest_lines(index):
+    with open(index.manifest_path, encoding="utf-8") as f:
+        return len(f.readlines())
+
+
+def test_a_republished_report_keeps_one_entry_with_its_latest_time(tmp_path):
+    docs = str(tmp_path)
+    index = ReportIndex(docs)
+    index.add("prod", "2026-01-01 00:00:00", "prod_statistics.html")
+    index.add("dev", "2026-01-01 00:01:00", "dev_statistics.html")
+    index.add("prod", "2026-01-01 00:05:00", "prod_statistics.html")
+
+    assert links(docs, "index.html") == [
+        ("dev_statistics.html", "2026-01-01 00:01:00"),
+        ("prod_statistics.html", "2026-01-01 00:05:00"),
+    ]
+    # A restarted monitor reads the same index back from the manifest
+    reloaded = ReportIndex(docs)
+    assert reloaded.count == 2
+    assert reloaded._entries[0]["timestamp"] == "2026-01-01 00:05:00"
+
+
+def test_pages_fill_in_order_and_a_publish_renders_only_its_page(tmp_path):
+    docs = str(tmp_path)
+    index = ReportIndex(docs, page_size=2)
+    for n in range(5):
+        index.add(f"env{n}", f"2026-01-01 00:0{n}:00", f"env{n}_statistics.html")
+
+    assert index.pages == 3
+    assert [url for url, _ in links(docs, "index-1.html")] == [
+        "env1_statistics.html",
+        "env0_statistics.html",
+    ]
+    assert [url for url, _ in links(docs, "index.html")] == ["env4_statistics.html"]
+
+    written = index.add("env0", "2026-01-01 00:09:00", "env0_statistics.html")
+    assert sorted(os.path.basename(path) for path in written) == [
+        "index-1.html",
+        "reports.jsonl",
+    ]
+    assert links(docs, "index-1.html")[1] == (
+        "env0_statistics.html",
+        "2026-01-01 00:09:00",
+    )
+
+
+def test_the_manifest_is_compacted_once_it_grows(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_index, "MANIFEST_COMPACT_LINES", 10)
+    index = ReportIndex(str(tmp_path))
+    for n in range(9):
+        index.add("prod", f"2026-01-01 00:0{n}:00", "prod_statistics.html")
+    assert manifest_lines(index) == 9
+    index.add("prod", "2026-01-01 00:10:00", "prod_statistics.html")
+    assert manifest_lines(index) == 1
+    assert ReportIndex(str(tmp_path))._entries[0]["timestamp"] == (
+        "2026-01-01 00:10:00"
+    )
@@ -0,0 +1,47 @@
+from k8spulse.restarts import RestartTracker
+
+
+def pod(uid, deployment="shop/api", **containers):
+    return {"uid": uid, "deployment": deployment, "containers": containers}
+
+
+def test_the_first_run_only_sets_the_baseline():
+    tracker = RestartTracker()
+    assert tracker.update([pod("a", app=7)], now=0) == {
+        "total": 0,
+        "deployments": {},
+    }
+
+
+def test_restarts_are_the_difference_of_consecutive_counters():
+    tracker = RestartTracker()
+    tracker.update([pod("a", app=3, sidecar=1)], now=0)
+    assert tracker.update([pod("a", app=5, sidecar=1)], now=30) == {
+        "total": 2,
+        "deployments": {"shop/api": 2},
+    }
+
+
+def test_a_reset_counter_counts_its_new_value():
+    tracker = RestartTracker()
+    tracker.update([pod("a", app=9)], now=0)
+    assert tracker.update([pod("a", app=2)], now=30)["total"] == 2
+
+
+def test_new_pods_count_all_their_restarts():
+    tracker = RestartTracker()
+    tracker.update([pod("a", app=1)], now=0)
+    result = tracker.update(
+        [pod("a", app=1), pod("b", app=4), pod("c", deployment=None, job=1)], now=30
+    )
+    # Pods without a Deployment only count in the total
+    assert result == {"total": 5, "deployments": {"shop/api": 4}}
+
+
+def test_recent_restarts_expire_after_the_window():
+    tracker = RestartTracker(window=60)
+    tracker.update([pod("a", app=0)], now=0)
+    tracker.update([pod("a", app=3)], now=30)
+    assert tracker.recent(now=60) == {"shop/api": 3}
+    assert tracker.rates(now=60) == {"shop/api": 3.0}
+    assert tracker.recent(now=100) == {}
@@ -0,0 +1,120 @@
+import random
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from k8spulse.scheduler import DeadlineScheduler, DetectorSchedule
+
+STATS = {"duration": 0.01, "max_rss_bytes": 0, "worker": 1, "api": {}}
+
+
+def detector(key, priority=10, period=60, resources=("pods",)):
+    return SimpleNamespace(
+        key=key,
+        priority=priority,
+        period=period,
+        resources={kind: () for kind in resources},
+    )
+
+
+class RecordingExecutor:
+    """Keeps every submitted batch with a future the test completes."""
+
+    def __init__(self):
+        self.batches = []
+
+    def submit(self, fn, detectors, *args):
+        future = Future()
+        self.batches.append(([d.key for d in detectors], future))
+        return future
+
+    def keys(self):
+        return [keys for keys, _ in self.batches]
+
+    def finish(self, index, failed=()):
+        keys, future = self.batches[index]
+        future.set_result(
+            (
+                {key: (f"{key} result", STATS) for key in keys if key not in failed},
+                {key: "boom" for key in failed},
+                None,
+            )
+        )
+
+
+def scheduler(detectors, **kwargs):
+    executor = RecordingExecutor()
+    schedules = [DetectorSchedule(d, jitter=0) for d in detectors]
+    return DeadlineScheduler(executor, schedules, **kwargs), executor
+
+
+def test_the_start_offset_is_drawn_again_for_every_run():
+    random.seed(1)
+    schedule = DetectorSchedule(detector("a", period=100), jitter=0.5)
+    sched = DeadlineScheduler(RecordingExecutor(), [schedule])
+    offsets = []
+    for _ in range(5):
+        run_at = sched._heap[0][0]
+        offsets.append(run_at - sched._deadlines["a"])
+        sched._heap.clear()
+        sched._reschedule(schedule, now=0)
+    assert all(0 <= offset <= 50 for offset in offsets)
+    assert len(set(offsets)) == len(offsets)
+
+
+def test_detectors_due_together_are_batched_by_priority():
+    sched, executor = scheduler(
+        [
+            detector("restarts", priority=1),
+            detector("crashloop", priority=0),
+            detector("events", priority=1),
+            detector("cast", priority=0, resources=()),
+        ]
+    )
+    sched.submit_due()
+    assert executor.keys() == [["crashloop"], ["cast"], ["restarts", "events"]]
+
+
+def test_batches_beyond_the_worker_budget_wait_by_priority():
+    sched, executor = scheduler(
+        [
+            detector("zombies", priority=9),
+            detector("crashloop", priority=0),
+            detector("events", priority=3),
+        ],
+        max_running=1,
+    )
+    sched.submit_due()
+    assert executor.keys() == [["crashloop"]]
+
+    executor.finish(0)
+    assert sched.wait() == ["crashloop"]
+    sched.submit_due()
+    assert executor.keys() == [["crashloop"], ["events"]]
+
+
+def test_ready_and_stale_follow_the_first_results():
+    sched, executor = scheduler(
+        [detector("a"), detector("b", priority=1)], cycle_deadline=3600
+    )
+    assert sched.stale() == {"a": "not run yet", "b": "not run yet"}
+    sched.submit_due()
+    assert sched.stale() == {"a": "running", "b": "running"}
+    assert not sched.ready()
+
+    # b has the more urgent priority, so it went first
+    executor.finish(0, failed=["b"])
+    executor.finish(1)
+    while len(sched.completed) < 2:
+        sched.wait()
+    assert sched.ready()
+    assert sched.results == {"a": "a result"}
+    assert sched.stale() == {"b": "failed: boom"}
+
+
+def test_the_cycle_deadline_makes_the_report_ready_and_marks_hung_detectors():
+    sched, executor = scheduler([detector("a")], cycle_deadline=10)
+    sched.submit_due()
+    sched.started -= 60
+    sched._submitted["a"] -= 60
+    assert sched.ready()
+    assert sched.stale()["a"].startswith("still running after")
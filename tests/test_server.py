@@ -0,0 +1,68 @@
+import gzip
+import http.client
+
+import pytest
+
+from k8spulse.server import ReportDocuments, start_report_server
+
+REPORT = "<html>" + "report " * 200 + "</html>"
+
+
+@pytest.fixture
+def served():
+    documents = ReportDocuments()
+    documents.publish({"/prod.html": (REPORT, "text/html; charset=utf-8")})
+    server = start_report_server(documents, 0, index_path="/prod.html")
+    yield documents, server.server_address[1]
+    server.shutdown()
+
+
+def get(port, path, **headers):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def test_a_matching_etag_gets_a_304(served):
+    _, port = served
+    response, body = get(port, "/")
+    assert response.status == 200
+    assert body == REPORT.encode()
+
+    etag = response.getheader("ETag")
+    response, body = get(port, "/prod.html", **{"If-None-Match": etag})
+    assert response.status == 304
+    assert body == b""
+    assert response.getheader("ETag") == etag
+
+
+def test_a_changed_report_gets_a_new_etag(served):
+    documents, port = served
+    etag = get(port, "/")[0].getheader("ETag")
+    documents.publish({"/prod.html": (REPORT + "!", "text/html; charset=utf-8")})
+
+    response, body = get(port, "/", **{"If-None-Match": etag})
+    assert response.status == 200
+    assert response.getheader("ETag") != etag
+
+
+def test_unchanged_documents_keep_their_etag_across_publishes():
+    documents = ReportDocuments()
+    documents.publish({"/prod.html": (REPORT, "text/html")})
+    before = documents.get("/prod.html")
+    documents.publish({"/prod.html": (REPORT, "text/html")})
+    assert documents.get("/prod.html") is before
+
+
+def test_gzip_has_its_own_etag(served):
+    _, port = served
+    plain = get(port, "/")[0].getheader("ETag")
+    response, body = get(port, "/", **{"Accept-Encoding": "gzip"})
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == REPORT.encode()
+
+    etag = response.getheader("ETag")
+    assert etag != plain
+    response, _ = get(port, "/", **{"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status == 304